@@ -0,0 +1,13 @@
+import os
+
+
+def setup_django(stock_api_base_url=None):
+    """Configure Django for a standalone benchmark script, optionally pointing PolygonClient elsewhere."""
+    if stock_api_base_url:
+        os.environ['STOCK_API_BASE_URL'] = stock_api_base_url
+    os.environ.setdefault('STOCK_API_KEY', 'benchmark')
+    os.environ.setdefault('DJANGO_SECRET_KEY', 'benchmark-secret-key')
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'stockwatch.settings')
+
+    import django
+    django.setup()
@@ -0,0 +1,65 @@
+"""
+Concurrent-request throughput of PolygonClient (thread pool) vs AsyncPolygonClient (one event loop)
+against a local fake upstream with fixed latency.
+
+    python -m benchmarks.bench_async_client --requests 2000 --concurrency 50 200 500 --latency-ms 50
+"""
+import argparse
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks._django import setup_django
+from benchmarks.fake_polygon import FakePolygonProcess
+
+
+def run_sync(client, total, concurrency):
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        start = time.perf_counter()
+        list(pool.map(lambda i: client.get_ticker_details(f'T{i % 100}'), range(total)))
+        return time.perf_counter() - start
+
+
+async def run_async(client, total, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with semaphore:
+            await client.get_ticker_details(f'T{i % 100}')
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[10, 50, 200])
+    parser.add_argument('--latency-ms', type=float, default=50)
+    args = parser.parse_args()
+
+    server = FakePolygonProcess(latency_ms=args.latency_ms)
+    setup_django(server.base_url)
+
+    from django.conf import settings
+    from core.stockapi.async_client import AsyncPolygonClient
+    from core.stockapi.polygon_client import PolygonClient
+
+    # Let the sync pool grow with the thread count so we measure threads, not pool contention
+    settings.STOCK_API_POOL_MAXSIZE = max(args.concurrency)
+    sync_client = PolygonClient()
+    async_client = AsyncPolygonClient()
+
+    print(f'{"mode":<6} {"concurrency":>11} {"requests":>9} {"seconds":>8} {"req/s":>9}')
+    for concurrency in args.concurrency:
+        elapsed = run_sync(sync_client, args.requests, concurrency)
+        print(f'{"sync":<6} {concurrency:>11} {args.requests:>9} {elapsed:>8.2f} {args.requests / elapsed:>9.1f}')
+        elapsed = asyncio.run(run_async(async_client, args.requests, concurrency))
+        print(f'{"async":<6} {concurrency:>11} {args.requests:>9} {elapsed:>8.2f} {args.requests / elapsed:>9.1f}')
+
+    server.stop()
+
+
+if __name__ == '__main__':
+    main()
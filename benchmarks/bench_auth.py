@@ -0,0 +1,90 @@
+"""
+Per-request cost of CookieJWTAuthentication: token validation plus user lookup straight from the
+database (the previous behaviour) vs. the cached user resolution. Runs against a throwaway test
+database created from the configured one.
+
+    python -m benchmarks.bench_auth --users 200 --requests 20000
+"""
+import argparse
+import random
+import statistics
+import time
+
+from benchmarks._django import setup_django
+
+
+def measure(authenticate, requests, rounds):
+    samples = []
+    for _ in range(rounds):
+        for request in requests:
+            start = time.perf_counter()
+            authenticate(request)
+            samples.append(time.perf_counter() - start)
+    samples.sort()
+
+    def pick(p):
+        return samples[min(len(samples) - 1, int(p * len(samples)))] * 1e6
+
+    return statistics.mean(samples) * 1e6, pick(0.5), pick(0.99)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--requests', type=int, default=20_000)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.conf import settings
+    from django.contrib.auth.models import User
+    from django.db import connection
+    from django.test import RequestFactory
+    from django.test.utils import CaptureQueriesContext, setup_test_environment
+    from rest_framework_simplejwt.authentication import JWTAuthentication
+    from rest_framework_simplejwt.tokens import AccessToken
+
+    from core.authentication import CookieJWTAuthentication
+    from core.user_cache import _local
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        users = User.objects.bulk_create(User(username=f'bench{i}') for i in range(args.users))
+        tokens = [str(AccessToken.for_user(user)) for user in users]
+        factory = RequestFactory()
+        rng = random.Random(3)
+        requests = []
+        for _ in range(args.requests):
+            request = factory.get('/api/user_info')
+            request.COOKIES['access_token'] = rng.choice(tokens)
+            requests.append(request)
+
+        cached = CookieJWTAuthentication()
+        uncached = CookieJWTAuthentication()
+        # The previous lookup: one query per request
+        uncached.get_user = lambda token: JWTAuthentication.get_user(uncached, token)
+
+        def queries(authenticate):
+            with CaptureQueriesContext(connection) as captured:
+                for request in requests[:1000]:
+                    authenticate(request)
+            return len(captured) / 1000
+
+        print(f'{"user lookup":<16} {"queries/req":>11} {"mean us":>9} {"p50 us":>8} {"p99 us":>8}')
+        for name, authenticate, local_ttl in (
+                ('database', uncached.authenticate, 0),
+                ('shared cache', cached.authenticate, 0),
+                ('local + shared', cached.authenticate, 60),
+        ):
+            # A zero local TTL makes every lookup go to the shared cache
+            settings.STOCK_AUTH_USER_CACHE_LOCAL_TTL = local_ttl
+            _local.clear()
+            per_request = queries(authenticate)
+            mean, p50, p99 = measure(authenticate, requests, rounds=1)
+            print(f'{name:<16} {per_request:>11.3f} {mean:>9.1f} {p50:>8.1f} {p99:>8.1f}')
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == '__main__':
+    main()
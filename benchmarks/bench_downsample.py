@@ -0,0 +1,49 @@
+"""
+Server-side downsampling of aggregate bars: LTTB and OHLC min/max bucketing vs. shipping every bar.
+Reports downsampling time plus JSON size and serialization time before and after.
+
+    python -m benchmarks.bench_downsample --sizes 10000 100000 1000000 --max-points 1000
+"""
+import argparse
+import gc
+import json
+import time
+
+from core.timeseries.downsample import downsample
+from benchmarks.fake_polygon import make_bars
+
+MINUTE_MS = 60_000
+
+
+def timed(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--max-points', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f'{"bars":>9} {"method":<7} {"downsample ms":>13} {"json ms":>9} {"json KiB":>10}')
+    for size in args.sizes:
+        bars = make_bars('BENCH', size, step_ms=MINUTE_MS)
+        elapsed, payload = timed(lambda: json.dumps(bars), args.repeat)
+        print(f'{size:>9} {"none":<7} {0:>13.2f} {elapsed * 1000:>9.2f} {len(payload) / 1024:>10.1f}')
+        for method in ('lttb', 'minmax'):
+            elapsed, reduced = timed(lambda: downsample(bars, args.max_points, method), args.repeat)
+            dump_elapsed, payload = timed(lambda: json.dumps(reduced), args.repeat)
+            print(f'{size:>9} {method:<7} {elapsed * 1000:>13.2f} {dump_elapsed * 1000:>9.2f} '
+                  f'{len(payload) / 1024:>10.1f}')
+        del bars
+        gc.collect()
+
+
+if __name__ == '__main__':
+    main()
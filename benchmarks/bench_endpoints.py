@@ -0,0 +1,425 @@
+"""
+Every route in core/urls.py driven through Django's test client against a throwaway test database
+and a fake upstream: latency percentiles, throughput, database queries per request and peak RSS per
+endpoint and concurrency level.
+
+Each worker thread has its own user, with --watchlists watchlists of --watchlist-size tickers.
+Before the measured requests every worker sends --warmup untimed ones, so the numbers describe
+warm caches. Peak RSS is reset before each endpoint where the kernel allows it (Linux), otherwise
+it's the process's peak so far. Worker threads need a database they can share: the configured
+one, or a file-based SQLite database (not :memory:).
+
+--json writes the results for later comparison; --compare prints the change against such a file.
+
+    python -m benchmarks.bench_endpoints --concurrency 1 8 --requests 100 --latency-ms 20 --json before.json
+    python -m benchmarks.bench_endpoints --concurrency 1 8 --requests 100 --latency-ms 20 --compare before.json
+    python -m benchmarks.bench_endpoints --only 'stock_aggregate|watchlists/all' --error-rate 0.02 --row-padding 500
+"""
+import argparse
+import itertools
+import json
+import platform
+import re
+import resource
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+
+from benchmarks._django import setup_django
+from benchmarks.bench_ticker_search import make_universe
+from benchmarks.fake_polygon import DAY_MS, NEWS_TICKERS, FakePolygonProcess
+
+PASSWORD = 'bench-password-1'
+START_MS = 1_600_000_000_000
+INDICATORS = 'sma:20,ema:50,rsi:14,macd,bbands'
+BULK_SIZE = 20
+# Unique suffixes for names and tickers created while benchmarking
+SEQUENCE = itertools.count()
+
+
+class Request:
+    def __init__(self, method, path, data=None, cookies=None, stream=False):
+        self.method = method
+        self.path = path
+        self.data = data
+        self.cookies = cookies or {}
+        # Endless event stream: timed to its first event
+        self.stream = stream
+
+
+class Worker:
+    def __init__(self, index, user, watchlist_ids, tickers, access, refresh):
+        self.index = index
+        self.user = user
+        self.watchlist_id = watchlist_ids[0]
+        self.tickers = tickers
+        self.access = access
+        self.refresh = refresh
+        # Tickers added by bulk_add, for bulk_remove to take away again
+        self.added = []
+
+
+def _date(ms):
+    return time.strftime('%Y-%m-%d', time.gmtime(ms / 1000))
+
+
+def _window(days):
+    return f'from={_date(START_MS)}&to={_date(START_MS + (days - 1) * DAY_MS)}'
+
+
+def _aggregates_query(worker, i, days):
+    return f'stockTicker={worker.tickers[i % len(worker.tickers)]}&multiplier=1&timespan=day&{_window(days)}'
+
+
+def _bulk_add(worker, i, days):
+    tickers = [f'B{next(SEQUENCE)}'[:10] for _ in range(BULK_SIZE)]
+    worker.added.extend(tickers)
+    return Request('post', f'/api/watchlists/{worker.watchlist_id}/bulk_add',
+                   {'items': [{'ticker': ticker, 'name': 'Bench'} for ticker in tickers]})
+
+
+def _bulk_remove(worker, i, days):
+    tickers, worker.added = worker.added[:BULK_SIZE], worker.added[BULK_SIZE:]
+    return Request('post', f'/api/watchlists/{worker.watchlist_id}/bulk_remove', {'tickers': tickers or ['NONE']})
+
+
+def _logout(worker, i, days):
+    from core.token_blacklist import RefreshToken
+    # Logging out blacklists the token, so each request brings a fresh one
+    return Request('post', '/api/logout', cookies={'refresh_token': str(RefreshToken.for_user(worker.user))})
+
+
+# Route (as written in core/urls.py) -> (worker, request number, days of bars) -> Request
+SCENARIOS = {
+    'register': lambda w, i, days: Request('post', '/api/register',
+                                           {'username': f'new-{next(SEQUENCE)}', 'password': PASSWORD}),
+    'login': lambda w, i, days: Request('post', '/api/login', {'username': w.user.username, 'password': PASSWORD}),
+    'refresh_token': lambda w, i, days: Request('post', '/api/refresh_token', cookies={'refresh_token': w.refresh}),
+    'logout': _logout,
+    'watchlists/create': lambda w, i, days: Request(
+        'post', '/api/watchlists/create', {'name': f'new {next(SEQUENCE)}'}
+    ),
+    'watchlists/all': lambda w, i, days: Request('get', '/api/watchlists/all'),
+    'watchlists/quotes': lambda w, i, days: Request('get', '/api/watchlists/quotes'),
+    'watchlists/<int:id>/add_ticker': lambda w, i, days: Request(
+        'post', f'/api/watchlists/{w.watchlist_id}/add_ticker', {'ticker': f'A{next(SEQUENCE)}'[:10], 'name': 'Bench'}
+    ),
+    'watchlists/remove_ticker': lambda w, i, days: Request('delete', '/api/watchlists/remove_ticker'),
+    'watchlists/<int:id>/bulk_add': _bulk_add,
+    'watchlists/<int:id>/bulk_remove': _bulk_remove,
+    'watchlists/<int:id>/reorder': lambda w, i, days: Request(
+        'put', f'/api/watchlists/{w.watchlist_id}/reorder', {'tickers': w.tickers[i % 2::2]}
+    ),
+    'watchlists/<int:id>/analytics': lambda w, i, days: Request(
+        'get', f'/api/watchlists/{w.watchlist_id}/analytics?{_window(days)}'
+    ),
+    'watchlists/<int:id>/': lambda w, i, days: Request('get', f'/api/watchlists/{w.watchlist_id}/'),
+    'search_tickers': lambda w, i, days: Request(
+        'get', f'/api/search_tickers?search={w.tickers[i % len(w.tickers)][:2]}'
+    ),
+    'stock_aggregate_data': lambda w, i, days: Request(
+        'get', f'/api/stock_aggregate_data?{_aggregates_query(w, i, days)}'
+    ),
+    'stock_indicators': lambda w, i, days: Request(
+        'get', f'/api/stock_indicators?{_aggregates_query(w, i, days)}&indicators={INDICATORS}'
+    ),
+    'stocks/details': lambda w, i, days: Request('get', f'/api/stocks/details?ticker={w.tickers[i % len(w.tickers)]}'),
+    'tickers-snapshot': lambda w, i, days: Request('get', f'/api/tickers-snapshot?tickers={",".join(w.tickers)}'),
+    'news': lambda w, i, days: Request('get', f'/api/news?ticker={NEWS_TICKERS[i % len(NEWS_TICKERS)]}'),
+    'async/search_tickers': lambda w, i, days: Request(
+        'get', f'/api/async/search_tickers?search={w.tickers[i % len(w.tickers)][:2]}'
+    ),
+    'async/stock_aggregate_data': lambda w, i, days: Request(
+        'get', f'/api/async/stock_aggregate_data?{_aggregates_query(w, i, days)}'
+    ),
+    'async/stocks/details': lambda w, i, days: Request(
+        'get', f'/api/async/stocks/details?ticker={w.tickers[i % len(w.tickers)]}'
+    ),
+    'async/tickers-snapshot': lambda w, i, days: Request(
+        'get', f'/api/async/tickers-snapshot?tickers={",".join(w.tickers)}'
+    ),
+    'async/news': lambda w, i, days: Request('get', f'/api/async/news?ticker={NEWS_TICKERS[i % len(NEWS_TICKERS)]}'),
+    'stream/quotes': lambda w, i, days: Request('get', f'/api/stream/quotes?tickers={",".join(w.tickers[:10])}',
+                                                stream=True),
+    'metrics': lambda w, i, days: Request('get', '/api/metrics'),
+    'user_info': lambda w, i, days: Request('get', '/api/user_info'),
+}
+
+
+def percentile(ordered, p):
+    return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+
+def reset_peak_rss() -> bool:
+    # Linux: writing 5 to clear_refs resets VmHWM, the peak resident set size
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_mib() -> float:
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+
+
+def first_event(path, cookies):
+    from asgiref.sync import async_to_sync
+    from django.test import AsyncClient
+
+    async def fetch():
+        client = AsyncClient(raise_request_exception=False)
+        for name, value in cookies.items():
+            client.cookies[name] = value
+        response = await client.get(path)
+        if response.streaming:
+            chunks = aiter(response.streaming_content)
+            await anext(chunks)
+            await chunks.aclose()
+        return response.status_code
+
+    return async_to_sync(fetch)()
+
+
+def send(client, worker, request) -> int:
+    client.cookies['access_token'] = worker.access
+    for name, value in request.cookies.items():
+        client.cookies[name] = value
+    if request.stream:
+        return first_event(request.path, {name: morsel.value for name, morsel in client.cookies.items()})
+    if request.method == 'get':
+        response = client.get(request.path)
+    else:
+        data = json.dumps(request.data) if request.data is not None else ''
+        response = getattr(client, request.method)(request.path, data, content_type='application/json')
+    if response.streaming:
+        b''.join(response.streaming_content)
+    return response.status_code
+
+
+def drive(worker, scenario, count, warmup, days, samples, ready):
+    from django.db import connection, connections
+    from django.test import Client
+    from django.test.utils import CaptureQueriesContext
+
+    client = Client(raise_request_exception=False)
+    try:
+        for i in range(warmup):
+            send(client, worker, scenario(worker, i, days))
+        ready.wait()
+        for i in range(warmup, warmup + count):
+            request = scenario(worker, i, days)
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                status = send(client, worker, request)
+                elapsed = time.perf_counter() - start
+            samples.append((elapsed, len(queries), status))
+    finally:
+        connections.close_all()
+
+
+def run_endpoint(route, workers, concurrency, requests, warmup, days):
+    scenario = SCENARIOS[route]
+    samples = []
+    # Everyone done warming up: the clock starts
+    ready = threading.Barrier(concurrency + 1)
+    threads = [
+        threading.Thread(
+            target=drive,
+            args=(workers[k], scenario, requests // concurrency + (k < requests % concurrency), warmup, days, samples,
+                  ready)
+        )
+        for k in range(concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    ready.wait()
+    rss_per_endpoint = reset_peak_rss()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+
+    latencies = sorted(sample[0] * 1000 for sample in samples)
+    queries = [sample[1] for sample in samples]
+    statuses = Counter(str(sample[2]) for sample in samples)
+    return {
+        'endpoint': route,
+        'method': scenario(workers[0], 0, days).method.upper(),
+        'concurrency': concurrency,
+        'requests': len(samples),
+        'statuses': dict(sorted(statuses.items())),
+        'errors': sum(count for status, count in statuses.items() if not status.startswith(('2', '3'))),
+        'latency_ms': {
+            'mean': round(statistics.mean(latencies), 3),
+            'p50': round(percentile(latencies, 0.5), 3),
+            'p95': round(percentile(latencies, 0.95), 3),
+            'p99': round(percentile(latencies, 0.99), 3),
+            'max': round(latencies[-1], 3),
+        },
+        'throughput_rps': round(len(samples) / wall, 2),
+        'queries': {'mean': round(statistics.mean(queries), 2), 'max': max(queries)},
+        'peak_rss_mib': round(peak_rss_mib(), 1),
+        'rss_scope': 'endpoint' if rss_per_endpoint else 'process',
+    }
+
+
+def seed(count, watchlists, watchlist_size):
+    from django.contrib.auth.hashers import make_password
+    from django.contrib.auth.models import User
+    from rest_framework_simplejwt.tokens import AccessToken
+
+    from core.models import Watchlist, WatchlistItem
+    from core.ticker_index import upsert_ticker_symbols
+    from core.token_blacklist import RefreshToken
+
+    universe = make_universe(max(2000, watchlist_size * 4))
+    upsert_ticker_symbols(universe)
+    password = make_password(PASSWORD)
+    users = User.objects.bulk_create(User(username=f'bench-{k}', password=password) for k in range(count))
+    workers = []
+    for k, user in enumerate(users):
+        lists = Watchlist.objects.bulk_create(Watchlist(user=user, name=f'bench {n}') for n in range(watchlists))
+        offset = k * watchlist_size % len(universe)
+        tickers = [row['ticker'] for row in (universe * 2)[offset:offset + watchlist_size]]
+        WatchlistItem.objects.bulk_create(
+            WatchlistItem(watchlist=watchlist, ticker=ticker, name='Bench', position=position)
+            for watchlist in lists
+            for position, ticker in enumerate(tickers)
+        )
+        workers.append(Worker(k, user, [w.id for w in lists], tickers,
+                              str(AccessToken.for_user(user)), str(RefreshToken.for_user(user))))
+    return workers
+
+
+def routes(only, skip):
+    from core.urls import urlpatterns
+
+    selected, missing = [], []
+    for pattern in urlpatterns:
+        route = str(pattern.pattern)
+        if (only and not re.search(only, route)) or (skip and re.search(skip, route)):
+            continue
+        (selected if route in SCENARIOS else missing).append(route)
+    return selected, missing
+
+
+def metadata(args):
+    import django
+    from django.conf import settings
+    from django.db import connection
+
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = ''
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'git_commit': commit or None,
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'database': connection.vendor,
+        'cache': settings.CACHES[settings.STOCK_API_CACHE_ALIAS]['BACKEND'].rsplit('.', 1)[-1],
+        'args': {name: value for name, value in vars(args).items() if name not in ('json', 'compare')},
+    }
+
+
+def print_table(results):
+    print(f'{"endpoint":<32} {"conc":>4} {"reqs":>5} {"err":>4} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} '
+          f'{"req/s":>8} {"q/req":>6} {"q max":>5} {"rss MiB":>8}')
+    for r in results:
+        latency = r['latency_ms']
+        print(f'{r["endpoint"]:<32} {r["concurrency"]:>4} {r["requests"]:>5} {r["errors"]:>4} '
+              f'{latency["p50"]:>8.1f} {latency["p95"]:>8.1f} {latency["p99"]:>8.1f} {r["throughput_rps"]:>8.1f} '
+              f'{r["queries"]["mean"]:>6.1f} {r["queries"]["max"]:>5} {r["peak_rss_mib"]:>8.1f}')
+
+
+def print_comparison(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    before = {(r['endpoint'], r['concurrency']): r for r in baseline['results']}
+
+    def change(new, old):
+        return f'{(new - old) / old * 100:+.0f}%' if old else '-'
+
+    print(f'\nvs. {baseline_path} ({baseline["meta"].get("git_commit")}, {baseline["meta"]["timestamp"]})')
+    print(f'{"endpoint":<32} {"conc":>4} {"p50":>7} {"p95":>7} {"p99":>7} {"req/s":>7} {"q/req":>7}')
+    for r in results:
+        old = before.get((r['endpoint'], r['concurrency']))
+        if old is None:
+            continue
+        print(f'{r["endpoint"]:<32} {r["concurrency"]:>4} '
+              + ' '.join(f'{change(r["latency_ms"][p], old["latency_ms"][p]):>7}' for p in ('p50', 'p95', 'p99'))
+              + f' {change(r["throughput_rps"], old["throughput_rps"]):>7}'
+              + f' {change(r["queries"]["mean"], old["queries"]["mean"]):>7}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8])
+    parser.add_argument('--requests', type=int, default=100, help='measured requests per endpoint and concurrency')
+    parser.add_argument('--warmup', type=int, default=3, help='untimed requests per worker first')
+    parser.add_argument('--only', help='regex: only routes matching it')
+    parser.add_argument('--skip', help='regex: leave out routes matching it')
+    parser.add_argument('--watchlists', type=int, default=5, help='watchlists per user')
+    parser.add_argument('--watchlist-size', type=int, default=25, help='tickers per watchlist')
+    parser.add_argument('--latency-ms', type=float, default=20, help='fake upstream latency')
+    parser.add_argument('--bars', type=int, default=1000, help='daily bars per ticker upstream')
+    parser.add_argument('--news', type=int, default=2000, help='articles in the upstream news feed')
+    parser.add_argument('--row-padding', type=int, default=0, help='filler bytes per upstream result row')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of upstream requests failing with 503')
+    parser.add_argument('--json', help='write the results here')
+    parser.add_argument('--compare', help='results of an earlier run (--json) to compare against')
+    args = parser.parse_args()
+
+    fake = FakePolygonProcess(
+        latency_ms=args.latency_ms, bars=args.bars, news=args.news,
+        row_padding=args.row_padding, error_rate=args.error_rate,
+    )
+    try:
+        setup_django(stock_api_base_url=fake.base_url)
+        from django.db import connection
+        from django.test.utils import setup_test_environment
+
+        selected, missing = routes(args.only, args.skip)
+        for route in missing:
+            print(f'no scenario for route {route!r}, skipped', file=sys.stderr)
+
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            workers = seed(max(args.concurrency), args.watchlists, args.watchlist_size)
+            results = []
+            for route in selected:
+                for concurrency in args.concurrency:
+                    result = run_endpoint(route, workers, concurrency, args.requests, args.warmup, args.bars)
+                    results.append(result)
+                    print(f'{route} x{concurrency}: p50 {result["latency_ms"]["p50"]:.1f} ms', file=sys.stderr)
+            print_table(results)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+    finally:
+        fake.stop()
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'meta': metadata(args), 'results': results, 'skipped': missing}, f, indent=2)
+    if args.compare:
+        print_comparison(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""
+CPU time and allocations per request for large upstream responses, by how the body gets written:
+
+    parse + json     parsed upstream JSON, serialized again with the stdlib encoder (the old way)
+    parse + orjson   the same through orjson (STOCK_JSON_ENCODER)
+    passthrough      Polygon's body spliced into the envelope as bytes (STOCK_API_PASSTHROUGH)
+
+Ticker details and (point-in-time) search can pass through; the market snapshot is rebuilt by its
+view, so only the encoder applies. Warm: served from the response cache, which
+for parsed data skips parsing too. Cold: the cache is dropped before every request, so each one
+fetches (fake, zero-latency) upstream and parses. CPU is this process's only: the fake server runs
+in its own. Allocations are traced for one request: the peak, and the blocks still allocated when
+the response is done.
+
+    python -m benchmarks.bench_json_passthrough --row-padding 32768 --requests 50
+"""
+import argparse
+import gc
+import time
+import tracemalloc
+
+from benchmarks._django import setup_django
+from benchmarks.fake_polygon import FakePolygonProcess
+
+MODES = {
+    'parse + json': {'STOCK_API_PASSTHROUGH': False, 'STOCK_JSON_ENCODER': 'json'},
+    'parse + orjson': {'STOCK_API_PASSTHROUGH': False, 'STOCK_JSON_ENCODER': 'orjson'},
+    'passthrough': {'STOCK_API_PASSTHROUGH': True, 'STOCK_JSON_ENCODER': 'orjson'},
+}
+# name -> (url, passes through)
+ENDPOINTS = {
+    'details': ('/api/stocks/details?ticker=AAPL', True),
+    'search (date)': ('/api/search_tickers?search=APP&limit=20&date=2024-01-02', True),
+    'snapshot (market)': ('/api/tickers-snapshot', False),
+}
+
+
+def drop_caches():
+    from django.conf import settings
+    from django.core.cache import caches
+
+    from core.stockapi.polygon_client import PolygonClient
+
+    PolygonClient().cache.local.clear()
+    caches[settings.STOCK_API_CACHE_ALIAS].clear()
+
+
+def measure(client, url, requests, cold):
+    def get():
+        if cold:
+            drop_caches()
+        response = client.get(url)
+        assert response.status_code == 200, response.content[:200]
+        return response
+
+    size = len(get().content)
+    gc.collect()
+    cpu = 0.0
+    for _ in range(requests):
+        if cold:
+            drop_caches()
+        start = time.process_time()
+        response = client.get(url)
+        cpu += time.process_time() - start
+        assert response.status_code == 200, response.content[:200]
+
+    # Allocations of one more request: peak traced memory, and blocks still held while the response lives
+    if cold:
+        drop_caches()
+    gc.collect()
+    tracemalloc.start()
+    response = client.get(url)
+    _, peak = tracemalloc.get_traced_memory()
+    blocks = sum(stat.count for stat in tracemalloc.take_snapshot().statistics('filename'))
+    tracemalloc.stop()
+    del response
+    return {'cpu_ms': cpu / requests * 1000, 'peak_kib': peak / 1024, 'blocks': blocks, 'size_kib': size / 1024}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=50, help='timed requests per endpoint, mode and cache state')
+    parser.add_argument('--row-padding', type=int, default=32768,
+                        help='bytes of filler per details/search/snapshot row, to make responses large')
+    parser.add_argument('--universe', type=int, default=200, help='rows of the market snapshot')
+    parser.add_argument('--only', nargs='+', choices=list(ENDPOINTS), help='just these endpoints')
+    args = parser.parse_args()
+
+    fake = FakePolygonProcess(row_padding=args.row_padding, universe=args.universe)
+    setup_django(stock_api_base_url=fake.base_url)
+
+    from django.contrib.auth.models import User
+    from django.db import connection
+    from django.test import Client, override_settings
+    from django.test.utils import setup_test_environment
+    from rest_framework_simplejwt.tokens import AccessToken
+
+    from core.json_codec import orjson
+
+    if orjson is None:
+        print('orjson not installed: "parse + orjson" and "passthrough" encode with json')
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        client = Client()
+        client.cookies['access_token'] = str(AccessToken.for_user(User.objects.create(username='bench')))
+        print(f'{"endpoint":<18} {"cache":<5} {"mode":<15} {"KiB":>8} {"cpu ms":>8} {"peak KiB":>9} {"blocks":>8}')
+        for name, (url, passes_through) in ENDPOINTS.items():
+            if args.only and name not in args.only:
+                continue
+            for cold in (False, True):
+                for mode, overrides in MODES.items():
+                    if mode == 'passthrough' and not passes_through:
+                        continue
+                    with override_settings(**overrides):
+                        drop_caches()
+                        result = measure(client, url, args.requests, cold)
+                    print(f'{name:<18} {"cold" if cold else "warm":<5} {mode:<15} {result["size_kib"]:>8.0f} '
+                          f'{result["cpu_ms"]:>8.2f} {result["peak_kib"]:>9.0f} {result["blocks"]:>8}')
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        fake.stop()
+
+
+if __name__ == '__main__':
+    main()
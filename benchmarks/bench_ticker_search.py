@@ -0,0 +1,102 @@
+"""
+search_tickers autocomplete: the in-memory TickerIndex over a synthetic ~10k-symbol universe vs. a
+round trip to (fake) upstream. Queries replay typing sessions, one query per keystroke.
+
+    python -m benchmarks.bench_ticker_search --symbols 10000 --latency-ms 50
+"""
+import argparse
+import random
+import statistics
+import time
+
+from benchmarks._django import setup_django
+from benchmarks.fake_polygon import FakePolygonProcess
+
+WORDS = ('Apple Micro Global Energy Capital Bio Pharma Systems Holdings Financial Resources Networks Motors '
+         'Therapeutics Semiconductor Realty Trust Brands Foods Airlines Mining Gold Silver Solar Wind Cloud Data '
+         'Software Health Medical Insurance Bank Bancorp Partners Industries Technologies Communications Retail '
+         'Entertainment Gaming Logistics Shipping Aerospace Defense Water Power Utilities Chemicals Materials').split()
+LETTERS = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+
+
+def make_universe(count, seed=7):
+    rng = random.Random(seed)
+    tickers = set()
+    while len(tickers) < count:
+        tickers.add(''.join(rng.choice(LETTERS) for _ in range(rng.choice((1, 2, 3, 3, 4, 4, 4, 5)))))
+    rows = []
+    for ticker in sorted(tickers):
+        name = ' '.join(rng.sample(WORDS, rng.randint(1, 3))) + rng.choice((' Inc.', ' Corp.', ' Ltd.', ' Group'))
+        rows.append({'ticker': ticker, 'name': name, 'market': 'stocks', 'locale': 'us', 'type': 'CS',
+                     'primary_exchange': rng.choice(('XNAS', 'XNYS')), 'currency_name': 'usd', 'active': True})
+    return rows
+
+
+def keystrokes(rows, sessions, seed=11):
+    """Every prefix of a mix of symbols and company-name words, like a user typing into the search box."""
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(sessions):
+        row = rng.choice(rows)
+        target = row['ticker'] if rng.random() < 0.5 else rng.choice(row['name'].split()[:-1] or [row['name']])
+        queries.extend(target[:i] for i in range(1, len(target) + 1))
+    return queries
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+
+    def pick(p):
+        return samples[min(len(samples) - 1, int(p * len(samples)))] * 1000
+
+    return statistics.mean(samples) * 1000, pick(0.5), pick(0.99)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--symbols', type=int, default=10_000)
+    parser.add_argument('--sessions', type=int, default=500)
+    parser.add_argument('--limit', type=int, default=50)
+    parser.add_argument('--latency-ms', type=float, default=50)
+    parser.add_argument('--upstream-queries', type=int, default=200)
+    args = parser.parse_args()
+
+    server = FakePolygonProcess(latency_ms=args.latency_ms)
+    setup_django(server.base_url)
+
+    from django.conf import settings
+    from core.stockapi.polygon_client import PolygonClient
+    from core.ticker_index import TickerIndex
+
+    rows = make_universe(args.symbols)
+    start = time.perf_counter()
+    index = TickerIndex(rows)
+    print(f'index build: {len(index)} symbols in {(time.perf_counter() - start) * 1000:.1f} ms')
+
+    queries = keystrokes(rows, args.sessions)
+    samples, hits = [], 0
+    for query in queries:
+        start = time.perf_counter()
+        results = index.search(query, args.limit)
+        samples.append(time.perf_counter() - start)
+        hits += bool(results)
+
+    # Every distinct query misses the response cache, as it would while typing
+    settings.STOCK_API_CACHE_TTLS = {**settings.STOCK_API_CACHE_TTLS, 'search_tickers': 0}
+    client = PolygonClient()
+    upstream = []
+    for query in queries[:args.upstream_queries]:
+        start = time.perf_counter()
+        client.get_search_tickers(search=query, limit=args.limit)
+        upstream.append(time.perf_counter() - start)
+
+    print(f'{"source":<9} {"queries":>8} {"mean ms":>9} {"p50 ms":>8} {"p99 ms":>8}')
+    for name, values in (('index', samples), ('upstream', upstream)):
+        mean, p50, p99 = percentiles(values)
+        print(f'{name:<9} {len(values):>8} {mean:>9.3f} {p50:>8.3f} {p99:>8.3f}')
+    print(f'index answered {hits}/{len(queries)} keystrokes locally')
+    server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,165 @@
+"""
+Watchlist analytics for watchlists of 10, 100 and 500 tickers.
+
+First the computation alone: the vectorized engine (align, statistics, correlation matrix, JSON) vs.
+the same numbers computed ticker by ticker and pair by pair. Then the endpoint against (fake) upstream
+in a throwaway test database: cold (bars fetched concurrently and stored), warm bar store (memo
+dropped) and memoized.
+
+    python -m benchmarks.bench_watchlist_analytics --sizes 10 100 500 --days 504 --latency-ms 20
+"""
+import argparse
+import json
+import math
+import time
+
+import numpy as np
+
+from benchmarks._django import setup_django
+from benchmarks.fake_polygon import DAY_MS, FakePolygonProcess
+
+START_MS = 1_600_000_000_000
+
+
+def random_series(count, days, seed=5):
+    """Random-walk closes with correlated moves and ~2% of bars missing, as ``{"t", "c"}`` arrays."""
+    rng = np.random.default_rng(seed)
+    market = rng.normal(0, 0.01, days)
+    series = []
+    for _ in range(count):
+        returns = rng.uniform(0.2, 1.5) * market + rng.normal(0, 0.015, days)
+        keep = rng.random(days) > 0.02
+        series.append({
+            't': (START_MS + np.arange(days, dtype=np.int64) * DAY_MS)[keep],
+            'c': (rng.uniform(20, 500) * np.cumprod(1 + returns))[keep],
+        })
+    return series
+
+
+def vectorized(tickers, series, window):
+    from core.timeseries.analytics import align_closes, compute_analytics
+    from core.watchlist_analytics import _payload
+
+    aligned = align_closes(series)
+    results = compute_analytics(aligned['c'][:, 1:], aligned['c'][:, 0], window)
+    return json.dumps(_payload(tickers[1:], tickers[0], window, aligned['t'], results))
+
+
+def looped(series, window):
+    """Per ticker and per pair, on dicts keyed by timestamp."""
+    closes = [dict(zip(s['t'].tolist(), s['c'].tolist())) for s in series]
+    index = sorted(set().union(*closes))
+    returns = []
+    for by_t in closes:
+        daily = {}
+        for previous, t in zip(index, index[1:]):
+            if previous in by_t and t in by_t:
+                daily[t] = by_t[t] / by_t[previous] - 1
+        returns.append(daily)
+    out = []
+    for by_t, daily in zip(closes, returns):
+        values = list(daily.values())
+        vols = [np.std(values[i - window:i], ddof=1) * math.sqrt(252) for i in range(window, len(values) + 1)]
+        peak, worst = -math.inf, 0.0
+        for t in index:
+            if t in by_t:
+                peak = max(peak, by_t[t])
+                worst = min(worst, by_t[t] / peak - 1)
+        out.append((vols, worst))
+    corr = [[0.0] * len(returns) for _ in returns]
+    for i, a in enumerate(returns):
+        for j, b in enumerate(returns):
+            common = a.keys() & b.keys()
+            x = np.fromiter((a[t] for t in common), float)
+            y = np.fromiter((b[t] for t in common), float)
+            corr[i][j] = float(np.corrcoef(x, y)[0, 1])
+    return out, corr
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return (time.perf_counter() - start) * 1000, result
+
+
+def bench_compute(sizes, days, window, skip_loops):
+    print(f'computation, {days} days, window {window}')
+    print(f'{"tickers":>8} {"numpy ms":>9} {"loops ms":>10} {"speedup":>8} {"json KiB":>9}')
+    for size in sizes:
+        series = random_series(size + 1, days)
+        tickers = ['SPY'] + [f'T{i:04d}' for i in range(size)]
+        engine, payload = timed(lambda: vectorized(tickers, series, window))
+        if skip_loops:
+            print(f'{size:>8} {engine:>9.1f} {"-":>10} {"-":>8} {len(payload) / 1024:>9.0f}')
+            continue
+        loops, _ = timed(lambda: looped(series[1:], window))
+        print(f'{size:>8} {engine:>9.1f} {loops:>10.1f} {loops / engine:>7.1f}x {len(payload) / 1024:>9.0f}')
+
+
+def bench_endpoint(sizes, days, fake):
+    from django.contrib.auth.models import User
+    from django.core.cache import caches
+    from django.conf import settings
+    from django.db import connection
+    from django.test import Client
+    from django.test.utils import setup_test_environment
+    from rest_framework_simplejwt.tokens import AccessToken
+
+    from core.models import Watchlist, WatchlistItem
+    from core.watchlist_analytics import _memo
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        user = User.objects.create(username='bench')
+        client = Client()
+        client.cookies['access_token'] = str(AccessToken.for_user(user))
+        end = time.strftime('%Y-%m-%d', time.gmtime((START_MS + (days - 1) * DAY_MS) / 1000))
+        query = f'from=2020-09-13&to={end}'
+
+        print(f'\nendpoint, {settings.STOCK_WATCHLIST_ANALYTICS_WORKERS} fetch workers')
+        print(f'{"tickers":>8} {"cold ms":>9} {"warm bars ms":>13} {"memoized ms":>12}')
+        for size in sizes:
+            watchlist = Watchlist.objects.create(user=user, name=f'bench {size}')
+            WatchlistItem.objects.bulk_create(
+                WatchlistItem(watchlist=watchlist, ticker=f'W{size}X{i:04d}', name='', position=i) for i in range(size)
+            )
+            url = f'/api/watchlists/{watchlist.id}/analytics?{query}'
+
+            def get():
+                response = client.get(url)
+                assert response.status_code == 200, response.content[:200]
+
+            cold, _ = timed(get)
+            _memo.local.clear()
+            caches[settings.STOCK_API_CACHE_ALIAS].clear()
+            warm, _ = timed(get)
+            memoized, _ = timed(get)
+            print(f'{size:>8} {cold:>9.1f} {warm:>13.1f} {memoized:>12.2f}')
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 500])
+    parser.add_argument('--days', type=int, default=504, help='daily bars per ticker (two years by default)')
+    parser.add_argument('--window', type=int, default=20)
+    parser.add_argument('--latency-ms', type=float, default=20)
+    parser.add_argument('--skip-loops', action='store_true', help='only time the vectorized engine')
+    parser.add_argument('--skip-endpoint', action='store_true', help='only time the computation (no database needed)')
+    args = parser.parse_args()
+
+    fake = None if args.skip_endpoint else FakePolygonProcess(latency_ms=args.latency_ms, bars=args.days)
+    setup_django(stock_api_base_url=fake and fake.base_url)
+    try:
+        bench_compute(args.sizes, args.days, args.window, args.skip_loops)
+        if fake:
+            bench_endpoint(args.sizes, args.days, fake)
+    finally:
+        if fake:
+            fake.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,272 @@
+"""
+Local stand-in for the parts of the Polygon REST API that PolygonClient talks to.
+
+Serves deterministic synthetic payloads with a configurable per-request latency so
+benchmarks measure our side of the round trip rather than the internet. Payloads can be
+padded, and a fraction of requests can be failed with 503s to exercise retries.
+
+    python -m benchmarks.fake_polygon --port 8765 --latency-ms 50 --row-padding 200 --error-rate 0.01
+"""
+import argparse
+import json
+import multiprocessing
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlencode, urlparse, parse_qs
+
+DAY_MS = 86_400_000
+AGGS_RE = re.compile(r'^/v2/aggs/ticker/(?P<ticker>[^/]+)/range/(?P<multiplier>\d+)/(?P<timespan>\w+)/[^/]+/[^/]+$')
+DETAILS_RE = re.compile(r'^/v3/reference/tickers/(?P<ticker>[^/]+)$')
+
+
+def make_bars(ticker, count, start_ms=1_600_000_000_000, step_ms=DAY_MS):
+    bars = []
+    price = 100.0 + (sum(map(ord, ticker)) % 50)
+    for i in range(count):
+        o = price
+        c = price * (1 + ((i * 7919) % 201 - 100) / 10_000)
+        bars.append({
+            'v': 1_000_000 + (i * 31) % 50_000,
+            'vw': round((o + c) / 2, 4),
+            'o': round(o, 4),
+            'c': round(c, 4),
+            'h': round(max(o, c) * 1.01, 4),
+            'l': round(min(o, c) * 0.99, 4),
+            't': start_ms + i * step_ms,
+            'n': 1000 + i % 100,
+        })
+        price = c
+    return bars
+
+
+NEWS_TICKERS = ['AAPL', 'MSFT', 'NVDA', 'AMZN', 'GOOGL', 'META', 'TSLA', 'AMD', 'INTC', 'NFLX']
+
+
+def make_news(count, start=1_704_067_200, step_s=600):
+    """``count`` articles, oldest first, ``step_s`` apart; each tags three tickers of NEWS_TICKERS."""
+    articles = []
+    for i in range(count):
+        tickers = [NEWS_TICKERS[(i + k) % len(NEWS_TICKERS)] for k in range(3)]
+        articles.append({
+            'id': f'news-{i:06d}',
+            'title': f'{tickers[0]} headline {i}',
+            'tickers': tickers,
+            'published_utc': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(start + i * step_s)),
+            'article_url': f'https://example.com/news/{i}',
+            'description': 'Lorem ipsum ' * 30,
+            'publisher': {'name': 'Example Wire'},
+        })
+    return articles
+
+
+def make_snapshot_row(ticker):
+    base = 100.0 + (sum(map(ord, ticker)) % 50)
+    return {
+        'ticker': ticker,
+        'todaysChange': 1.25,
+        'todaysChangePerc': 1.25 / base * 100,
+        'updated': int(time.time() * 1e9),
+        'day': {'o': base, 'h': base * 1.02, 'l': base * 0.98, 'c': base + 1.25, 'v': 1_234_567, 'vw': base},
+        'prevDay': {'o': base - 1, 'h': base, 'l': base - 2, 'c': base, 'v': 1_111_111, 'vw': base - 0.5},
+        'lastTrade': {'p': base + 1.25, 's': 100, 't': int(time.time() * 1e9)},
+    }
+
+
+class FakePolygonHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # headers and body go out in separate writes; don't let Nagle + delayed ACK add ~40ms to each
+    disable_nagle_algorithm = True
+    server: 'FakePolygonServer'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        parsed = urlparse(self.path)
+        query = {k: v[-1] for k, v in parse_qs(parsed.query).items()}
+        with self.server.lock:
+            self.server.request_count += 1
+            failed = self.server.error_rate and self.server.random.random() < self.server.error_rate
+
+        if failed:
+            status, body = 503, {'status': 'ERROR', 'message': 'Injected failure'}
+        else:
+            status, body = self.route(parsed.path, query)
+            self.pad(body)
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def route(self, path, query):
+        match = AGGS_RE.match(path)
+        if match:
+            count = min(int(query.get('limit', 5000)), self.server.bars)
+            page = int(query.get('cursor', 0))
+            bars = make_bars(match['ticker'], count, start_ms=1_600_000_000_000 + page * count * DAY_MS)
+            body = {'ticker': match['ticker'], 'status': 'OK', 'adjusted': True,
+                    'queryCount': count, 'resultsCount': count, 'results': bars}
+            return 200, self.paginate(body, path, query, page)
+
+        if path == '/v2/snapshot/locale/us/markets/stocks/tickers':
+            tickers = query.get('tickers')
+            symbols = tickers.split(',') if tickers else [f'T{i:04d}' for i in range(self.server.universe)]
+            return 200, {'status': 'OK', 'count': len(symbols), 'tickers': [make_snapshot_row(t) for t in symbols]}
+
+        if path == '/v3/reference/tickers' and 'search' not in query:
+            # The whole universe (as in the snapshot), in pages
+            limit = int(query.get('limit', 100))
+            page = int(query.get('cursor', 0))
+            symbols = [f'T{i:04d}' for i in range(self.server.universe)][page * limit:(page + 1) * limit]
+            results = [{'ticker': t, 'name': f'{t} Corp', 'market': 'stocks', 'locale': 'us', 'type': 'CS',
+                        'active': True, 'currency_name': 'usd'} for t in symbols]
+            body = {'status': 'OK', 'count': len(results), 'results': results}
+            if (page + 1) * limit < self.server.universe:
+                params = {k: v for k, v in query.items() if k != 'apiKey'}
+                params['cursor'] = page + 1
+                body['next_url'] = f'{self.server.base_url}{path}?{urlencode(params)}'
+            return 200, body
+
+        if path == '/v3/reference/tickers':
+            search = query.get('search', '').upper()
+            limit = int(query.get('limit', 100))
+            results = [{'ticker': f'{search}{i}', 'name': f'{search} Corp {i}', 'market': 'stocks',
+                        'locale': 'us', 'active': True} for i in range(min(limit, 20))]
+            return 200, {'status': 'OK', 'count': len(results), 'results': results}
+
+        match = DETAILS_RE.match(path)
+        if match:
+            ticker = match['ticker'].upper()
+            return 200, {'status': 'OK', 'results': {'ticker': ticker, 'name': f'{ticker} Inc.', 'market': 'stocks',
+                                                     'locale': 'us', 'active': True, 'currency_name': 'usd',
+                                                     'description': 'Synthetic company. ' * 20}}
+
+        if path == '/v2/reference/news':
+            limit = int(query.get('limit', 10))
+            page = int(query.get('cursor', 0))
+            articles = [article for article in self.server.news if self.news_matches(article, query)]
+            if query.get('order', 'desc') == 'desc':
+                articles.reverse()
+            results = articles[page * limit:(page + 1) * limit]
+            body = {'status': 'OK', 'count': len(results), 'results': results}
+            if (page + 1) * limit < len(articles):
+                params = {k: v for k, v in query.items() if k != 'apiKey'}
+                params['cursor'] = page + 1
+                body['next_url'] = f'{self.server.base_url}{path}?{urlencode(params)}'
+            return 200, body
+
+        return 404, {'status': 'NOT_FOUND', 'message': f'No fake route for {path}'}
+
+    def pad(self, body):
+        """Adds ``row_padding`` bytes of filler to every result row."""
+        if not self.server.padding:
+            return
+        rows = body.get('results', body.get('tickers'))
+        for row in [rows] if isinstance(rows, dict) else rows or []:
+            row['padding'] = self.server.padding
+
+    @staticmethod
+    def news_matches(article, query):
+        published = article['published_utc']
+        return (not query.get('ticker') or query['ticker'] in article['tickers']) \
+            and published >= query.get('published_utc.gte', '') \
+            and published <= query.get('published_utc.lte', '\uffff')
+
+    def paginate(self, body, path, query, page):
+        """Adds a Polygon-style next_url (an opaque cursor plus the original query) until ``pages`` are served."""
+        if page + 1 < self.server.pages:
+            params = {k: v for k, v in query.items() if k != 'apiKey'}
+            params['cursor'] = page + 1
+            body['next_url'] = f'{self.server.base_url}{path}?{urlencode(params)}'
+        return body
+
+
+class FakePolygonServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, host='127.0.0.1', port=0, latency_ms=0, bars=5000, universe=500, pages=1, news=1000,
+                 row_padding=0, error_rate=0.0, seed=7):
+        super().__init__((host, port), FakePolygonHandler)
+        self.latency = latency_ms / 1000
+        self.bars = bars
+        self.universe = universe
+        self.pages = pages
+        self.news = make_news(news)
+        self.padding = 'x' * row_padding
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.request_count = 0
+        self.lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def _serve(ready, kwargs):
+    server = FakePolygonServer(**kwargs)
+    ready.put(server.base_url)
+    server.serve_forever()
+
+
+class FakePolygonProcess:
+    """
+    Runs the fake server in a child process. Benchmarks should prefer this over an in-process
+    server: hundreds of handler threads fighting the benchmark's event loop for the GIL skew results.
+    """
+
+    def __init__(self, **kwargs):
+        ready = multiprocessing.Queue()
+        self.process = multiprocessing.Process(target=_serve, args=(ready, kwargs), daemon=True)
+        self.process.start()
+        self.base_url = ready.get(timeout=10)
+
+    def stop(self):
+        self.process.terminate()
+        self.process.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency-ms', type=float, default=0)
+    parser.add_argument('--bars', type=int, default=5000, help='max bars returned by the aggregates endpoint')
+    parser.add_argument('--universe', type=int, default=500, help='tickers in an unfiltered snapshot')
+    parser.add_argument('--pages', type=int, default=1, help='pages served by aggregates via next_url')
+    parser.add_argument('--news', type=int, default=1000, help='articles in the news feed')
+    parser.add_argument('--row-padding', type=int, default=0, help='bytes of filler added to every result row')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of requests answered with a 503')
+    args = parser.parse_args()
+
+    server = FakePolygonServer(
+        args.host, args.port, args.latency_ms, args.bars, args.universe, args.pages, args.news,
+        args.row_padding, args.error_rate,
+    )
+    print(f'fake polygon listening on {server.base_url}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
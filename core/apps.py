@@ -1,26 +1,13 @@
 from django.apps import AppConfig
 
-from core.stockapi.polygon_client import PolygonClient
-
 
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
 
-    # def ready(self):
-    #     from core.models import TickerSymbol
-    #     try:
-    #         client = PolygonClient()
-    #
-    #         data = client.get_tickers_snapshot(
-    #             tickers=None,
-    #             include_otc=False,
-    #         )
-    #
-    #         if 'tickers' in data:
-    #             for ticker_data in data['tickers']:
-    #                 ticker_symbol = ticker_data.get('ticker')
-    #                 if ticker_symbol:
-    #                     TickerSymbol.objects.get_or_create(ticker=ticker_symbol)
-    #     except Exception as e:
-    #         print(e)
\ No newline at end of file
+    def ready(self):
+        # Connects the signal handlers that evict cached users and track blacklisted tokens,
+        # and the one instrumenting database connections for metrics
+        import core.metrics  # noqa: F401
+        import core.token_blacklist  # noqa: F401
+        import core.user_cache  # noqa: F401
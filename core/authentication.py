@@ -1,11 +1,37 @@
+import functools
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.utils.translation import gettext_lazy as _
 from rest_framework_simplejwt.authentication import JWTAuthentication
-from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from core.user_cache import get_cached_user
 
 
 class CookieJWTAuthentication(JWTAuthentication):
     def authenticate(self, request):
         token = request.COOKIES.get("access_token")
-        print("authentication: ", token)
+        return self.authenticate_cookie(token)
+
+    def get_user(self, validated_token):
+        # Revocation checks compare against the password hash, which the user cache doesn't hold
+        if api_settings.USER_ID_FIELD != 'id' or api_settings.CHECK_REVOKE_TOKEN:
+            return super().get_user(validated_token)
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        user = get_cached_user(user_id)
+        if user is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        return user
+
+    def authenticate_cookie(self, token):
         if not token:
             return None
         try:
@@ -19,3 +45,25 @@ class CookieJWTAuthentication(JWTAuthentication):
             raise AuthenticationFailed(f"Error retrieving user: {str(e)}")
 
 
+def auth_failed_response(error: AuthenticationFailed) -> JsonResponse:
+    """The 401 body DRF would render for ``error``."""
+    detail = error.detail if isinstance(error.detail, dict) else {'detail': error.detail}
+    return JsonResponse(detail, status=401)
+
+
+def async_cookie_jwt_required(view):
+    """Async-view counterpart of CookieJWTAuthentication + IsAuthenticated for non-DRF views."""
+    authenticator = CookieJWTAuthentication()
+
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        try:
+            result = await sync_to_async(authenticator.authenticate)(request)
+        except AuthenticationFailed as e:
+            return auth_failed_response(e)
+        if result is None:
+            return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+        request.user, request.auth = result
+        return await view(request, *args, **kwargs)
+
+    return wrapper
@@ -0,0 +1,254 @@
+from datetime import datetime, time, timedelta
+from itertools import chain, islice
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from core.models import AggregateBar, AggregateCoverage
+from core.stockapi.polygon_client import PolygonClient, VALID_TIMESPANS
+
+# Polygon interprets plain dates in the exchange's timezone
+MARKET_TZ = ZoneInfo("America/New_York")
+# Largest page Polygon's aggregates endpoint will return
+UPSTREAM_LIMIT = 50000
+BAR_FIELDS = ['open', 'high', 'low', 'close', 'volume', 'vwap', 'transactions']
+
+
+def _to_ms(value: str, end: bool = False) -> int:
+    """Polygon accepts either YYYY-MM-DD or a ms timestamp; a date as ``end`` covers the whole day."""
+    if value.isdigit():
+        return int(value)
+    day = datetime.strptime(value, "%Y-%m-%d").date()
+    if end:
+        day += timedelta(days=1)
+    ms = int(datetime.combine(day, time.min, tzinfo=MARKET_TZ).timestamp() * 1000)
+    return ms - 1 if end else ms
+
+
+def _session_start_ms() -> int:
+    """Bars at or after the start of today's session may still change and are never marked as covered."""
+    today = datetime.now(MARKET_TZ).date()
+    return int(datetime.combine(today, time.min, tzinfo=MARKET_TZ).timestamp() * 1000)
+
+
+def is_final_window(to_date: str) -> bool:
+    """Whether the window ends before today's session, so none of its bars can still change."""
+    try:
+        return _to_ms(to_date, end=True) < _session_start_ms()
+    except ValueError:
+        return False
+
+
+def missing_ranges(covered: List[Tuple[int, int]], start: int, end: int) -> List[Tuple[int, int]]:
+    """Sub-ranges of [start, end] not covered by ``covered`` (inclusive ranges sorted by start)."""
+    gaps = []
+    cursor = start
+    for covered_start, covered_end in covered:
+        if covered_end < cursor:
+            continue
+        if covered_start > end:
+            break
+        if covered_start > cursor:
+            gaps.append((cursor, covered_start - 1))
+        cursor = covered_end + 1
+        if cursor > end:
+            break
+    if cursor <= end:
+        gaps.append((cursor, end))
+    return gaps
+
+
+def _fresh_after(series: Dict[str, Any]):
+    """Coverage fetched before this has expired: adjusted bars change with every later split or dividend."""
+    if not series['adjusted']:
+        return None
+    return timezone.now() - timedelta(seconds=settings.STOCK_BARS_ADJUSTED_TTL)
+
+
+def _add_coverage(series: Dict[str, Any], start: int, end: int):
+    # Merge with every overlapping or adjacent range so the table stays one row per contiguous run;
+    # the merged run is as old as its oldest part, and expired ranges it touches are dropped
+    fetched_at, fresh_after = timezone.now(), _fresh_after(series)
+    touching = list(
+        AggregateCoverage.objects.select_for_update()
+        .filter(**series, start__lte=end + 1, end__gte=start - 1)
+        .values_list('id', 'start', 'end', 'fetched_at')
+    )
+    if touching:
+        fresh = [row for row in touching if fresh_after is None or row[3] >= fresh_after]
+        start = min([start, *(row[1] for row in fresh)])
+        end = max([end, *(row[2] for row in fresh)])
+        fetched_at = min([fetched_at, *(row[3] for row in fresh)])
+        AggregateCoverage.objects.filter(id__in=[row[0] for row in touching]).delete()
+    AggregateCoverage.objects.create(**series, start=start, end=end, fetched_at=fetched_at)
+
+
+def _bar(t, o, h, l, c, v, vw=None, n=None) -> Dict[str, Any]:
+    bar = {'v': v, 'o': o, 'c': c, 'h': h, 'l': l, 't': t}
+    if vw is not None:
+        bar['vw'] = vw
+    if n is not None:
+        bar['n'] = n
+    return bar
+
+
+def _gap_bars(
+        client: PolygonClient,
+        series: Dict[str, Any],
+        start: int,
+        end: int,
+        final_before: int,
+        sort: str
+) -> Iterator[Dict[str, Any]]:
+    """Bars of an uncovered range straight from upstream, stored (and marked covered) page by page."""
+    pages = client.iter_aggregate_pages(
+        ticker=series['ticker'],
+        multiplier=series['multiplier'],
+        timespan=series['timespan'],
+        from_date=str(start),
+        to_date=str(end),
+        adjusted=series['adjusted'],
+        sort=sort,
+        page_size=UPSTREAM_LIMIT
+    )
+    lo, hi = start, end
+    for page in pages:
+        results = page.get('results') or []
+        bars = [
+            AggregateBar(
+                **series,
+                timestamp=row['t'],
+                # Floats, so bars read back from the store serialize identically
+                open=float(row['o']),
+                high=float(row['h']),
+                low=float(row['l']),
+                close=float(row['c']),
+                volume=float(row['v']),
+                vwap=float(row['vw']) if row.get('vw') is not None else None,
+                transactions=row.get('n'),
+            )
+            for row in results
+        ]
+        # A page followed by another one only covers the range up to its last bar
+        if results and page.get('next_url'):
+            if sort == 'desc':
+                covered, hi = (results[-1]['t'], hi), results[-1]['t'] - 1
+            else:
+                covered, lo = (lo, results[-1]['t']), results[-1]['t'] + 1
+        else:
+            covered = (lo, hi)
+        with transaction.atomic():
+            AggregateBar.objects.bulk_create(
+                bars,
+                batch_size=1000,
+                update_conflicts=True,
+                unique_fields=['ticker', 'multiplier', 'timespan', 'adjusted', 'timestamp'],
+                update_fields=BAR_FIELDS,
+            )
+            covered_end = min(covered[1], final_before - 1)
+            if covered_end >= covered[0]:
+                _add_coverage(series, covered[0], covered_end)
+
+        for bar in bars:
+            yield _bar(bar.timestamp, bar.open, bar.high, bar.low, bar.close, bar.volume, bar.vwap, bar.transactions)
+
+
+def _stored_bars(series: Dict[str, Any], start: int, end: int, sort: str) -> Iterator[Dict[str, Any]]:
+    rows = (
+        AggregateBar.objects.filter(**series, timestamp__gte=start, timestamp__lte=end)
+        .order_by('-timestamp' if sort == 'desc' else 'timestamp')
+        .values_list('timestamp', *BAR_FIELDS)
+    )
+    for row in rows.iterator(chunk_size=2000):
+        yield _bar(*row)
+
+
+def _series(ticker, multiplier, timespan, from_date, to_date, adjusted) -> Tuple[Dict[str, Any], int, int]:
+    if timespan not in VALID_TIMESPANS:
+        raise ValueError(f"Invalid parameter \"timespan\". Valid options: {', '.join(VALID_TIMESPANS)}")
+    if not ticker or not isinstance(multiplier, int) or not from_date or not to_date:
+        raise ValueError("Invalid query parameters.")
+
+    start, end = _to_ms(from_date), _to_ms(to_date, end=True)
+    if start > end:
+        raise ValueError("\"from\" must not be after \"to\".")
+    return {'ticker': ticker.upper(), 'multiplier': multiplier, 'timespan': timespan, 'adjusted': adjusted}, start, end
+
+
+def _iter_bars(series: Dict[str, Any], start: int, end: int, sort: str, limit: Optional[int]) -> Iterator[Dict[str, Any]]:
+    coverage = AggregateCoverage.objects.filter(**series, end__gte=start, start__lte=end)
+    fresh_after = _fresh_after(series)
+    if fresh_after is not None:
+        coverage = coverage.filter(fetched_at__gte=fresh_after)
+    covered = list(
+        coverage
+        .order_by('start')
+        .values_list('start', 'end')
+    )
+    gaps = missing_ranges(covered, start, end)
+    # Walk the window in output order, alternating between stored runs and the gaps in between
+    segments, cursor = [], start
+    for gap_start, gap_end in gaps:
+        if gap_start > cursor:
+            segments.append((False, cursor, gap_start - 1))
+        segments.append((True, gap_start, gap_end))
+        cursor = gap_end + 1
+    if cursor <= end:
+        segments.append((False, cursor, end))
+    if sort == 'desc':
+        segments.reverse()
+
+    client = PolygonClient() if gaps else None
+    final_before = _session_start_ms()
+    bars = (
+        _gap_bars(client, series, lo, hi, final_before, sort) if is_gap else _stored_bars(series, lo, hi, sort)
+        for is_gap, lo, hi in segments
+    )
+    yield from islice(chain.from_iterable(bars), limit)
+
+
+def iter_aggregate_bars(
+        ticker: str,
+        multiplier: int,
+        timespan: str,
+        from_date: str,
+        to_date: str,
+        adjusted: bool = True,
+        sort: str = "asc",
+        limit: Optional[int] = None
+) -> Iterator[Dict[str, Any]]:
+    """
+    Bars of the window in order, produced lazily: stored runs are read in chunks and missing ranges
+    are fetched upstream page by page (the next page prefetched) as the consumer gets to them.
+    """
+    series, start, end = _series(ticker, multiplier, timespan, from_date, to_date, adjusted)
+    return _iter_bars(series, start, end, sort, limit)
+
+
+def get_aggregate_bars(
+        ticker: str,
+        multiplier: int,
+        timespan: str,
+        from_date: str,
+        to_date: str,
+        adjusted: bool = True,
+        sort: str = "asc",
+        limit: int = 5000
+) -> Dict[str, Any]:
+    """
+    Drop-in replacement for ``PolygonClient.get_aggregate_data`` backed by the local bar store.
+    Only the parts of the window not fetched before (plus today's still-changing session) go upstream.
+    """
+    series, start, end = _series(ticker, multiplier, timespan, from_date, to_date, adjusted)
+    results = list(_iter_bars(series, start, end, sort, limit))
+    return {
+        'ticker': series['ticker'],
+        'queryCount': len(results),
+        'resultsCount': len(results),
+        'adjusted': adjusted,
+        'status': 'OK',
+        'results': results,
+    }
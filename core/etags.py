@@ -0,0 +1,146 @@
+import hashlib
+import json
+import logging
+import time
+from functools import wraps
+from inspect import iscoroutinefunction
+from typing import Optional
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.cache import get_conditional_response, patch_cache_control
+
+from core.bar_store import is_final_window
+from core.quotes import polled_versions
+
+logger = logging.getLogger(__name__)
+
+# Changed after every write to one of the user's watchlists
+WATCHLISTS_VERSION_KEY = "watchlists:version:{user_id}"
+WATCHLISTS_VERSION_TTL = 24 * 60 * 60
+# Part of every tag, so a release that changes how responses look doesn't answer 304 to old copies
+FORMAT_VERSION = 1
+
+
+def make_etag(*parts) -> str:
+    raw = json.dumps([FORMAT_VERSION, *parts], separators=(",", ":"), default=str)
+    return '"' + hashlib.blake2b(raw.encode(), digest_size=16).hexdigest() + '"'
+
+
+def _format(request) -> str:
+    # Set by DRF's content negotiation before the view runs; plain Django views only answer JSON
+    renderer = getattr(request, 'accepted_renderer', None)
+    return renderer.format if renderer is not None else 'json'
+
+
+def _query(request):
+    return sorted(request.GET.lists())
+
+
+def aggregate_etag(request, *args, **kwargs) -> Optional[str]:
+    """
+    Bars of a window that ended before today's session are final, so the query alone identifies the
+    response; adjusted ones only until the bar store fetches them again (STOCK_BARS_ADJUSTED_TTL).
+    """
+    to_date = request.GET.get('to')
+    if not to_date or not is_final_window(to_date):
+        return None
+    adjusted = request.GET.get('adjusted', 'true').lower() == 'true'
+    period = int(time.time() // max(settings.STOCK_BARS_ADJUSTED_TTL, 1)) if adjusted else None
+    return make_etag('aggregates', request.path, _query(request), _format(request), period)
+
+
+def snapshot_etag(request, *args, **kwargs) -> Optional[str]:
+    """Snapshots served entirely from the poller's cache are identified by the poll stamps of their rows."""
+    tickers = request.GET.get('tickers')
+    versions = polled_versions(tickers.split(',')) if tickers else None
+    if versions is None:
+        return None
+    return make_etag('snapshot', request.path, _query(request), _format(request), versions)
+
+
+def _watchlists_version(user_id):
+    if not settings.STOCK_WATCHLIST_ETAGS:
+        return None
+    key = WATCHLISTS_VERSION_KEY.format(user_id=user_id)
+    shared = caches[settings.STOCK_API_CACHE_ALIAS]
+    try:
+        version = shared.get(key)
+        if version is None:
+            # Nothing published yet (or expired): any fresh value will do, as long as every process agrees
+            shared.add(key, time.time_ns(), timeout=WATCHLISTS_VERSION_TTL)
+            version = shared.get(key)
+    except Exception:
+        logger.warning("Shared cache unavailable for %s", key, exc_info=True)
+        return None
+    return version
+
+
+def _publish_watchlists_version(user_id):
+    key = WATCHLISTS_VERSION_KEY.format(user_id=user_id)
+    try:
+        caches[settings.STOCK_API_CACHE_ALIAS].set(key, time.time_ns(), timeout=WATCHLISTS_VERSION_TTL)
+    except Exception:
+        logger.warning("Shared cache write failed for %s", key, exc_info=True)
+
+
+def watchlists_changed(user_id):
+    """
+    Call after writing any of the user's watchlists. The version moves once the transaction commits:
+    moved any earlier, a concurrent read could tag the old rows with the new version.
+    """
+    if settings.STOCK_WATCHLIST_ETAGS:
+        transaction.on_commit(lambda: _publish_watchlists_version(user_id))
+
+
+def watchlists_etag(request, *args, **kwargs) -> Optional[str]:
+    version = _watchlists_version(request.user.id)
+    if version is None:
+        return None
+    return make_etag('watchlists', request.path, request.user.id, version)
+
+
+def _not_modified(request, etag):
+    if etag is None:
+        return None
+    response = get_conditional_response(request, etag=etag)
+    if response is not None:
+        response.headers['ETag'] = etag
+    return response
+
+
+def _finish(response, etag):
+    if etag is not None and response.status_code == 200:
+        response.headers.setdefault('ETag', etag)
+    # Per-user data: browsers revalidate every time, shared caches keep out
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def conditional(etag_func):
+    """
+    Answers If-None-Match with 304 before the view runs, whenever ``etag_func(request, *args, **kwargs)``
+    can tag the response without doing the view's work (None when it can't; ConditionalGetMiddleware
+    then still compares a hash of the body). Successful responses carry the tag.
+    """
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def wrapper(request, *args, **kwargs):
+                etag = etag_func(request, *args, **kwargs)
+                response = _not_modified(request, etag)
+                if response is None:
+                    response = await view(request, *args, **kwargs)
+                return _finish(response, etag)
+        else:
+            @wraps(view)
+            def wrapper(request, *args, **kwargs):
+                etag = etag_func(request, *args, **kwargs)
+                response = _not_modified(request, etag)
+                if response is None:
+                    response = view(request, *args, **kwargs)
+                return _finish(response, etag)
+        return wrapper
+
+    return decorator
@@ -0,0 +1,62 @@
+import json
+from typing import Any
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+
+try:
+    import orjson
+except ImportError:  # stdlib json only
+    orjson = None
+
+if orjson is not None:
+    # int dict keys become strings like with json; numpy arrays and scalars are written natively
+    ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_UTC_Z
+
+_django_encoder = DjangoJSONEncoder()
+
+
+def dumps(data: Any) -> bytes:
+    """
+    Compact JSON with the encoder picked by STOCK_JSON_ENCODER: ``orjson`` (when installed) or ``json``.
+    Types neither knows (Decimal, UUID, lazy strings...) are written as DjangoJSONEncoder writes them.
+    """
+    if orjson is not None and settings.STOCK_JSON_ENCODER == 'orjson':
+        try:
+            return orjson.dumps(data, default=_django_encoder.default, option=ORJSON_OPTIONS)
+        except orjson.JSONEncodeError:
+            pass  # e.g. integers beyond 64 bits, which json handles
+    return json.dumps(data, cls=DjangoJSONEncoder, separators=(',', ':')).encode()
+
+
+def loads(data):
+    if orjson is not None and settings.STOCK_JSON_ENCODER == 'orjson':
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class FastJSONResponse(HttpResponse):
+    """JsonResponse serialized through ``dumps``."""
+
+    def __init__(self, data, **kwargs):
+        kwargs.setdefault('content_type', 'application/json')
+        super().__init__(content=dumps(data), **kwargs)
+
+
+class RawDataResponse(HttpResponse):
+    """
+    ``{"status": "success", "data": <raw>}`` where ``raw`` is a JSON document as bytes (an upstream body,
+    passed through untouched), spliced in without parsing and serializing it again.
+    """
+
+    def __init__(self, raw: bytes, **kwargs):
+        kwargs.setdefault('content_type', 'application/json')
+        super().__init__(content=b''.join((b'{"status":"success","data":', raw, b'}')), **kwargs)
+
+
+def data_response(data, **kwargs) -> HttpResponse:
+    """The success envelope around ``data``: parsed data, or a raw JSON body as bytes."""
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        return RawDataResponse(bytes(data), **kwargs)
+    return FastJSONResponse({'status': 'success', 'data': data}, **kwargs)
@@ -0,0 +1,40 @@
+import logging
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from core.token_blacklist import compact_tokens
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        "Deletes expired outstanding and blacklisted refresh tokens in bulk, every interval, so the "
+        "token tables only hold tokens that can still be used. Run it as its own long-lived process."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=settings.STOCK_TOKEN_COMPACTION_INTERVAL,
+                            help="Seconds between runs.")
+        parser.add_argument('--batch-size', type=int, default=5000, help="Tokens deleted per statement.")
+        parser.add_argument('--once', action='store_true', help="Run once and exit.")
+
+    def handle(self, *args, **options):
+        interval = options['interval']
+        while True:
+            started = time.monotonic()
+            close_old_connections()
+            try:
+                blacklisted, outstanding = compact_tokens(options['batch_size'])
+            except Exception:
+                logger.exception("Token compaction failed")
+            else:
+                if options['verbosity'] > 1 or options['once']:
+                    self.stdout.write(f"Deleted {outstanding} expired tokens ({blacklisted} blacklisted) "
+                                      f"in {time.monotonic() - started:.2f}s")
+            if options['once']:
+                return
+            time.sleep(max(0.0, interval - (time.monotonic() - started)))
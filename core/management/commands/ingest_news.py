@@ -0,0 +1,44 @@
+import logging
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from core.news_store import refresh_feed
+from core.stockapi.ratelimit import background_priority
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        "Keeps the local news store current: every interval, fetches the articles published since the "
+        "newest one stored, for all tickers (or just the given ones). Run it as its own long-lived process."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('tickers', nargs='*', help="Only refresh these tickers' feeds.")
+        parser.add_argument('--interval', type=float, default=settings.STOCK_NEWS_INGEST_INTERVAL,
+                            help="Seconds between ingestion cycles.")
+        parser.add_argument('--once', action='store_true', help="Run a single cycle and exit.")
+
+    def handle(self, *args, **options):
+        interval = options['interval']
+        tickers = [ticker.upper() for ticker in options['tickers']] or ['']
+        while True:
+            started = time.monotonic()
+            close_old_connections()
+            try:
+                # A refresh job: user-facing requests go first when the upstream budget runs short
+                with background_priority():
+                    feeds = [refresh_feed(ticker, force=True) for ticker in tickers]
+            except Exception:
+                logger.exception("News ingestion cycle failed")
+            else:
+                if options['verbosity'] > 1 or options['once']:
+                    newest = ', '.join(f"{feed.ticker or 'all tickers'} up to {feed.newest}" for feed in feeds)
+                    self.stdout.write(f"Ingested news ({newest}) in {time.monotonic() - started:.2f}s")
+            if options['once']:
+                return
+            time.sleep(max(0.0, interval - (time.monotonic() - started)))
@@ -0,0 +1,39 @@
+import logging
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from core.quotes import poll_once
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        "Keeps the shared quote cache warm: every interval, fetches snapshots for all tickers found "
+        "in any watchlist with batched upstream calls. Run it as its own long-lived process."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=settings.STOCK_API_SNAPSHOT_POLL_INTERVAL,
+                            help="Seconds between polling cycles.")
+        parser.add_argument('--once', action='store_true', help="Run a single cycle and exit.")
+
+    def handle(self, *args, **options):
+        interval = options['interval']
+        while True:
+            started = time.monotonic()
+            close_old_connections()
+            try:
+                requested, stored = poll_once()
+            except Exception:
+                # Readers fall back to upstream once entries expire; keep polling
+                logger.exception("Snapshot polling cycle failed")
+            else:
+                if options['verbosity'] > 1 or options['once']:
+                    self.stdout.write(f"Polled {stored}/{requested} tickers in {time.monotonic() - started:.2f}s")
+            if options['once']:
+                return
+            time.sleep(max(0.0, interval - (time.monotonic() - started)))
@@ -0,0 +1,68 @@
+import logging
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from core.models import TickerSymbol
+from core.stockapi.polygon_client import PolygonClient
+from core.stockapi.ratelimit import background_priority
+from core.ticker_index import apply_ticker_symbols_diff, diff_ticker_symbols
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        "Syncs TickerSymbol with Polygon's ticker universe: downloads every active ticker of the market, "
+        "diffs it against the stored symbols and applies inserts, updates and deactivations in one "
+        "transaction. Runs every interval as its own long-lived process, or once (e.g. from cron)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--market', default='stocks', help="Polygon market to sync.")
+        parser.add_argument('--interval', type=float, default=settings.STOCK_TICKER_SYNC_INTERVAL,
+                            help="Seconds between syncs.")
+        parser.add_argument('--once', action='store_true', help="Sync once and exit.")
+        parser.add_argument('--dry-run', action='store_true', help="Only report what would change.")
+        parser.add_argument('--force', action='store_true',
+                            help="Sync even when the listing is shorter than STOCK_TICKER_SYNC_MAX_SHRINK allows.")
+
+    def handle(self, *args, **options):
+        interval = options['interval']
+        while True:
+            started = time.monotonic()
+            close_old_connections()
+            try:
+                self.sync(options)
+            except Exception:
+                if options['once']:
+                    raise
+                logger.exception("Ticker sync failed")
+            if options['once']:
+                return
+            time.sleep(max(0.0, interval - (time.monotonic() - started)))
+
+    def sync(self, options):
+        started = time.monotonic()
+        market = options['market']
+        # A refresh job: user-facing requests go first when the upstream budget runs short
+        with background_priority():
+            rows = list(PolygonClient().iter_reference_tickers(market=market))
+        if not rows:
+            raise CommandError(f"Polygon listed no active {market} tickers; leaving the stored ones alone")
+
+        diff = diff_ticker_symbols(rows, market)
+        inserts, updates, deactivations = diff['inserts'], diff['updates'], diff['deactivations']
+        summary = (f"{market}: {len(rows)} listed, {len(inserts)} new, {len(updates)} changed, "
+                   f"{len(deactivations)} delisted")
+
+        active = TickerSymbol.objects.filter(market=market, active=True).count()
+        if len(rows) < active * (1 - settings.STOCK_TICKER_SYNC_MAX_SHRINK) and not options['force']:
+            raise CommandError(f"{summary}: {active} symbols are active, the listing looks truncated "
+                               f"(rerun with --force if it is right)")
+        if not options['dry_run']:
+            apply_ticker_symbols_diff(diff)
+        self.stdout.write(f"{'Would sync' if options['dry_run'] else 'Synced'} {summary} "
+                          f"in {time.monotonic() - started:.2f}s")
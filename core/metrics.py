@@ -0,0 +1,409 @@
+"""
+Process-local metrics, merged across worker processes for the Prometheus-text /metrics endpoint.
+
+Every process keeps its own counters, gauges and histograms (updating one is a dict lookup and a lock)
+and a daemon thread publishes a snapshot of them to the shared cache every STOCK_METRICS_PUBLISH_INTERVAL
+seconds. /metrics sums the snapshots of all processes; gauges only count from processes that published
+recently. Without Redis the shared cache is per-process, so /metrics only shows the answering process.
+"""
+import atexit
+import logging
+import os
+import socket
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+logger = logging.getLogger(__name__)
+
+PROCESS_KEY = "metrics:process:{process}"
+# Processes that have published, so /metrics knows which snapshots to read
+PROCESSES_KEY = "metrics:processes"
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+# Anything else a client sends is counted as "other", to keep the number of series bounded
+HTTP_METHODS = frozenset(("GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"))
+
+Labels = Tuple[str, ...]
+
+
+class Metric:
+    type = None
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._series: Dict[Labels, object] = {}
+        self._lock = threading.Lock()
+        REGISTRY[name] = self
+
+    def snapshot(self) -> Dict[Labels, object]:
+        with self._lock:
+            return {labels: self._copy(value) for labels, value in self._series.items()}
+
+    def _copy(self, value):
+        return value
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, *labels: str, amount: float = 1):
+        with self._lock:
+            self._series[labels] = self._series.get(labels, 0) + amount
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def inc(self, *labels: str, amount: float = 1):
+        with self._lock:
+            self._series[labels] = self._series.get(labels, 0) + amount
+
+    def dec(self, *labels: str, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(Metric):
+    """Series are per-bucket counts (not cumulative, the last one is +Inf), then the sum."""
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, *labels: str):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def _copy(self, value):
+        return list(value)
+
+
+REGISTRY: Dict[str, Metric] = {}
+# Callables returning {metric name: {labels: value}} for values other modules already count
+COLLECTORS: List[Callable[[], Dict[str, Dict[Labels, float]]]] = []
+
+http_requests = Counter(
+    "stockwatch_http_requests_total", "Requests answered, by route, method and status.",
+    ("view", "method", "status"),
+)
+http_latency = Histogram(
+    "stockwatch_http_request_duration_seconds", "Time until the response (headers, when streamed) was ready.",
+    ("view", "method"),
+)
+http_in_flight = Gauge("stockwatch_http_requests_in_flight", "Requests being handled.")
+db_queries = Histogram(
+    "stockwatch_db_queries_per_request", "Database queries run by one request.", ("view",), QUERY_COUNT_BUCKETS,
+)
+db_time = Histogram(
+    "stockwatch_db_time_per_request_seconds", "Time one request spent in database queries.", ("view",),
+)
+upstream_latency = Histogram(
+    "stockwatch_upstream_request_duration_seconds",
+    "Polygon calls (retries included, rate limiter wait excluded), by client endpoint and final status.",
+    ("endpoint", "status"),
+)
+# Filled from the stats() counters of the caches, single-flight groups and rate limiters at publish time
+Counter("stockwatch_cache_lookups_total", "Response cache lookups, by cache and tier answering.", ("cache", "result"))
+Counter("stockwatch_cache_evictions_total", "Local response cache evictions.", ("cache",))
+Gauge("stockwatch_cache_entries", "Entries in the local response cache.", ("cache",))
+Gauge("stockwatch_cache_bytes", "Approximate size of the local response cache.", ("cache",))
+Counter("stockwatch_singleflight_calls_total", "Upstream calls by single-flight outcome.", ("client", "result"))
+Counter("stockwatch_ratelimit_acquired_total", "Upstream request tokens taken.", ("client", "priority"))
+Counter("stockwatch_ratelimit_waited_total", "Tokens that had to be waited for.", ("client", "priority"))
+Counter("stockwatch_ratelimit_wait_seconds_total", "Time spent waiting for tokens.", ("client", "priority"))
+Counter("stockwatch_ratelimit_rejected_total", "Calls failed for want of a token.", ("client", "priority"))
+Gauge("stockwatch_ratelimit_queued", "Callers waiting for a token.", ("client", "priority"))
+
+
+class _RequestStats:
+    __slots__ = ("queries", "db_seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+
+
+# Copied into sync_to_async threads, so async views' queries land on their request too
+_request_stats: ContextVar[Optional[_RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def _record_query(execute, sql, params, many, context):
+    stats = _request_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.queries += 1
+        stats.db_seconds += time.perf_counter() - start
+
+
+@receiver(connection_created)
+def _instrument_connection(sender, connection, **kwargs):
+    if settings.STOCK_METRICS and _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+def request_started() -> Tuple[float, object]:
+    publisher.ensure_started()
+    http_in_flight.inc()
+    return time.perf_counter(), _request_stats.set(_RequestStats())
+
+
+def request_finished(request, response, started: Tuple[float, object]):
+    start, token = started
+    elapsed = time.perf_counter() - start
+    stats = _request_stats.get()
+    _request_stats.reset(token)
+    http_in_flight.dec()
+
+    match = getattr(request, "resolver_match", None)
+    view = match.route if match is not None else "unmatched"
+    method = request.method if request.method in HTTP_METHODS else "other"
+    status = str(response.status_code) if response is not None else "500"
+    http_requests.inc(view, method, status)
+    http_latency.observe(elapsed, view, method)
+    db_queries.observe(stats.queries, view)
+    db_time.observe(stats.db_seconds, view)
+
+
+class upstream_call:
+    """
+    ``with upstream_call("aggregates") as call: ...; call.status = response.status``. Rate limiter waits
+    inside the block (retries taking a token) are reported with ``call.exclude`` or ``exclude_from_upstream``.
+    """
+    __slots__ = ("endpoint", "status", "start", "excluded", "token")
+
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint
+        self.status = None
+        self.excluded = 0.0
+
+    def exclude(self, seconds: float):
+        self.excluded += seconds
+
+    def __enter__(self):
+        # Management commands (the pollers) call upstream without serving requests
+        publisher.ensure_started()
+        self.token = _upstream_call.set(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.start - self.excluded
+        _upstream_call.reset(self.token)
+        status = self.status
+        if exc is not None:
+            # requests' HTTPError carries the response, aiohttp's ClientResponseError the status
+            response = getattr(exc, "response", None)
+            status = getattr(response, "status_code", None) or getattr(exc, "status", None) or "error"
+        upstream_latency.observe(max(elapsed, 0.0), self.endpoint, str(status or "error"))
+        return False
+
+
+_upstream_call: ContextVar[Optional[upstream_call]] = ContextVar("upstream_call", default=None)
+
+
+def exclude_from_upstream(seconds: float):
+    """Leaves ``seconds`` (spent waiting on the rate limiter) out of the upstream call in progress, if any."""
+    call = _upstream_call.get()
+    if call is not None:
+        call.exclude(seconds)
+
+
+def _client_stats() -> Dict[str, Dict[Labels, float]]:
+    from core.stockapi.async_client import AsyncPolygonClient
+    from core.stockapi.polygon_client import PolygonClient
+    from core.watchlist_analytics import _memo
+
+    values: Dict[str, Dict[Labels, float]] = {}
+
+    def put(name, labels, value):
+        values.setdefault(name, {})[labels] = value
+
+    response_caches = {"watchlist_analytics": _memo}
+    clients = {"sync": PolygonClient._instance, "async": AsyncPolygonClient._instance}
+    for client_name, client in clients.items():
+        if client is None:
+            continue
+        response_caches[f"polygon_{client_name}"] = client.cache
+        for result, count in client.flights.stats().items():
+            if result != "in_flight":
+                put("stockwatch_singleflight_calls_total", (client_name, result), count)
+        limiter = client.limiter.stats()
+        for priority, stats in limiter.items():
+            if not isinstance(stats, dict):
+                continue
+            put("stockwatch_ratelimit_acquired_total", (client_name, priority), stats["acquired"])
+            put("stockwatch_ratelimit_waited_total", (client_name, priority), stats["waited"])
+            put("stockwatch_ratelimit_wait_seconds_total", (client_name, priority), stats["wait_seconds"])
+            put("stockwatch_ratelimit_rejected_total", (client_name, priority), stats["rejected"])
+            put("stockwatch_ratelimit_queued", (client_name, priority), stats["queued"])
+
+    for cache_name, cache in response_caches.items():
+        stats = cache.stats()
+        for result, key in (("local_hit", "local_hits"), ("shared_hit", "shared_hits"), ("miss", "misses")):
+            put("stockwatch_cache_lookups_total", (cache_name, result), stats[key])
+        put("stockwatch_cache_evictions_total", (cache_name,), stats["evictions"])
+        put("stockwatch_cache_entries", (cache_name,), stats["local_entries"])
+        put("stockwatch_cache_bytes", (cache_name,), stats["local_bytes"])
+    return values
+
+
+COLLECTORS.append(_client_stats)
+
+
+def snapshot() -> dict:
+    metrics = {name: metric.snapshot() for name, metric in REGISTRY.items()}
+    for collect in COLLECTORS:
+        try:
+            for name, series in collect().items():
+                metrics.setdefault(name, {}).update(series)
+        except Exception:
+            logger.warning("Metrics collector %s failed", collect.__name__, exc_info=True)
+    return {"time": time.time(), "metrics": metrics}
+
+
+def _process_name() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def publish():
+    """Writes this process's snapshot to the shared cache and makes sure /metrics knows about it."""
+    process = _process_name()
+    shared = caches[settings.STOCK_API_CACHE_ALIAS]
+    shared.set(PROCESS_KEY.format(process=process), snapshot(), timeout=settings.STOCK_METRICS_RETENTION)
+    # Read-modify-write: a registration lost to a concurrent one is redone on the next publish
+    processes = shared.get(PROCESSES_KEY) or {}
+    if process not in processes:
+        processes[process] = time.time()
+        shared.set(PROCESSES_KEY, processes, timeout=None)
+
+
+class _Publisher:
+    def __init__(self):
+        self.pid = None
+        self.lock = threading.Lock()
+        self.failing = False
+
+    def ensure_started(self):
+        # Checked per request: a forked worker needs its own thread (threads don't survive fork)
+        if self.pid == os.getpid():
+            return
+        with self.lock:
+            if self.pid == os.getpid():
+                return
+            self.pid = os.getpid()
+            threading.Thread(target=self._run, name="metrics-publisher", daemon=True).start()
+            atexit.register(self._publish)
+
+    def _run(self):
+        while True:
+            time.sleep(settings.STOCK_METRICS_PUBLISH_INTERVAL)
+            self._publish()
+
+    def _publish(self):
+        try:
+            publish()
+        except Exception:
+            # Once per outage rather than every interval
+            if not self.failing:
+                logger.warning("Publishing metrics to the shared cache failed", exc_info=True)
+            self.failing = True
+        else:
+            self.failing = False
+
+
+publisher = _Publisher()
+
+
+def collect() -> Dict[str, Dict[Labels, object]]:
+    """Snapshots of every process merged: counters and histograms summed, gauges of live processes summed."""
+    own = _process_name()
+    snapshots = {own: snapshot()}
+    shared = caches[settings.STOCK_API_CACHE_ALIAS]
+    try:
+        processes = shared.get(PROCESSES_KEY) or {}
+        keys = {PROCESS_KEY.format(process=process): process for process in processes if process != own}
+        found = shared.get_many(list(keys))
+        snapshots.update((keys[key], value) for key, value in found.items())
+        gone = set(processes) - {keys[key] for key in found} - {own}
+        if gone:
+            shared.set(PROCESSES_KEY, {p: t for p, t in processes.items() if p not in gone}, timeout=None)
+    except Exception:
+        logger.warning("Shared cache unavailable, metrics of this process only", exc_info=True)
+
+    live_after = time.time() - 3 * settings.STOCK_METRICS_PUBLISH_INTERVAL
+    merged: Dict[str, Dict[Labels, object]] = {name: {} for name in REGISTRY}
+    for process, snap in snapshots.items():
+        live = process == own or snap["time"] >= live_after
+        for name, series in snap["metrics"].items():
+            metric = REGISTRY.get(name)
+            if metric is None or (metric.type == "gauge" and not live):
+                continue
+            into = merged[name]
+            for labels, value in series.items():
+                if metric.type == "histogram":
+                    current = into.get(labels)
+                    if current is None or len(current) != len(value):
+                        into[labels] = list(value)
+                    else:
+                        into[labels] = [a + b for a, b in zip(current, value)]
+                else:
+                    into[labels] = into.get(labels, 0) + value
+    return merged
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render(merged: Dict[str, Dict[Labels, object]]) -> Iterator[str]:
+    """Prometheus text exposition format, version 0.0.4."""
+    for name, metric in REGISTRY.items():
+        series = merged.get(name) or {}
+        yield f"# HELP {name} {metric.help}\n# TYPE {name} {metric.type}\n"
+        if metric.type != "histogram":
+            if not series and not metric.labels:
+                series = {(): 0}
+            for labels, value in sorted(series.items()):
+                yield f"{name}{_labels(metric.labels, labels)} {_number(value)}\n"
+            continue
+        for labels, value in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip((*metric.buckets, float("inf")), value[:-1]):
+                cumulative += count
+                le = 'le="%s"' % _number(float(bound))
+                yield f"{name}_bucket{_labels(metric.labels, labels, le)} {cumulative}\n"
+            yield f"{name}_sum{_labels(metric.labels, labels)} {_number(value[-1])}\n"
+            yield f"{name}_count{_labels(metric.labels, labels)} {cumulative}\n"
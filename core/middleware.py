@@ -0,0 +1,176 @@
+import zlib
+from typing import Optional
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.http import parse_etags
+
+from core import metrics
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+# In order of preference when the client accepts several equally
+ENCODINGS = ('br', 'gzip')
+# Server-sent events must reach the client event by event
+UNCOMPRESSED_TYPES = ('text/event-stream', 'image/', 'audio/', 'video/')
+
+
+def accepted_encoding(header: str) -> Optional[str]:
+    """The encoding to use per an Accept-Encoding header: highest q first, then ENCODINGS order."""
+    weights = {}
+    for part in header.split(','):
+        name, *params = (piece.strip() for piece in part.split(';'))
+        weight = 1.0
+        for param in params:
+            if param.startswith('q='):
+                try:
+                    weight = float(param[2:])
+                except ValueError:
+                    weight = 0.0
+        if name:
+            weights[name.lower()] = weight
+    available = [encoding for encoding in ENCODINGS if encoding != 'br' or brotli is not None]
+    best = max(available, key=lambda encoding: weights.get(encoding, weights.get('*', 0.0)), default=None)
+    if best is None or weights.get(best, weights.get('*', 0.0)) <= 0:
+        return None
+    return best
+
+
+def _compressor(encoding: str):
+    """(compress, finish) callables of a fresh streaming compressor."""
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=settings.STOCK_HTTP_BROTLI_QUALITY)
+        return compressor.process, compressor.finish
+    # wbits 31: gzip container
+    compressor = zlib.compressobj(settings.STOCK_HTTP_GZIP_LEVEL, zlib.DEFLATED, 31)
+    return compressor.compress, compressor.flush
+
+
+def _compress(encoding: str, content: bytes) -> bytes:
+    compress, finish = _compressor(encoding)
+    return compress(content) + finish()
+
+
+def _compress_sequence(encoding: str, chunks):
+    compress, finish = _compressor(encoding)
+    for chunk in chunks:
+        data = compress(chunk)
+        if data:
+            yield data
+    yield finish()
+
+
+async def _acompress_sequence(encoding: str, chunks):
+    compress, finish = _compressor(encoding)
+    async for chunk in chunks:
+        data = compress(chunk)
+        if data:
+            yield data
+    yield finish()
+
+
+def _suffixed(etag: str, encoding: str) -> str:
+    # An encoded body is a different representation, so it gets its own strong tag
+    return f'{etag[:-1]}-{encoding}"' if etag.endswith('"') else etag
+
+
+def _unsuffixed(etag: str) -> str:
+    for encoding in ENCODINGS:
+        if etag.endswith(f'-{encoding}"'):
+            return f'{etag[:-len(encoding) - 2]}"'
+    return etag
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """
+    gzip, or brotli when the ``brotli`` package is installed, as negotiated by Accept-Encoding: for
+    bodies of at least STOCK_HTTP_COMPRESS_MIN_BYTES and for streamed responses (except event streams).
+
+    The ETag of an encoded response gets the encoding appended. Tags in If-None-Match lose it again on
+    the way in, so views and ConditionalGetMiddleware (which must come after this one) compare plain
+    tags, and a 304 echoes the tag the client sent.
+    """
+
+    def process_request(self, request):
+        header = request.META.get('HTTP_IF_NONE_MATCH')
+        if header:
+            request.if_none_match = parse_etags(header)
+            request.META['HTTP_IF_NONE_MATCH'] = ', '.join(_unsuffixed(etag) for etag in request.if_none_match)
+
+    def process_response(self, request, response):
+        etag = response.get('ETag')
+        if response.status_code == 304 and etag:
+            sent = getattr(request, 'if_none_match', ())
+            response.headers['ETag'] = next(
+                (tag for tag in sent if _unsuffixed(tag.removeprefix('W/')) == etag.removeprefix('W/')), etag
+            )
+            return response
+
+        if response.has_header('Content-Encoding') or response.get('Content-Type', '').startswith(UNCOMPRESSED_TYPES):
+            return response
+        if not response.streaming and len(response.content) < settings.STOCK_HTTP_COMPRESS_MIN_BYTES:
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = accepted_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = _acompress_sequence(encoding, response.streaming_content)
+            else:
+                response.streaming_content = _compress_sequence(encoding, response.streaming_content)
+            del response.headers['Content-Length']
+        else:
+            content = _compress(encoding, response.content)
+            if len(content) >= len(response.content):
+                return response
+            response.content = content
+            response.headers['Content-Length'] = str(len(content))
+        if etag:
+            response.headers['ETag'] = _suffixed(etag, encoding)
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+
+class MetricsMiddleware:
+    """
+    Request count, latency, database queries and in-flight gauge per route for /metrics. First in
+    MIDDLEWARE, so the time spent in every other middleware counts too.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.STOCK_METRICS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        started = metrics.request_started()
+        response = None
+        try:
+            response = self.get_response(request)
+            return response
+        finally:
+            metrics.request_finished(request, response, started)
+
+    async def __acall__(self, request):
+        started = metrics.request_started()
+        response = None
+        try:
+            response = await self.get_response(request)
+            return response
+        finally:
+            metrics.request_finished(request, response, started)
@@ -0,0 +1,49 @@
+# Generated by Django 5.1.3 on 2026-10-18 12:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AggregateBar',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ticker', models.CharField(max_length=10)),
+                ('multiplier', models.PositiveIntegerField()),
+                ('timespan', models.CharField(max_length=10)),
+                ('adjusted', models.BooleanField(default=True)),
+                ('timestamp', models.BigIntegerField()),
+                ('open', models.FloatField()),
+                ('high', models.FloatField()),
+                ('low', models.FloatField()),
+                ('close', models.FloatField()),
+                ('volume', models.FloatField()),
+                ('vwap', models.FloatField(null=True)),
+                ('transactions', models.PositiveIntegerField(null=True)),
+            ],
+            options={
+                'unique_together': {('ticker', 'multiplier', 'timespan', 'adjusted', 'timestamp')},
+            },
+        ),
+        migrations.CreateModel(
+            name='AggregateCoverage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ticker', models.CharField(max_length=10)),
+                ('multiplier', models.PositiveIntegerField()),
+                ('timespan', models.CharField(max_length=10)),
+                ('adjusted', models.BooleanField(default=True)),
+                ('start', models.BigIntegerField()),
+                ('end', models.BigIntegerField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['ticker', 'multiplier', 'timespan', 'adjusted', 'start'], name='core_aggreg_ticker_a3d0a9_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.1.3 on 2026-10-18 12:52
+
+from django.db import migrations, models
+
+# Trigram indexes for the database-backed ticker search (STOCK_TICKER_SEARCH=database). They match the
+# UPPER(col::text) LIKE expressions Django emits for icontains/istartswith. Postgres only.
+TRIGRAM_INDEXES = {
+    'core_tickersymbol_ticker_trgm': 'ticker',
+    'core_tickersymbol_name_trgm': 'name',
+}
+
+
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for index, column in TRIGRAM_INDEXES.items():
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {index} ON core_tickersymbol USING gin (UPPER({column}::text) gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for index in TRIGRAM_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {index}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_aggregate_bars'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TickerSymbol',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ticker', models.CharField(max_length=32, unique=True)),
+                ('name', models.CharField(blank=True, max_length=255)),
+                ('market', models.CharField(blank=True, max_length=20)),
+                ('locale', models.CharField(blank=True, max_length=10)),
+                ('type', models.CharField(blank=True, max_length=20)),
+                ('primary_exchange', models.CharField(blank=True, max_length=20)),
+                ('currency_name', models.CharField(blank=True, max_length=20)),
+                ('active', models.BooleanField(default=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
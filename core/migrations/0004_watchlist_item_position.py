@@ -0,0 +1,22 @@
+# Generated by Django 5.1.3 on 2026-10-18 13:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_ticker_symbols'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='watchlistitem',
+            options={'ordering': ['position', 'id']},
+        ),
+        migrations.AddField(
+            model_name='watchlistitem',
+            name='position',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
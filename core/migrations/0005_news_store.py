@@ -0,0 +1,50 @@
+# Generated by Django 5.1.3 on 2026-10-18 13:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_watchlist_item_position'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NewsFeed',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ticker', models.CharField(blank=True, max_length=32, unique=True)),
+                ('oldest', models.DateTimeField(null=True)),
+                ('newest', models.DateTimeField(null=True)),
+                ('exhausted', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('checked_at', models.DateTimeField(null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='NewsArticle',
+            fields=[
+                ('id', models.CharField(max_length=128, primary_key=True, serialize=False)),
+                ('published_utc', models.DateTimeField()),
+                ('data', models.JSONField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['published_utc', 'id'], name='core_newsar_publish_d8ac10_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='NewsArticleTicker',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ticker', models.CharField(max_length=32)),
+                ('published_utc', models.DateTimeField()),
+                ('article', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ticker_links', to='core.newsarticle')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['ticker', 'published_utc', 'article'], name='core_newsar_ticker_e3abc9_idx')],
+                'unique_together': {('ticker', 'article')},
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.1.3 on 2026-10-18 14:33
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_news_store'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='aggregatecoverage',
+            name='fetched_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -3,6 +3,7 @@ from django.db import models
 # Create your models here.
 from django.db import models
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 
 User = get_user_model()
 
@@ -20,9 +21,113 @@ class WatchlistItem(models.Model):
     watchlist = models.ForeignKey(Watchlist, on_delete=models.CASCADE, related_name='items')
     ticker = models.CharField(max_length=10)
     name = models.CharField(max_length=60)
+    # Display order within the watchlist; ties (items added before ordering existed) fall back to id
+    position = models.PositiveIntegerField(default=0)
 
     class Meta:
         unique_together = ('watchlist', 'ticker')
+        ordering = ['position', 'id']
 
     def __str__(self):
         return f"{self.ticker} in {self.watchlist.name}"
+
+
+class AggregateBar(models.Model):
+    ticker = models.CharField(max_length=10)
+    multiplier = models.PositiveIntegerField()
+    timespan = models.CharField(max_length=10)
+    adjusted = models.BooleanField(default=True)
+    timestamp = models.BigIntegerField()  # bar start, ms since epoch (Polygon's "t")
+    open = models.FloatField()
+    high = models.FloatField()
+    low = models.FloatField()
+    close = models.FloatField()
+    volume = models.FloatField()
+    vwap = models.FloatField(null=True)
+    transactions = models.PositiveIntegerField(null=True)
+
+    class Meta:
+        # Field order matters: the unique index doubles as the range-scan index on timestamp
+        unique_together = ('ticker', 'multiplier', 'timespan', 'adjusted', 'timestamp')
+
+    def __str__(self):
+        return f"{self.ticker} {self.multiplier}/{self.timespan} @ {self.timestamp}"
+
+
+class AggregateCoverage(models.Model):
+    """
+    Timestamp range [start, end] (ms, inclusive) of a bar series already fetched in full from Polygon.
+    Adjusted ranges expire STOCK_BARS_ADJUSTED_TTL after ``fetched_at`` (of their oldest part).
+    """
+    ticker = models.CharField(max_length=10)
+    multiplier = models.PositiveIntegerField()
+    timespan = models.CharField(max_length=10)
+    adjusted = models.BooleanField(default=True)
+    start = models.BigIntegerField()
+    end = models.BigIntegerField()
+    fetched_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [models.Index(fields=['ticker', 'multiplier', 'timespan', 'adjusted', 'start'])]
+
+    def __str__(self):
+        return f"{self.ticker} {self.multiplier}/{self.timespan} [{self.start}, {self.end}]"
+
+
+class TickerSymbol(models.Model):
+    """Local copy of Polygon's ticker reference data; backs search_tickers (see core.ticker_index)."""
+    ticker = models.CharField(max_length=32, unique=True)
+    name = models.CharField(max_length=255, blank=True)
+    market = models.CharField(max_length=20, blank=True)
+    locale = models.CharField(max_length=10, blank=True)
+    type = models.CharField(max_length=20, blank=True)
+    primary_exchange = models.CharField(max_length=20, blank=True)
+    currency_name = models.CharField(max_length=20, blank=True)
+    active = models.BooleanField(default=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.ticker} ({self.name})"
+
+
+class NewsArticle(models.Model):
+    """A Polygon news article (``/v2/reference/news`` result), stored once however many tickers it tags."""
+    id = models.CharField(max_length=128, primary_key=True)  # Polygon's article id
+    published_utc = models.DateTimeField()
+    data = models.JSONField()  # the article as Polygon returned it
+
+    class Meta:
+        indexes = [models.Index(fields=['published_utc', 'id'])]
+
+    def __str__(self):
+        return f"{self.id} @ {self.published_utc}"
+
+
+class NewsArticleTicker(models.Model):
+    """Ticker <-> article index. ``published_utc`` is copied in so a ticker's page is one index range scan."""
+    ticker = models.CharField(max_length=32)
+    article = models.ForeignKey(NewsArticle, on_delete=models.CASCADE, related_name='ticker_links')
+    published_utc = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('ticker', 'article')
+        indexes = [models.Index(fields=['ticker', 'published_utc', 'article'])]
+
+    def __str__(self):
+        return f"{self.ticker}: {self.article_id}"
+
+
+class NewsFeed(models.Model):
+    """
+    What has been ingested for one news query (``ticker``, or '' for all tickers): every article
+    published in [oldest, newest]; nothing older exists upstream once ``exhausted``.
+    """
+    ticker = models.CharField(max_length=32, unique=True, blank=True)
+    oldest = models.DateTimeField(null=True)
+    newest = models.DateTimeField(null=True)
+    exhausted = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    checked_at = models.DateTimeField(null=True)
+
+    def __str__(self):
+        return f"news feed {self.ticker or '*'} [{self.oldest}, {self.newest}]"
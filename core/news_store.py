@@ -0,0 +1,353 @@
+import base64
+import logging
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone as dj_timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from core.models import NewsArticle, NewsArticleTicker, NewsFeed
+from core.stockapi.polygon_client import NEWS_PAGE_LIMIT, PolygonClient
+
+logger = logging.getLogger(__name__)
+
+# Held by the process refreshing a feed, so concurrent requests serve what's stored instead of piling on
+REFRESH_LOCK_KEY = "news:refresh:{ticker}"
+ORDERS = ("asc", "desc")
+# Range filters accepted by /news, as Polygon spells them
+RANGE_FILTERS = {
+    "published_utc.gt": "gt",
+    "published_utc.gte": "gte",
+    "published_utc.lt": "lt",
+    "published_utc.lte": "lte",
+}
+# Rows per keyset query when reading the store
+READ_BATCH = 1000
+
+
+def _aware(value: datetime) -> datetime:
+    return value if dj_timezone.is_aware(value) else value.replace(tzinfo=timezone.utc)
+
+
+def _parse_moment(value: str, end: bool = False) -> datetime:
+    """A Polygon timestamp or a plain date (UTC midnight; with ``end``, the next one)."""
+    day = parse_date(value)
+    if day is not None:
+        moment = datetime(day.year, day.month, day.day, tzinfo=timezone.utc)
+        return moment + timedelta(days=1) if end else moment
+    moment = parse_datetime(value)
+    if moment is None:
+        raise ValueError(f"Invalid date \"{value}\".")
+    return _aware(moment)
+
+
+def _upstream(value: datetime) -> str:
+    return value.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def published_filters(params: Mapping[str, str]) -> Dict[str, datetime]:
+    """ORM lookups for the ``published_utc`` filters in ``params``; a plain date for equality means that whole day."""
+    lookups = {}
+    exact = params.get("published_utc")
+    if exact:
+        if parse_date(exact) is not None:
+            lookups["published_utc__gte"] = _parse_moment(exact)
+            lookups["published_utc__lt"] = _parse_moment(exact, end=True)
+        else:
+            lookups["published_utc"] = _parse_moment(exact)
+    for param, lookup in RANGE_FILTERS.items():
+        if params.get(param):
+            lookups[f"published_utc__{lookup}"] = _parse_moment(params[param])
+    return lookups
+
+
+def store_articles(articles: Iterable[Dict[str, Any]]) -> Tuple[int, Optional[datetime], Optional[datetime]]:
+    """
+    Saves Polygon news results with one index row per tagged ticker; articles already stored are left
+    alone. Returns (articles seen, oldest and newest ``published_utc`` among them).
+    """
+    rows, links = [], []
+    for article in articles:
+        if not article.get("id") or not article.get("published_utc"):
+            continue
+        published = _parse_moment(article["published_utc"])
+        rows.append(NewsArticle(id=article["id"], published_utc=published, data=article))
+        links.extend(
+            NewsArticleTicker(ticker=ticker, article_id=article["id"], published_utc=published)
+            for ticker in dict.fromkeys(ticker.upper() for ticker in article.get("tickers") or [])
+        )
+    if not rows:
+        return 0, None, None
+    with transaction.atomic():
+        NewsArticle.objects.bulk_create(rows, batch_size=READ_BATCH, ignore_conflicts=True)
+        NewsArticleTicker.objects.bulk_create(links, batch_size=READ_BATCH, ignore_conflicts=True)
+    published = [row.published_utc for row in rows]
+    return len(rows), min(published), max(published)
+
+
+def _batches(articles: Iterable[Dict[str, Any]]) -> Iterator[List[Dict[str, Any]]]:
+    articles = iter(articles)
+    while batch := list(islice(articles, NEWS_PAGE_LIMIT)):
+        yield batch
+
+
+def _fetch_newer(feed: NewsFeed, client: PolygonClient) -> int:
+    """Articles published since the newest one ingested, oldest first; progress is saved page by page."""
+    # gte rather than gt: timestamps are whole seconds, so more articles may have landed in that second since
+    articles = client.iter_news(
+        ticker=feed.ticker or None, order="asc", sort="published_utc", published_utc_gte=_upstream(feed.newest)
+    )
+    seen = 0
+    for batch in _batches(articles):
+        count, _, newest = store_articles(batch)
+        seen += count
+        if newest is not None and newest > feed.newest:
+            feed.newest = newest
+            feed.save(update_fields=["newest"])
+    return seen
+
+
+def _fetch_older(feed: NewsFeed, client: PolygonClient) -> int:
+    """
+    Up to STOCK_NEWS_BACKFILL articles older than the oldest one ingested, newest first (on a feed's
+    first fetch: its newest articles). A short answer means the feed's history is complete.
+    """
+    limit = settings.STOCK_NEWS_BACKFILL
+    articles = client.iter_news(
+        ticker=feed.ticker or None, order="desc", sort="published_utc", limit=limit,
+        published_utc_lte=_upstream(feed.oldest) if feed.oldest else None,
+    )
+    seen = 0
+    for batch in _batches(articles):
+        count, oldest, newest = store_articles(batch)
+        seen += count
+        if oldest is not None:
+            feed.oldest = min(feed.oldest or oldest, oldest)
+            feed.newest = max(feed.newest or newest, newest)
+            feed.save(update_fields=["oldest", "newest"])
+    if seen < limit:
+        feed.exhausted = True
+        feed.save(update_fields=["exhausted"])
+    return seen
+
+
+def _covered_by(feed: NewsFeed, everything: Optional[NewsFeed], stale_before: datetime) -> bool:
+    # The all-tickers feed (manage.py ingest_news) is current and reaches back to where this one stops
+    return (
+        feed.newest is not None and everything is not None and everything.oldest is not None
+        and everything.checked_at is not None and everything.checked_at >= stale_before
+        and everything.oldest <= feed.newest
+    )
+
+
+def refresh_feed(ticker: str = "", force: bool = False) -> NewsFeed:
+    """
+    The feed for ``ticker`` ('' for all tickers), first brought up to date from upstream unless that
+    happened within STOCK_NEWS_REFRESH_INTERVAL. If the refresh fails (or another process is already
+    doing it) the stored articles are served as they are, unless there are none yet.
+    """
+    feed, _ = NewsFeed.objects.get_or_create(ticker=ticker)
+    now = dj_timezone.now()
+    stale_before = now - timedelta(seconds=settings.STOCK_NEWS_REFRESH_INTERVAL)
+    if not force and feed.checked_at is not None and feed.checked_at >= stale_before:
+        return feed
+    if ticker and not force:
+        everything = NewsFeed.objects.filter(ticker="").first()
+        if _covered_by(feed, everything, stale_before):
+            feed.newest = max(feed.newest, everything.newest)
+            feed.checked_at = everything.checked_at
+            feed.save(update_fields=["newest", "checked_at"])
+            return feed
+
+    shared = caches[settings.STOCK_API_CACHE_ALIAS]
+    lock_key = REFRESH_LOCK_KEY.format(ticker=ticker or "*")
+    try:
+        locked = shared.add(lock_key, 1, timeout=settings.STOCK_NEWS_REFRESH_LOCK_TTL)
+    except Exception:
+        logger.warning("Shared cache unavailable for %s", lock_key, exc_info=True)
+        locked = None
+    # A feed with nothing stored yet is fetched regardless; duplicate rows are ignored
+    if locked is False and feed.newest is not None:
+        return feed
+    try:
+        client = PolygonClient()
+        if feed.newest is None:
+            _fetch_older(feed, client)
+        else:
+            _fetch_newer(feed, client)
+        feed.checked_at = now
+        feed.save(update_fields=["checked_at"])
+    except Exception:
+        if feed.newest is None:
+            raise
+        logger.warning("News refresh failed for %s, serving stored articles", ticker or "all tickers", exc_info=True)
+    finally:
+        if locked:
+            try:
+                shared.delete(lock_key)
+            except Exception:
+                pass  # expires on its own after STOCK_NEWS_REFRESH_LOCK_TTL
+    return feed
+
+
+def _encode_cursor(published: datetime, article_id: str) -> str:
+    return base64.urlsafe_b64encode(f"{published.isoformat()}|{article_id}".encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    try:
+        published, article_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|", 1)
+        return _parse_moment(published), article_id
+    except ValueError:
+        raise ValueError("Invalid cursor.")
+
+
+def _stored_rows(
+        ticker: str,
+        order: str,
+        lookups: Dict[str, datetime],
+        after: Optional[Tuple[datetime, str]]
+) -> Iterator[Tuple[datetime, str, Dict[str, Any]]]:
+    """(published_utc, id, article) in ``order`` by published_utc then id, resuming after the key ``after``."""
+    if ticker:
+        queryset, id_field, data_field = NewsArticleTicker.objects.filter(ticker=ticker), "article_id", "article__data"
+    else:
+        queryset, id_field, data_field = NewsArticle.objects.all(), "id", "data"
+    queryset = queryset.filter(**lookups)
+    op, prefix = ("lt", "-") if order == "desc" else ("gt", "")
+    queryset = queryset.order_by(f"{prefix}published_utc", f"{prefix}{id_field}")
+    while True:
+        page = queryset
+        if after is not None:
+            published, article_id = after
+            page = page.filter(
+                Q(**{f"published_utc__{op}": published}) | Q(published_utc=published, **{f"{id_field}__{op}": article_id})
+            )
+        rows = list(page.values_list("published_utc", id_field, data_field)[:READ_BATCH])
+        yield from rows
+        if len(rows) < READ_BATCH:
+            return
+        after = rows[-1][:2]
+
+
+class NewsPage:
+    """
+    One page of stored news. Iterating yields the articles (lazily, so it can feed a streamed response);
+    afterwards ``next_cursor`` continues the listing, or is None on the last page.
+    """
+
+    def __init__(self, feed: NewsFeed, order: str, limit: int, lookups: Dict[str, datetime], after):
+        self.feed = feed
+        self.order = order
+        self.limit = limit
+        self.lookups = lookups
+        self.after = after
+        self.next_cursor = None
+
+    def _may_extend(self) -> bool:
+        # Newest-first listings that run past the oldest stored article continue into older history upstream
+        if self.order != "desc" or self.feed.exhausted:
+            return False
+        lower = self.lookups.get("published_utc__gte") or self.lookups.get("published_utc__gt")
+        return lower is None or lower < self.feed.oldest
+
+    def _complete_from(self, published: datetime) -> bool:
+        # Anything stored from before the feed's oldest article came in with other feeds, so may have gaps
+        return self.feed.exhausted or published >= self.feed.oldest
+
+    def _lower(self) -> Optional[datetime]:
+        return self.lookups.get("published_utc__gte") or self.lookups.get("published_utc__gt") \
+            or self.lookups.get("published_utc")
+
+    def _starts_below_history(self, after) -> bool:
+        # Oldest-first listings starting before the stored history are read upstream until they reach it
+        if self.order != "asc" or self.feed.exhausted:
+            return False
+        start = after[0] if after is not None else self._lower()
+        return start is None or start < self.feed.oldest
+
+    def _matches(self, published: datetime) -> bool:
+        bounds = self.lookups
+        return (
+            ("published_utc" not in bounds or published == bounds["published_utc"])
+            and ("published_utc__gte" not in bounds or published >= bounds["published_utc__gte"])
+            and ("published_utc__gt" not in bounds or published > bounds["published_utc__gt"])
+            and ("published_utc__lt" not in bounds or published < bounds["published_utc__lt"])
+            and ("published_utc__lte" not in bounds or published <= bounds["published_utc__lte"])
+        )
+
+    def _upstream_rows(self, after) -> Iterator[Tuple[datetime, str, Dict[str, Any]]]:
+        """Matching articles older than the stored history, oldest first, resuming after the key ``after``."""
+        start = after[0] if after is not None else self._lower()
+        upper = self.lookups.get("published_utc__lte") or self.lookups.get("published_utc__lt")
+        articles = PolygonClient().iter_news(
+            ticker=self.feed.ticker or None, order="asc", sort="published_utc",
+            published_utc_gte=_upstream(start) if start else None,
+            published_utc_lte=_upstream(min(upper, self.feed.oldest) if upper else self.feed.oldest),
+        )
+        for article in articles:
+            if not article.get("id") or not article.get("published_utc"):
+                continue
+            published = _parse_moment(article["published_utc"])
+            if published >= self.feed.oldest:
+                return
+            if (after is None or (published, article["id"]) > after) and self._matches(published):
+                yield published, article["id"], article
+
+    def _range(self) -> Dict[str, datetime]:
+        lookups = dict(self.lookups)
+        if self.order == "asc" and not self.feed.exhausted:
+            lower = lookups.get("published_utc__gte")
+            lookups["published_utc__gte"] = max(lower, self.feed.oldest) if lower else self.feed.oldest
+        return lookups
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        after, count = self.after, 0
+        if self._starts_below_history(after):
+            for published, article_id, article in self._upstream_rows(after):
+                if count == self.limit:
+                    self.next_cursor = _encode_cursor(*after)
+                    return
+                after = (published, article_id)
+                count += 1
+                yield article
+        while True:
+            for published, article_id, article in _stored_rows(self.feed.ticker, self.order, self._range(), after):
+                if not self._complete_from(published):
+                    break
+                if count == self.limit:
+                    self.next_cursor = _encode_cursor(*after)
+                    return
+                after = (published, article_id)
+                count += 1
+                yield article
+            if not self._may_extend() or not _fetch_older(self.feed, PolygonClient()):
+                return
+
+
+def query_news(
+        ticker: str = "",
+        order: str = "desc",
+        limit: int = 50,
+        cursor: Optional[str] = None,
+        lookups: Optional[Dict[str, datetime]] = None
+) -> NewsPage:
+    """A page of ``ticker``'s news ('' for all tickers) served from the local store, refreshed first if stale."""
+    if order not in ORDERS:
+        raise ValueError(f"Invalid parameter \"order\". Valid options: {', '.join(ORDERS)}")
+    if not 1 <= limit <= NEWS_PAGE_LIMIT:
+        raise ValueError(f"Invalid parameter \"limit\". Must be between 1 and {NEWS_PAGE_LIMIT}.")
+    after = _decode_cursor(cursor) if cursor else None
+    feed = refresh_feed(ticker.upper())
+    return NewsPage(feed, order, limit, lookups or {}, after)
+
+
+def list_news(*args, **kwargs) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """``query_news`` read in full: (articles, next_cursor)."""
+    page = query_news(*args, **kwargs)
+    return list(page), page.next_cursor
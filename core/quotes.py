@@ -0,0 +1,147 @@
+import logging
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import caches
+
+from core.models import WatchlistItem
+from core.stockapi.polygon_client import PolygonClient
+from core.stockapi.ratelimit import background_priority, thread_pool
+
+logger = logging.getLogger(__name__)
+
+# Snapshot rows written by ``manage.py poll_snapshots``. With the default LocMem cache every process
+# has its own copy, so the poller only pays off with a shared backend (REDIS_URL).
+QUOTE_KEY = "quotes:{ticker}"
+VERSION_KEY = "quotes:version"
+
+
+def quote_from_snapshot(row: Dict[str, Any]) -> Dict[str, Any]:
+    """The handful of fields a watchlist row needs out of one Polygon snapshot ticker."""
+    day = row.get('day') or {}
+    prev_day = row.get('prevDay') or {}
+    last_trade = row.get('lastTrade') or {}
+    return {
+        'price': last_trade.get('p') or day.get('c') or prev_day.get('c'),
+        'change': row.get('todaysChange'),
+        'changePercent': row.get('todaysChangePerc'),
+        'volume': day.get('v'),
+        'prevClose': prev_day.get('c'),
+        'updated': row.get('updated'),
+    }
+
+
+def chunk_tickers(tickers: List[str], size: int) -> List[List[str]]:
+    return [tickers[i:i + size] for i in range(0, len(tickers), size)]
+
+
+def watched_tickers() -> List[str]:
+    return sorted(WatchlistItem.objects.values_list('ticker', flat=True).distinct())
+
+
+def upstream_snapshot_rows(tickers: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Raw snapshot rows by ticker, one upstream call per STOCK_API_SNAPSHOT_CHUNK_SIZE tickers."""
+    if not tickers:
+        return {}
+    client = PolygonClient()
+    chunks = chunk_tickers(sorted(tickers), settings.STOCK_API_SNAPSHOT_CHUNK_SIZE)
+    if len(chunks) == 1:
+        responses = [client.get_tickers_snapshot(tickers=chunks[0])]
+    else:
+        with thread_pool(max_workers=min(len(chunks), 4)) as pool:
+            responses = list(pool.map(lambda chunk: client.get_tickers_snapshot(tickers=chunk), chunks))
+
+    rows = {}
+    for response in responses:
+        for row in response.get('tickers') or []:
+            rows[row['ticker']] = row
+    return rows
+
+
+def store_snapshot_rows(rows: Dict[str, Dict[str, Any]], version: int):
+    shared = caches[settings.STOCK_API_CACHE_ALIAS]
+    entries = {QUOTE_KEY.format(ticker=ticker): {'version': version, 'row': row} for ticker, row in rows.items()}
+    entries[VERSION_KEY] = version
+    shared.set_many(entries, timeout=settings.STOCK_API_SNAPSHOT_CACHE_TTL)
+
+
+def cached_snapshot_rows(tickers: List[str]) -> Tuple[Dict[str, Dict[str, Any]], Optional[int]]:
+    """Polled rows for ``tickers`` (missing ones are simply absent) and the oldest version among them."""
+    keys = {QUOTE_KEY.format(ticker=ticker): ticker for ticker in tickers}
+    try:
+        entries = caches[settings.STOCK_API_CACHE_ALIAS].get_many(list(keys))
+    except Exception:
+        logger.warning("Shared cache read failed for polled quotes", exc_info=True)
+        return {}, None
+    rows = {keys[key]: entry['row'] for key, entry in entries.items()}
+    version = min((entry['version'] for entry in entries.values()), default=None)
+    return rows, version
+
+
+def polled_versions(tickers: List[str]) -> Optional[List[int]]:
+    """Poll stamps of ``tickers`` in order, or None unless every one of them is in the polled cache."""
+    keys = [QUOTE_KEY.format(ticker=ticker) for ticker in dict.fromkeys(ticker.upper() for ticker in tickers)]
+    try:
+        entries = caches[settings.STOCK_API_CACHE_ALIAS].get_many(keys)
+    except Exception:
+        logger.warning("Shared cache read failed for polled quotes", exc_info=True)
+        return None
+    if len(entries) < len(keys):
+        return None
+    return [entries[key]['version'] for key in keys]
+
+
+async def acached_snapshot_rows(tickers: List[str]) -> Dict[str, Dict[str, Any]]:
+    keys = {QUOTE_KEY.format(ticker=ticker): ticker for ticker in tickers}
+    try:
+        entries = await caches[settings.STOCK_API_CACHE_ALIAS].aget_many(list(keys))
+    except Exception:
+        logger.warning("Shared cache read failed for polled quotes", exc_info=True)
+        return {}
+    return {keys[key]: entry['row'] for key, entry in entries.items()}
+
+
+def fetch_snapshot_rows(tickers: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Snapshot rows by ticker from the polled cache, going upstream only for the tickers it lacks."""
+    tickers = sorted({ticker.upper() for ticker in tickers})
+    rows, _ = cached_snapshot_rows(tickers)
+    missing = [ticker for ticker in tickers if ticker not in rows]
+    if missing:
+        rows.update(upstream_snapshot_rows(missing))
+    return rows
+
+
+def fetch_quotes(tickers: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+    rows = fetch_snapshot_rows(tickers)
+    return {
+        ticker: quote_from_snapshot(rows[ticker.upper()]) if ticker.upper() in rows else None
+        for ticker in tickers
+    }
+
+
+def poll_once() -> Tuple[int, int]:
+    """One poller cycle: refresh every watched ticker. Returns (tickers requested, rows stored)."""
+    tickers = watched_tickers()
+    # A refresh job: user-facing requests go first when the upstream budget runs short
+    with background_priority():
+        rows = upstream_snapshot_rows(tickers)
+    if rows:
+        store_snapshot_rows(rows, version=time.time_ns() // 1000000)
+    return len(tickers), len(rows)
+
+
+def tickers_snapshot(tickers: List[str], include_otc: bool = False) -> Dict[str, Any]:
+    """
+    Polygon-shaped snapshot response for ``tickers`` served from the polled cache; only tickers
+    missing from it are requested upstream. ``version`` is the oldest poll stamp used (None if none).
+    """
+    tickers = list(dict.fromkeys(ticker.upper() for ticker in tickers))
+    rows, version = cached_snapshot_rows(tickers)
+    missing = [ticker for ticker in tickers if ticker not in rows]
+    if missing:
+        data = PolygonClient().get_tickers_snapshot(tickers=missing, include_otc=include_otc)
+        for row in data.get('tickers') or []:
+            rows[row['ticker']] = row
+    results = [rows[ticker] for ticker in tickers if ticker in rows]
+    return {'status': 'OK', 'count': len(results), 'tickers': results, 'version': version}
@@ -0,0 +1,75 @@
+import json
+from typing import Any, Callable, Iterable, Iterator
+
+from rest_framework.renderers import BaseRenderer
+
+from core.json_codec import dumps
+from core.timeseries.columnar import to_columnar, to_columnar_binary
+
+# Row lists that get turned into columns, in lookup order (aggregates, snapshot)
+ROW_KEYS = ('results', 'tickers')
+COLUMNAR_FORMATS = ('columnar', 'columnar-bin')
+# Stands in for the streamed row list inside an envelope
+ROWS = '\x00rows\x00'
+_ROWS_JSON = json.dumps(ROWS).encode()
+_END = object()
+
+
+def _split_rows(data):
+    """Envelope ``{'status', 'data': {...}}`` -> (payload without the row list, key, rows)."""
+    payload = data.get('data') or {}
+    for key in ROW_KEYS:
+        if isinstance(payload.get(key), list):
+            return {**payload, key: None}, key, payload[key]
+    return payload, None, []
+
+
+class ColumnarJSONRenderer(BaseRenderer):
+    media_type = 'application/vnd.stockwatch.columnar+json'
+    format = 'columnar'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        payload, key, rows = _split_rows(data)
+        if key is not None:
+            payload[key] = to_columnar(rows)
+        return dumps({**data, 'data': payload})
+
+
+class ColumnarBinaryRenderer(BaseRenderer):
+    media_type = 'application/vnd.stockwatch.columnar'
+    format = 'columnar-bin'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        payload, key, rows = _split_rows(data)
+        meta = {**data, 'data': payload}
+        if key is not None:
+            meta['rows'] = key
+        return to_columnar_binary(meta, rows)
+
+
+def _json_chunks(envelope, first, rows, batch_size) -> Iterator[bytes]:
+    head, _ = json.dumps(envelope(0)).encode().split(_ROWS_JSON)
+    batch, count = [], 0
+    row = first
+    while row is not _END:
+        batch.append(dumps(row))
+        count += 1
+        if len(batch) >= batch_size:
+            yield (head + b'[' if count == len(batch) else b',') + b','.join(batch)
+            batch = []
+        row = next(rows, _END)
+    _, tail = json.dumps(envelope(count)).encode().split(_ROWS_JSON)
+    yield (head + b'[' if count == len(batch) else b',' if batch else b'') + b','.join(batch) + b']' + tail
+
+
+def stream_json(envelope: Callable[[int], Any], rows: Iterable[Any], batch_size: int = 1000) -> Iterator[bytes]:
+    """
+    Incremental JSON for ``StreamingHttpResponse``: ``envelope(count)`` is the response body with ``ROWS``
+    where the row list goes; keys depending on the final count must come after it. The first row is
+    pulled right away, so upstream errors surface before the response (and its status) is committed.
+    """
+    rows = iter(rows)
+    return _json_chunks(envelope, next(rows, _END), rows, batch_size)
@@ -0,0 +1,182 @@
+import asyncio
+import json
+import weakref
+from typing import Dict, Any, Optional, Union
+
+import aiohttp
+from django.conf import settings
+
+from core.metrics import upstream_call
+from core.stockapi.cache import MISS, ResponseCache, cache_key, cache_ttl
+from core.stockapi.polygon_client import BasePolygonClient
+from core.stockapi.ratelimit import RateLimiter
+from core.stockapi.singleflight import AsyncSingleFlight
+from core.stockapi.transport import RETRY_STATUSES, get_timeout, retry_delay
+
+
+class AsyncPolygonClient(BasePolygonClient):
+    """asyncio counterpart of PolygonClient with the same method surface."""
+    _instance = None
+
+    def _setup(self):
+        # A ClientSession is bound to the loop it was created on, so keep one pool per loop
+        # (runserver/async_to_sync spin up a fresh loop per request, uvicorn keeps a single one).
+        self._sessions = weakref.WeakKeyDictionary()
+        self.cache = ResponseCache()
+        self.flights = AsyncSingleFlight()
+        self.limiter = RateLimiter()
+
+    def _session(self) -> aiohttp.ClientSession:
+        loop = asyncio.get_running_loop()
+        session = self._sessions.get(loop)
+        if session is None or session.closed:
+            session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=settings.STOCK_API_ASYNC_MAX_CONNECTIONS,
+                    keepalive_timeout=30,
+                ),
+                headers={'Accept': 'application/json'},
+            )
+            self._sessions[loop] = session
+        return session
+
+    async def _get(
+            self,
+            endpoint: str,
+            url: str,
+            params: Dict[str, Any],
+            raw: bool = False
+    ) -> Union[Dict[str, Any], bytes]:
+        key = cache_key(endpoint, url, params, raw)
+        ttl = cache_ttl(endpoint, url, params)
+        if ttl:
+            data = await self.cache.aget(key)
+            if data is not MISS:
+                return data
+
+        return await self.flights.do(key, lambda: self._fetch(endpoint, url, params, key, ttl, raw))
+
+    async def _fetch(
+            self,
+            endpoint: str,
+            url: str,
+            params: Dict[str, Any],
+            key: str,
+            ttl: int,
+            raw: bool = False
+    ) -> Union[Dict[str, Any], bytes]:
+        if ttl:
+            # A flight for this key may have landed between our cache miss and taking the lead
+            data = self.cache.local.get(key)
+            if data is not MISS:
+                return data
+
+        # requests silently drops None params, aiohttp refuses them
+        params = {k: v for k, v in params.items() if v is not None}
+        connect, read = get_timeout(endpoint)
+        timeout = aiohttp.ClientTimeout(sock_connect=connect, sock_read=read)
+        session = self._session()
+
+        await self.limiter.aacquire()
+        retries = settings.STOCK_API_MAX_RETRIES
+        with upstream_call(endpoint) as call:
+            for attempt in range(retries + 1):
+                try:
+                    async with session.get(url, params=params, timeout=timeout) as response:
+                        call.status = response.status
+                        if response.status in RETRY_STATUSES and attempt < retries:
+                            delay = retry_delay(attempt, response.headers.get('Retry-After'))
+                        else:
+                            response.raise_for_status()
+                            body = await response.read()
+                            break
+                except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                    if attempt == retries:
+                        raise
+                    delay = retry_delay(attempt)
+                await asyncio.sleep(delay)
+                # Every retry is another upstream request, so it waits for a token like the first attempt did
+                call.exclude(await self.limiter.aacquire())
+
+        data = body if raw else json.loads(body)
+        if ttl:
+            await self.cache.aset(key, data, ttl, len(body))
+        return data
+
+
+    async def get_aggregate_data(
+            self,
+            ticker: str,
+            multiplier: int,
+            timespan: str,
+            from_date: str,
+            to_date: str,
+            adjusted: bool = True,
+            sort: str = "asc",
+            limit: int = 5000
+    ) -> Dict[str, Any]:
+        url, params = self._aggregate_request(ticker, multiplier, timespan, from_date, to_date, adjusted, sort, limit)
+        return await self._get("aggregates", url, params)
+
+
+    async def get_tickers_snapshot(
+            self,
+            tickers = None,
+            include_otc: bool = False
+    ) -> Dict[str, Any]:
+        url, params = self._tickers_snapshot_request(tickers, include_otc)
+        try:
+            return await self._get("snapshot", url, params)
+        except aiohttp.ClientError as e:
+            raise aiohttp.ClientError(f"Failed to retrieve tickers snapshot: {str(e)}")
+
+
+    async def get_search_tickers(
+            self,
+            search: str,
+            date: Optional[str] = None,
+            ticker: Optional[str] = None,
+            ticker_type: Optional[str] = None,
+            market: Optional[str] = "stocks",
+            exchange: Optional[str] = None,
+            active: bool = True,
+            limit: int = 100,
+            order: str = None,
+            sort: str = None,
+            raw: bool = False
+    ) -> Union[Dict[str, Any], bytes]:
+        url, params = self._search_tickers_request(
+            search, date, ticker, ticker_type, market, exchange, active, limit, order, sort
+        )
+        try:
+            return await self._get("search_tickers", url, params, raw)
+        except aiohttp.ClientError as e:
+            raise aiohttp.ClientError(f"API request failed: {str(e)}")
+
+
+    async def get_ticker_details(
+            self,
+            ticker: str,
+            date: Optional[str] = None,
+            raw: bool = False
+    ) -> Union[Dict[str, Any], bytes]:
+        url, params = self._ticker_details_request(ticker, date)
+        try:
+            return await self._get("ticker_details", url, params, raw)
+        except aiohttp.ClientError as e:
+            raise aiohttp.ClientError(f"Failed to retrieve ticker details: {str(e)}")
+
+
+    async def get_news(
+            self,
+            ticker: str = None,
+            published_utc: str = None,
+            order: str = "asc",
+            limit: int = 15,
+            sort: str = "published_utc"
+    ) -> Dict[str, Any]:
+        url, params = self._news_request(ticker, published_utc, order, limit, sort)
+        try:
+            return await self._get("news", url, params)
+        except aiohttp.ClientError as e:
+            raise aiohttp.ClientError(f"Failed to retrieve news: {str(e)}")
@@ -0,0 +1,205 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.cache import caches
+
+logger = logging.getLogger(__name__)
+
+MISS = object()
+
+
+def cache_key(endpoint: str, url: str, params: Dict[str, Any], raw: bool = False) -> str:
+    """
+    Stable key for an upstream request. Tickers are upper-cased, ``None`` params and the API key
+    are dropped and params are sorted, so e.g. ``get_ticker_details("aapl")`` and
+    ``get_ticker_details("AAPL", date=None)`` share one entry. Raw bodies are cached apart from parsed ones.
+    """
+    normalized = {}
+    for name, value in params.items():
+        if value is None or name == "apiKey":
+            continue
+        if name == "tickers":
+            value = ",".join(sorted(t.upper() for t in value.split(",")))
+        elif name == "ticker":
+            value = str(value).upper()
+        normalized[name] = str(value)
+    # Tickers show up in the path for aggregates and details; every other path segment is case-insensitive
+    path = urlsplit(url).path.upper()
+    identity = json.dumps([path, sorted(normalized.items())], separators=(",", ":"))
+    prefix = f"polygon:{endpoint}:raw" if raw else f"polygon:{endpoint}"
+    return f"{prefix}:{hashlib.sha1(identity.encode()).hexdigest()}"
+
+
+def is_closed_window(to_date: str) -> bool:
+    today = datetime.now(timezone.utc).date()
+    try:
+        if to_date.isdigit():
+            end = datetime.fromtimestamp(int(to_date) / 1000, tz=timezone.utc).date()
+        else:
+            end = datetime.strptime(to_date, "%Y-%m-%d").date()
+    except (ValueError, OverflowError):
+        return False
+    return end < today
+
+
+def cache_ttl(endpoint: str, url: str, params: Dict[str, Any]) -> int:
+    """Seconds a response may be served from cache; 0 disables caching for the request."""
+    ttls = settings.STOCK_API_CACHE_TTLS
+    if endpoint == "aggregates":
+        # .../range/{multiplier}/{timespan}/{from}/{to}; bars of a window that ended before today don't change
+        to_date = urlsplit(url).path.rsplit("/", 1)[-1]
+        return ttls["aggregates_closed"] if is_closed_window(to_date) else ttls["aggregates_open"]
+    return ttls.get(endpoint, 0)
+
+
+class LRUCache:
+    """Thread-safe in-process LRU bounded by both entry count and (approximate) payload bytes."""
+
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return MISS
+            expires_at, size, value = entry
+            if expires_at <= time.time():
+                del self._data[key]
+                self.total_bytes -= size
+                return MISS
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, expires_at: float, size: int):
+        # A single payload that would take over a quarter of the budget would just flush everything else
+        if size > self.max_bytes // 4:
+            return
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self.total_bytes -= old[1]
+            self._data[key] = (expires_at, size, value)
+            self.total_bytes += size
+            while len(self._data) > self.max_entries or self.total_bytes > self.max_bytes:
+                _, (_, evicted_size, _) = self._data.popitem(last=False)
+                self.total_bytes -= evicted_size
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self.total_bytes -= old[1]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.total_bytes = 0
+
+    def __len__(self):
+        return len(self._data)
+
+
+class ResponseCache:
+    """
+    Two-tier cache for decoded Polygon responses: a per-process LRU in front of the shared
+    Django cache backend. Cached values are shared between callers and must be treated as read-only.
+    An unavailable shared backend degrades to local-only caching instead of failing the request.
+    """
+
+    def __init__(self):
+        self.local = LRUCache(settings.STOCK_API_CACHE_MAX_ENTRIES, settings.STOCK_API_CACHE_MAX_BYTES)
+        self.shared = caches[settings.STOCK_API_CACHE_ALIAS]
+        self.local_hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    def _from_shared(self, key, entry):
+        if entry is None:
+            self.misses += 1
+            return MISS
+        expires_at, size, value = entry
+        self.shared_hits += 1
+        self.local.set(key, value, expires_at, size)
+        return value
+
+    def get(self, key: str):
+        value = self.local.get(key)
+        if value is not MISS:
+            self.local_hits += 1
+            return value
+        try:
+            entry = self.shared.get(key)
+        except Exception:
+            logger.warning("Shared cache read failed for %s", key, exc_info=True)
+            entry = None
+        return self._from_shared(key, entry)
+
+    async def aget(self, key: str):
+        value = self.local.get(key)
+        if value is not MISS:
+            self.local_hits += 1
+            return value
+        try:
+            entry = await self.shared.aget(key)
+        except Exception:
+            logger.warning("Shared cache read failed for %s", key, exc_info=True)
+            entry = None
+        return self._from_shared(key, entry)
+
+    def peek(self, key: str):
+        """Like get() but without touching the hit/miss counters (used while polling)."""
+        value = self.local.get(key)
+        if value is not MISS:
+            return value
+        try:
+            entry = self.shared.get(key)
+        except Exception:
+            return MISS
+        if entry is None:
+            return MISS
+        expires_at, size, value = entry
+        self.local.set(key, value, expires_at, size)
+        return value
+
+    def set(self, key: str, value: Any, ttl: int, size: int):
+        expires_at = time.time() + ttl
+        self.local.set(key, value, expires_at, size)
+        try:
+            self.shared.set(key, (expires_at, size, value), ttl)
+        except Exception:
+            logger.warning("Shared cache write failed for %s", key, exc_info=True)
+
+    async def aset(self, key: str, value: Any, ttl: int, size: int):
+        expires_at = time.time() + ttl
+        self.local.set(key, value, expires_at, size)
+        try:
+            await self.shared.aset(key, (expires_at, size, value), ttl)
+        except Exception:
+            logger.warning("Shared cache write failed for %s", key, exc_info=True)
+
+    def stats(self) -> Dict[str, Optional[int]]:
+        lookups = self.local_hits + self.shared_hits + self.misses
+        return {
+            "local_hits": self.local_hits,
+            "shared_hits": self.shared_hits,
+            "misses": self.misses,
+            "hit_ratio": round((self.local_hits + self.shared_hits) / lookups, 4) if lookups else None,
+            "evictions": self.local.evictions,
+            "local_entries": len(self.local),
+            "local_bytes": self.local.total_bytes,
+        }
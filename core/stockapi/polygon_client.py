@@ -1,20 +1,37 @@
 import requests
 from django.conf import settings
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Iterator, Optional, Tuple, Union
 
+from core.metrics import upstream_call
+from core.stockapi.cache import MISS, ResponseCache, cache_key, cache_ttl
+from core.stockapi.ratelimit import RateLimiter, thread_pool
+from core.stockapi.singleflight import SingleFlight
+from core.stockapi.transport import build_session, get_timeout
 
-class PolygonClient:
+VALID_TIMESPANS = ["second", "minute", "hour", "day", "week", "month", "quarter", "year"]
+# Largest page Polygon's news endpoint will return
+NEWS_PAGE_LIMIT = 1000
+# Largest page of the reference tickers endpoint
+REFERENCE_PAGE_LIMIT = 1000
+
+
+class BasePolygonClient:
+    """Validation and URL/params building shared by the sync and async clients."""
     _instance = None
 
     def __new__(cls):
         if cls._instance is None:
-            cls._instance = super(PolygonClient, cls).__new__(cls)
+            cls._instance = super(BasePolygonClient, cls).__new__(cls)
             cls._instance.api_key = settings.STOCK_API_KEY
             cls._instance.base_url = settings.STOCK_API_BASE_URL
+            cls._instance._setup()
         return cls._instance
 
+    def _setup(self):
+        pass
 
-    def get_aggregate_data(
+
+    def _aggregate_request(
             self,
             ticker: str,
             multiplier: int,
@@ -24,10 +41,9 @@ class PolygonClient:
             adjusted: bool = True,
             sort: str = "asc",
             limit: int = 5000
-    ) -> Dict[str, Any]:
-        valid_timespans = ["second", "minute", "hour", "day", "week", "month", "quarter", "year"]
-        if timespan not in valid_timespans:
-            raise ValueError(f"Invalid parameter \"timespan\". Valid options: {', '.join(valid_timespans)}")
+    ) -> Tuple[str, Dict[str, Any]]:
+        if timespan not in VALID_TIMESPANS:
+            raise ValueError(f"Invalid parameter \"timespan\". Valid options: {', '.join(VALID_TIMESPANS)}")
 
         if not ticker or not isinstance(multiplier, int) or not timespan or not from_date or not to_date:
             raise ValueError("Invalid query parameters.")
@@ -39,17 +55,14 @@ class PolygonClient:
             "limit": limit,
             "apiKey": self.api_key
         }
-
-        response = requests.get(url, params=params)
-        response.raise_for_status()
-        return response.json()
+        return url, params
 
 
-    def get_tickers_snapshot(
+    def _tickers_snapshot_request(
             self,
             tickers = None,
             include_otc: bool = False
-    ) -> Dict[str, Any]:
+    ) -> Tuple[str, Dict[str, Any]]:
 
         url = f"{self.base_url}/v2/snapshot/locale/us/markets/stocks/tickers"
         params = {
@@ -62,16 +75,10 @@ class PolygonClient:
             if not isinstance(tickers, list) or not all(isinstance(t, str) and t for t in tickers):
                 raise ValueError("Tickers must be a list of non-empty strings")
             params["tickers"] = ",".join(tickers)
+        return url, params
 
-        try:
-            response = requests.get(url, params=params)
-            response.raise_for_status()
-            return response.json()
-        except requests.exceptions.RequestException as e:
-            raise requests.exceptions.RequestException(f"Failed to retrieve tickers snapshot: {str(e)}")
 
-
-    def get_search_tickers(
+    def _search_tickers_request(
             self,
             search: str,
             date: Optional[str] = None,
@@ -83,7 +90,7 @@ class PolygonClient:
             limit: int = 100,
             order: str = None,
             sort: str = None
-    ) -> Dict[str, Any]:
+    ) -> Tuple[str, Dict[str, Any]]:
 
         if not search:
             raise ValueError("Search parameter is required.")
@@ -109,20 +116,32 @@ class PolygonClient:
             params["market"] = market
         if exchange:
             params["exchange"] = exchange
+        return url, params
 
-        try:
-            response = requests.get(url, params=params)
-            response.raise_for_status()
-            return response.json()
-        except requests.exceptions.RequestException as e:
-            raise requests.exceptions.RequestException(f"API request failed: {str(e)}")
+
+    def _reference_tickers_request(
+            self,
+            market: str = "stocks",
+            active: bool = True,
+            limit: int = REFERENCE_PAGE_LIMIT
+    ) -> Tuple[str, Dict[str, Any]]:
+        url = f"{self.base_url}/v3/reference/tickers"
+        params = {
+            "apiKey": self.api_key,
+            "market": market,
+            "active": str(active).lower(),
+            "order": "asc",
+            "sort": "ticker",
+            "limit": max(1, min(limit, REFERENCE_PAGE_LIMIT)),
+        }
+        return url, params
 
 
-    def get_ticker_details(
+    def _ticker_details_request(
             self,
             ticker: str,
             date: Optional[str] = None
-    ) -> Dict[str, Any]:
+    ) -> Tuple[str, Dict[str, Any]]:
 
         if not ticker or not isinstance(ticker, str):
             raise ValueError("Ticker parameter is required and must be a non-empty string.")
@@ -136,23 +155,19 @@ class PolygonClient:
         # Add date parameter if provided
         if date:
             params["date"] = date
-
-        try:
-            response = requests.get(url, params=params)
-            response.raise_for_status()
-            return response.json()
-        except requests.exceptions.RequestException as e:
-            raise requests.exceptions.RequestException(f"Failed to retrieve ticker details: {str(e)}")
+        return url, params
 
 
-    def get_news(
+    def _news_request(
             self,
             ticker: str = None,
             published_utc: str = None,
             order: str = "asc",
             limit: int = 15,
-            sort: str = "published_utc"
-    ) -> Dict[str, Any]:
+            sort: str = "published_utc",
+            published_utc_gte: Optional[str] = None,
+            published_utc_lte: Optional[str] = None
+    ) -> Tuple[str, Dict[str, Any]]:
         url = f"{self.base_url}/v2/reference/news"
         params = {
             "apiKey": self.api_key,
@@ -162,12 +177,224 @@ class PolygonClient:
             "limit": limit,
             "sort": sort,
         }
+        # Range bounds, used for incremental fetches
+        if published_utc_gte:
+            params["published_utc.gte"] = published_utc_gte
+        if published_utc_lte:
+            params["published_utc.lte"] = published_utc_lte
+        return url, params
 
-        try:
-            response = requests.get(url, params=params)
+
+class PolygonClient(BasePolygonClient):
+    _instance = None
+
+    def _setup(self):
+        self.limiter = RateLimiter()
+        self.session = build_session(self.limiter)
+        self.cache = ResponseCache()
+        self.flights = SingleFlight()
+
+    def _get(self, endpoint: str, url: str, params: Dict[str, Any], raw: bool = False) -> Union[Dict[str, Any], bytes]:
+        key = cache_key(endpoint, url, params, raw)
+        ttl = cache_ttl(endpoint, url, params)
+        if ttl:
+            data = self.cache.get(key)
+            if data is not MISS:
+                return data
+
+        # Identical concurrent calls (same normalized key) share a single upstream request
+        return self.flights.do(
+            key,
+            lambda: self._fetch(endpoint, url, params, key, ttl, raw),
+            peer_result=(lambda: self.cache.peek(key)) if ttl else None,
+        )
+
+    def _fetch(
+            self,
+            endpoint: str,
+            url: str,
+            params: Dict[str, Any],
+            key: str,
+            ttl: int,
+            raw: bool = False
+    ) -> Union[Dict[str, Any], bytes]:
+        if ttl:
+            # A flight for this key may have landed between our cache miss and taking the lead
+            data = self.cache.local.get(key)
+            if data is not MISS:
+                return data
+
+        self.limiter.acquire()
+        with upstream_call(endpoint) as call:
+            response = self.session.get(url, params=params, timeout=get_timeout(endpoint))
+            call.status = response.status_code
             response.raise_for_status()
-            return response.json()
+        # Raw: the body as sent, for callers passing it on without looking inside
+        data = response.content if raw else response.json()
+        if ttl:
+            self.cache.set(key, data, ttl, len(response.content))
+        return data
+
+    def _iter_pages(
+            self,
+            endpoint: str,
+            url: str,
+            params: Dict[str, Any],
+            max_pages: Optional[int] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Response pages following Polygon's ``next_url`` cursor, fetched lazily: the next page is
+        requested in the background while the caller works through the current one. Pages bypass
+        the response cache; they are typically large and consumed once.
+        """
+        pool = thread_pool(max_workers=1)
+        try:
+            future = pool.submit(self._fetch, endpoint, url, params, None, 0)
+            pages = 0
+            while future is not None:
+                page = future.result()
+                pages += 1
+                next_url = page.get('next_url')
+                future = None
+                if next_url and (max_pages is None or pages < max_pages):
+                    # next_url carries every original query param except the API key
+                    future = pool.submit(self._fetch, endpoint, next_url, {"apiKey": self.api_key}, None, 0)
+                yield page
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+    def get_aggregate_data(
+            self,
+            ticker: str,
+            multiplier: int,
+            timespan: str,
+            from_date: str,
+            to_date: str,
+            adjusted: bool = True,
+            sort: str = "asc",
+            limit: int = 5000
+    ) -> Dict[str, Any]:
+        url, params = self._aggregate_request(ticker, multiplier, timespan, from_date, to_date, adjusted, sort, limit)
+        return self._get("aggregates", url, params)
+
+
+    def iter_aggregate_pages(
+            self,
+            ticker: str,
+            multiplier: int,
+            timespan: str,
+            from_date: str,
+            to_date: str,
+            adjusted: bool = True,
+            sort: str = "asc",
+            page_size: int = 50000
+    ) -> Iterator[Dict[str, Any]]:
+        """Every page of an aggregates query; ``get_aggregate_data`` stops after the first."""
+        url, params = self._aggregate_request(
+            ticker, multiplier, timespan, from_date, to_date, adjusted, sort, page_size
+        )
+        return self._iter_pages("aggregates", url, params)
+
+
+    def get_tickers_snapshot(
+            self,
+            tickers = None,
+            include_otc: bool = False
+    ) -> Dict[str, Any]:
+        url, params = self._tickers_snapshot_request(tickers, include_otc)
+        try:
+            return self._get("snapshot", url, params)
+        except requests.exceptions.RequestException as e:
+            raise requests.exceptions.RequestException(f"Failed to retrieve tickers snapshot: {str(e)}")
+
+
+    def get_search_tickers(
+            self,
+            search: str,
+            date: Optional[str] = None,
+            ticker: Optional[str] = None,
+            ticker_type: Optional[str] = None,
+            market: Optional[str] = "stocks",
+            exchange: Optional[str] = None,
+            active: bool = True,
+            limit: int = 100,
+            order: str = None,
+            sort: str = None,
+            raw: bool = False
+    ) -> Union[Dict[str, Any], bytes]:
+        url, params = self._search_tickers_request(
+            search, date, ticker, ticker_type, market, exchange, active, limit, order, sort
+        )
+        try:
+            return self._get("search_tickers", url, params, raw)
+        except requests.exceptions.RequestException as e:
+            raise requests.exceptions.RequestException(f"API request failed: {str(e)}")
+
+
+    def iter_reference_tickers(
+            self,
+            market: str = "stocks",
+            active: bool = True,
+            page_size: int = REFERENCE_PAGE_LIMIT
+    ) -> Iterator[Dict[str, Any]]:
+        """Every ticker of ``market`` (reference rows, as search returns them), page after page."""
+        url, params = self._reference_tickers_request(market, active, page_size)
+        for page in self._iter_pages("reference_tickers", url, params):
+            yield from page.get("results") or []
+
+
+    def get_ticker_details(
+            self,
+            ticker: str,
+            date: Optional[str] = None,
+            raw: bool = False
+    ) -> Union[Dict[str, Any], bytes]:
+        url, params = self._ticker_details_request(ticker, date)
+        try:
+            return self._get("ticker_details", url, params, raw)
+        except requests.exceptions.RequestException as e:
+            raise requests.exceptions.RequestException(f"Failed to retrieve ticker details: {str(e)}")
+
+
+    def get_news(
+            self,
+            ticker: str = None,
+            published_utc: str = None,
+            order: str = "asc",
+            limit: int = 15,
+            sort: str = "published_utc"
+    ) -> Dict[str, Any]:
+        url, params = self._news_request(ticker, published_utc, order, limit, sort)
+        try:
+            return self._get("news", url, params)
         except requests.exceptions.RequestException as e:
             raise requests.exceptions.RequestException(f"Failed to retrieve news: {str(e)}")
-        pass
 
+
+    def iter_news(
+            self,
+            ticker: str = None,
+            published_utc: str = None,
+            order: str = "asc",
+            limit: Optional[int] = None,
+            sort: str = "published_utc",
+            page_size: int = NEWS_PAGE_LIMIT,
+            published_utc_gte: Optional[str] = None,
+            published_utc_lte: Optional[str] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """News articles across as many pages as needed for ``limit`` (None: all of them)."""
+        max_pages = None
+        if limit is not None:
+            page_size = max(1, min(page_size, limit))
+            max_pages = -(-limit // page_size)
+        url, params = self._news_request(
+            ticker, published_utc, order, page_size, sort, published_utc_gte, published_utc_lte
+        )
+        count = 0
+        for page in self._iter_pages("news", url, params, max_pages):
+            for article in page.get("results") or []:
+                if limit is not None and count >= limit:
+                    return
+                count += 1
+                yield article
@@ -0,0 +1,212 @@
+import asyncio
+import contextvars
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Dict, Optional, Tuple
+
+import requests
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+PRIORITIES = (INTERACTIVE, BACKGROUND)
+
+# Tokens taken during refill period {period}; every process counts into the same key
+BUCKET_KEY = "stock_api:ratelimit:{period}"
+# Background callers come back this far into a refill period, so interactive ones get first go at it
+BACKGROUND_LAG = 0.1
+
+_priority = contextvars.ContextVar("stock_api_priority", default=INTERACTIVE)
+
+
+def current_priority() -> str:
+    return _priority.get()
+
+
+@contextmanager
+def priority(value: str):
+    """Upstream calls made inside the block (on this thread or task) queue at ``value``."""
+    if value not in PRIORITIES:
+        raise ValueError(f"Invalid priority \"{value}\". Valid options: {', '.join(PRIORITIES)}")
+    token = _priority.set(value)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def background_priority():
+    return priority(BACKGROUND)
+
+
+def thread_pool(max_workers: int) -> ThreadPoolExecutor:
+    """A ThreadPoolExecutor whose threads make their upstream calls at the caller's priority."""
+    return ThreadPoolExecutor(max_workers=max_workers, initializer=_priority.set, initargs=(_priority.get(),))
+
+
+class RateLimited(requests.exceptions.RequestException):
+    """No upstream request budget came free within the caller's maximum wait."""
+
+
+class RateLimiter:
+    """
+    Token bucket for upstream requests, shared by every process through the shared cache (per
+    process with LocMem). The bucket holds STOCK_API_RATE_LIMIT_BURST tokens and is refilled in full
+    every burst / STOCK_API_RATE_LIMIT seconds; the tokens of one refill period are a counter taken
+    from with an atomic ``incr``, so any cache backend will do.
+
+    Background callers leave STOCK_API_RATE_LIMIT_RESERVE of each refill to interactive ones and, within
+    a process, step aside while interactive callers are queued. A caller finding the bucket empty
+    waits for the next refill, up to its priority's maximum wait, and then gets RateLimited. If the
+    shared cache is unreachable requests go through unlimited.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.queued = dict.fromkeys(PRIORITIES, 0)
+        self.max_queued = dict.fromkeys(PRIORITIES, 0)
+        self.acquired = dict.fromkeys(PRIORITIES, 0)
+        self.waited = dict.fromkeys(PRIORITIES, 0)
+        self.wait_seconds = dict.fromkeys(PRIORITIES, 0.0)
+        self.max_wait_seconds = dict.fromkeys(PRIORITIES, 0.0)
+        self.rejected = dict.fromkeys(PRIORITIES, 0)
+        self.errors = 0
+
+    @staticmethod
+    def _bucket() -> Tuple[int, float]:
+        """(burst, refill period in seconds)."""
+        rate = settings.STOCK_API_RATE_LIMIT
+        burst = settings.STOCK_API_RATE_LIMIT_BURST or max(1, round(rate))
+        return burst, burst / rate
+
+    def _limit(self, priority: str, burst: int) -> int:
+        if priority == INTERACTIVE:
+            return burst
+        return max(1, int(burst * (1 - settings.STOCK_API_RATE_LIMIT_RESERVE)))
+
+    def _until_refill(self, priority: str) -> float:
+        _, period = self._bucket()
+        now = time.time()
+        delay = (now // period + 1) * period - now
+        if priority == BACKGROUND:
+            delay += period * BACKGROUND_LAG * random.uniform(1, 2)
+        return delay
+
+    def _take(self, priority: str) -> bool:
+        burst, period = self._bucket()
+        key = BUCKET_KEY.format(period=int(time.time() // period))
+        shared = caches[settings.STOCK_API_CACHE_ALIAS]
+        try:
+            shared.add(key, 0, timeout=int(period) + 60)
+            taken = shared.incr(key)
+            if taken <= self._limit(priority, burst):
+                return True
+            if taken <= burst:
+                # Hand back the reserved token this background caller mustn't have
+                shared.decr(key)
+            return False
+        except Exception:
+            self.errors += 1
+            logger.warning("Shared cache unavailable for %s, not rate limiting", key, exc_info=True)
+            return True
+
+    async def _atake(self, priority: str) -> bool:
+        # Not the cache's own aincr: for most backends that's a get and a set, so not atomic
+        # Only the cache is touched, so no need to queue on the thread that runs ORM work
+        return await sync_to_async(self._take, thread_sensitive=False)(priority)
+
+    def _may_take(self, priority: str) -> bool:
+        return priority == INTERACTIVE or not self.queued[INTERACTIVE]
+
+    def _next_delay(self, priority: str, started: float) -> float:
+        delay = self._until_refill(priority)
+        max_wait = (
+            settings.STOCK_API_RATE_LIMIT_INTERACTIVE_MAX_WAIT if priority == INTERACTIVE
+            else settings.STOCK_API_RATE_LIMIT_BACKGROUND_MAX_WAIT
+        )
+        if time.monotonic() + delay > started + max_wait:
+            with self._lock:
+                self.rejected[priority] += 1
+            raise RateLimited(f"Upstream request budget exhausted (waited up to {max_wait}s at {priority} priority)")
+        return delay
+
+    def _enqueue(self, priority: str):
+        with self._lock:
+            self.queued[priority] += 1
+            self.max_queued[priority] = max(self.max_queued[priority], self.queued[priority])
+
+    def _dequeue(self, priority: str, started: float, acquired: bool) -> float:
+        waited = time.monotonic() - started
+        with self._lock:
+            self.queued[priority] -= 1
+            if acquired:
+                self.acquired[priority] += 1
+                self.waited[priority] += 1
+                self.wait_seconds[priority] += waited
+                self.max_wait_seconds[priority] = max(self.max_wait_seconds[priority], waited)
+        return waited
+
+    def acquire(self, priority: Optional[str] = None) -> float:
+        """Takes a token, waiting for one if need be. Returns the seconds waited."""
+        if not settings.STOCK_API_RATE_LIMIT:
+            return 0.0
+        priority = priority or current_priority()
+        started = time.monotonic()
+        if self._may_take(priority) and self._take(priority):
+            with self._lock:
+                self.acquired[priority] += 1
+            return 0.0
+
+        self._enqueue(priority)
+        acquired = False
+        try:
+            while not acquired:
+                time.sleep(self._next_delay(priority, started))
+                acquired = self._may_take(priority) and self._take(priority)
+        finally:
+            waited = self._dequeue(priority, started, acquired)
+        return waited
+
+    async def aacquire(self, priority: Optional[str] = None) -> float:
+        if not settings.STOCK_API_RATE_LIMIT:
+            return 0.0
+        priority = priority or current_priority()
+        started = time.monotonic()
+        if self._may_take(priority) and await self._atake(priority):
+            with self._lock:
+                self.acquired[priority] += 1
+            return 0.0
+
+        self._enqueue(priority)
+        acquired = False
+        try:
+            while not acquired:
+                await asyncio.sleep(self._next_delay(priority, started))
+                acquired = self._may_take(priority) and await self._atake(priority)
+        finally:
+            waited = self._dequeue(priority, started, acquired)
+        return waited
+
+    def stats(self) -> Dict[str, Any]:
+        stats = {
+            priority: {
+                "queued": self.queued[priority],
+                "max_queued": self.max_queued[priority],
+                "acquired": self.acquired[priority],
+                "waited": self.waited[priority],
+                "wait_seconds": round(self.wait_seconds[priority], 3),
+                "max_wait_seconds": round(self.max_wait_seconds[priority], 3),
+                "rejected": self.rejected[priority],
+            }
+            for priority in PRIORITIES
+        }
+        stats["cache_errors"] = self.errors
+        return stats
@@ -0,0 +1,146 @@
+import asyncio
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from django.conf import settings
+from django.core.cache import caches
+
+from core.stockapi.cache import MISS
+
+
+class _Call:
+    __slots__ = ('event', 'result', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical upstream requests: the first caller for a key runs ``fn``,
+    everyone else arriving before it finishes waits and gets the same result (or exception).
+
+    With ``peer_result`` the leader additionally takes a short-lived lock in the shared cache, so
+    other worker processes asking for the same key poll ``peer_result`` instead of calling upstream.
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, _Call] = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.deduplicated = 0
+        self.shared_deduplicated = 0
+
+    def do(self, key: str, fn: Callable[[], Any], peer_result: Optional[Callable[[], Any]] = None):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.leaders += 1
+            else:
+                self.deduplicated += 1
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            if peer_result is not None and settings.STOCK_API_SINGLEFLIGHT_SHARED:
+                call.result = self._do_shared(key, fn, peer_result)
+            else:
+                call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+    def _do_shared(self, key: str, fn: Callable[[], Any], peer_result: Callable[[], Any]):
+        shared = caches[settings.STOCK_API_CACHE_ALIAS]
+        lock_key = f"{key}:flight"
+        try:
+            acquired = shared.add(lock_key, 1, timeout=settings.STOCK_API_SINGLEFLIGHT_LOCK_TTL)
+        except Exception:
+            return fn()
+
+        if acquired:
+            try:
+                return fn()
+            finally:
+                try:
+                    shared.delete(lock_key)
+                except Exception:
+                    pass  # expires on its own after STOCK_API_SINGLEFLIGHT_LOCK_TTL
+
+        # Another process is fetching the same thing; wait for it to land in the shared cache
+        deadline = time.monotonic() + settings.STOCK_API_SINGLEFLIGHT_WAIT
+        while time.monotonic() < deadline:
+            time.sleep(settings.STOCK_API_SINGLEFLIGHT_POLL)
+            value = peer_result()
+            if value is not MISS:
+                self.shared_deduplicated += 1
+                return value
+            if shared.get(lock_key) is None:
+                # The peer finished without caching anything (most likely it failed)
+                break
+        return fn()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "leaders": self.leaders,
+            "deduplicated": self.deduplicated,
+            "shared_deduplicated": self.shared_deduplicated,
+            "in_flight": len(self._calls),
+        }
+
+
+class AsyncSingleFlight:
+    """Event-loop flavour of SingleFlight (in-process only) used by AsyncPolygonClient."""
+
+    def __init__(self):
+        self._calls: Dict[Any, asyncio.Future] = {}
+        self.leaders = 0
+        self.deduplicated = 0
+
+    async def do(self, key: str, fn: Callable[[], Any]):
+        # Futures belong to a loop, so key on the running loop as well
+        flight_key = (asyncio.get_running_loop(), key)
+        future = self._calls.get(flight_key)
+        if future is not None:
+            self.deduplicated += 1
+            return await asyncio.shield(future)
+
+        self.leaders += 1
+        future = self._calls[flight_key] = asyncio.get_running_loop().create_future()
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark retrieved so a flight nobody waited on doesn't log "exception never retrieved"
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._calls[flight_key]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "leaders": self.leaders,
+            "deduplicated": self.deduplicated,
+            "shared_deduplicated": 0,
+            "in_flight": len(self._calls),
+        }
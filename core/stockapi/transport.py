@@ -0,0 +1,83 @@
+import random
+
+import requests
+from django.conf import settings
+from typing import Optional
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import InvalidHeader
+from urllib3.util.retry import Retry
+
+from core.metrics import exclude_from_upstream
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class PolygonRetry(Retry):
+    def __init__(self, *args, limiter=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.limiter = limiter
+
+    def new(self, **kw):
+        return super().new(limiter=self.limiter, **kw)
+
+    def increment(self, *args, **kwargs):
+        retry = super().increment(*args, **kwargs)
+        # Every retry is another upstream request, so it waits for a token like the first attempt did
+        if self.limiter is not None:
+            exclude_from_upstream(self.limiter.acquire())
+        return retry
+
+    def get_retry_after(self, response):
+        retry_after = super().get_retry_after(response)
+        if retry_after is None:
+            return None
+        # Don't let a single Retry-After header park a worker for minutes
+        return min(retry_after, settings.STOCK_API_RETRY_AFTER_MAX)
+
+
+def build_retry(limiter=None) -> Retry:
+    return PolygonRetry(
+        limiter=limiter,
+        total=settings.STOCK_API_MAX_RETRIES,
+        backoff_factor=settings.STOCK_API_BACKOFF_FACTOR,
+        backoff_jitter=settings.STOCK_API_BACKOFF_JITTER,
+        backoff_max=settings.STOCK_API_BACKOFF_MAX,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset(['GET']),
+        respect_retry_after_header=True,
+        # Hand the last 429/5xx back to the caller so raise_for_status() reports it
+        raise_on_status=False,
+    )
+
+
+def build_session(limiter=None) -> requests.Session:
+    """Pooled session retrying 429/5xx and connection errors; retries take a token from ``limiter``."""
+    adapter = HTTPAdapter(
+        pool_connections=settings.STOCK_API_POOL_CONNECTIONS,
+        pool_maxsize=settings.STOCK_API_POOL_MAXSIZE,
+        pool_block=settings.STOCK_API_POOL_BLOCK,
+        max_retries=build_retry(limiter),
+    )
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers.update({'Accept': 'application/json', 'Accept-Encoding': 'gzip'})
+    return session
+
+
+def get_timeout(endpoint: str):
+    """(connect, read) timeout in seconds for the given endpoint."""
+    timeouts = settings.STOCK_API_TIMEOUTS
+    return timeouts.get(endpoint, timeouts['default'])
+
+
+def retry_delay(attempt: int, retry_after: Optional[str] = None) -> float:
+    """Seconds to wait before retry number ``attempt`` (0-based), mirroring PolygonRetry."""
+    if retry_after:
+        try:
+            return min(Retry().parse_retry_after(retry_after), settings.STOCK_API_RETRY_AFTER_MAX)
+        except InvalidHeader:
+            pass
+    delay = settings.STOCK_API_BACKOFF_FACTOR * (2 ** attempt)
+    delay += random.uniform(0, settings.STOCK_API_BACKOFF_JITTER)
+    return min(delay, settings.STOCK_API_BACKOFF_MAX)
@@ -0,0 +1,133 @@
+"""
+Live quote fan-out. Every streaming connection is a Subscription on its event loop's QuoteHub; the
+hub runs one feed for the union of subscribed tickers (reading the poll_snapshots cache, upstream only
+for tickers it lacks) and hands each subscriber just the quotes that changed. An idle connection costs
+a Subscription and a suspended coroutine, no thread, so one ASGI process holds thousands of them.
+"""
+import asyncio
+import logging
+import weakref
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from django.conf import settings
+
+from core.models import WatchlistItem
+from core.quotes import acached_snapshot_rows, chunk_tickers, quote_from_snapshot
+from core.stockapi.async_client import AsyncPolygonClient
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription:
+    """Latest pending quote per ticker; a slow consumer skips intermediate values instead of queueing them."""
+
+    def __init__(self, tickers: Iterable[str]):
+        self.tickers = frozenset(tickers)
+        self._pending: Dict[str, Any] = {}
+        self._event = asyncio.Event()
+
+    def push(self, ticker: str, quote: Dict[str, Any]):
+        self._pending[ticker] = quote
+        self._event.set()
+
+    async def changes(self, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """Quotes changed since the last call, or {} if nothing changed within ``timeout``."""
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return {}
+        self._event.clear()
+        pending, self._pending = self._pending, {}
+        return pending
+
+
+class QuoteHub:
+    def __init__(self):
+        self._subscribers: Dict[str, Set[Subscription]] = defaultdict(set)
+        self._quotes: Dict[str, Dict[str, Any]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def subscribe(self, tickers: Iterable[str]) -> Subscription:
+        subscription = Subscription(tickers)
+        for ticker in subscription.tickers:
+            self._subscribers[ticker].add(subscription)
+            if ticker in self._quotes:
+                subscription.push(ticker, self._quotes[ticker])
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        for ticker in subscription.tickers:
+            subscribers = self._subscribers.get(ticker)
+            if subscribers is None:
+                continue
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[ticker]
+                self._quotes.pop(ticker, None)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "tickers": len(self._subscribers),
+            "subscriptions": len(set().union(*self._subscribers.values())) if self._subscribers else 0,
+        }
+
+    async def _fetch(self, tickers: List[str]) -> Dict[str, Dict[str, Any]]:
+        rows = await acached_snapshot_rows(tickers)
+        missing = [ticker for ticker in tickers if ticker not in rows]
+        if missing:
+            client = AsyncPolygonClient()
+            responses = await asyncio.gather(*(
+                client.get_tickers_snapshot(tickers=chunk)
+                for chunk in chunk_tickers(missing, settings.STOCK_API_SNAPSHOT_CHUNK_SIZE)
+            ))
+            for response in responses:
+                for row in response.get('tickers') or []:
+                    rows[row['ticker']] = row
+        return rows
+
+    async def _run(self):
+        while self._subscribers:
+            try:
+                rows = await self._fetch(sorted(self._subscribers))
+            except Exception:
+                logger.warning("Quote stream refresh failed", exc_info=True)
+                rows = {}
+            for ticker, row in rows.items():
+                quote = quote_from_snapshot(row)
+                if self._quotes.get(ticker) == quote or ticker not in self._subscribers:
+                    continue
+                self._quotes[ticker] = quote
+                for subscription in self._subscribers[ticker]:
+                    subscription.push(ticker, quote)
+            await asyncio.sleep(settings.STOCK_STREAM_INTERVAL)
+
+
+_hubs: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, QuoteHub]" = weakref.WeakKeyDictionary()
+
+
+def get_hub() -> QuoteHub:
+    loop = asyncio.get_running_loop()
+    hub = _hubs.get(loop)
+    if hub is None:
+        hub = _hubs[loop] = QuoteHub()
+    return hub
+
+
+def resolve_tickers(user, watchlist_id: Optional[str], tickers: Optional[str]) -> List[str]:
+    if watchlist_id:
+        items = WatchlistItem.objects.filter(watchlist_id=watchlist_id, watchlist__user=user)
+        symbols = list(items.values_list('ticker', flat=True))
+        if not symbols and not user.watchlists.filter(id=watchlist_id).exists():
+            raise LookupError("Watchlista nie istnieje lub nie należy do użytkownika.")
+    elif tickers:
+        symbols = tickers.split(',')
+    else:
+        raise ValueError("Either \"watchlist\" or \"tickers\" is required.")
+
+    symbols = sorted({symbol.strip().upper() for symbol in symbols if symbol.strip()})
+    if len(symbols) > settings.STOCK_STREAM_MAX_TICKERS:
+        raise ValueError(f"At most {settings.STOCK_STREAM_MAX_TICKERS} tickers per stream.")
+    return symbols
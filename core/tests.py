@@ -1,3 +1,588 @@
-from django.test import TestCase
+import json
+import math
+import random
+from datetime import datetime, timedelta, timezone
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework_simplejwt.tokens import RefreshToken
+from urllib3.response import HTTPResponse
+
+from core import token_blacklist, user_cache
+from core.bar_store import get_aggregate_bars
+from core.models import AggregateBar, AggregateCoverage, NewsFeed, Watchlist, WatchlistItem
+from core.news_store import list_news, query_news, store_articles
+from core.serializers import WatchlistSerializer
+from core.ticker_index import upsert_ticker_symbols
+from core.stockapi.transport import build_retry
+from core.timeseries import indicators
+from core.views.stream_views import websocket_quotes
+from core.timeseries.columnar import from_columnar_binary, to_columnar_binary
+from core.timeseries.downsample import minmax
+
+
+class WatchlistReadQueryCountTests(TestCase):
+    # One query resolves the authenticated user, one loads every watchlist with its items
+    EXPECTED_QUERIES = 2
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='tester', password='secret')
+        self.client.cookies['access_token'] = str(RefreshToken.for_user(self.user).access_token)
+
+    def create_watchlists(self, count, items_per_watchlist=3):
+        watchlists = Watchlist.objects.bulk_create(
+            Watchlist(user=self.user, name=f'Watchlist {i}') for i in range(count)
+        )
+        WatchlistItem.objects.bulk_create(
+            WatchlistItem(watchlist=watchlist, ticker=f'T{i}', name=f'Ticker {i}')
+            for watchlist in watchlists
+            for i in range(items_per_watchlist)
+        )
+        return watchlists
+
+    def get_data(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.content)['data']
+
+    def assert_all_watchlists_constant(self, count):
+        self.create_watchlists(count)
+        with self.assertNumQueries(self.EXPECTED_QUERIES):
+            data = self.get_data('/api/watchlists/all')
+        self.assertEqual(len(data), count)
+
+    def test_all_watchlists_1(self):
+        self.assert_all_watchlists_constant(1)
+
+    def test_all_watchlists_50(self):
+        self.assert_all_watchlists_constant(50)
+
+    def test_all_watchlists_500(self):
+        self.assert_all_watchlists_constant(500)
+
+    def test_all_watchlists_matches_serializer(self):
+        self.create_watchlists(5)
+        Watchlist.objects.create(user=self.user, name='Empty')
+        other = User.objects.create_user(username='other', password='secret')
+        Watchlist.objects.create(user=other, name='Not mine')
+
+        expected = WatchlistSerializer(Watchlist.objects.filter(user=self.user).order_by('id'), many=True).data
+        self.assertEqual(self.get_data('/api/watchlists/all'), json.loads(json.dumps(expected)))
+
+    def test_watchlist_by_id(self):
+        watchlists = self.create_watchlists(50)
+        with self.assertNumQueries(self.EXPECTED_QUERIES):
+            data = self.get_data(f'/api/watchlists/{watchlists[10].id}/')
+        self.assertEqual(data, json.loads(json.dumps(WatchlistSerializer(watchlists[10]).data)))
+
+    def test_watchlist_by_id_of_other_user(self):
+        other = User.objects.create_user(username='other', password='secret')
+        watchlist = Watchlist.objects.create(user=other, name='Not mine')
+        response = self.client.get(f'/api/watchlists/{watchlist.id}/')
+        self.assertEqual(response.status_code, 404)
+
+
+
+class WatchlistBulkEditTests(TestCase):
+    # Savepoint, locking the watchlist, reading its items, one write, release, reading the result back
+    EXPECTED_QUERIES = 6
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='tester', password='secret')
+        self.client.cookies['access_token'] = str(RefreshToken.for_user(self.user).access_token)
+        self.watchlist = Watchlist.objects.create(user=self.user, name='Main')
+        # Resolves the user once, so the counts below are the endpoints' own
+        self.client.get('/api/user_info')
+
+    def send(self, action, payload, method='post', watchlist=None):
+        url = f'/api/watchlists/{(watchlist or self.watchlist).id}/{action}'
+        return getattr(self.client, method)(url, json.dumps(payload), content_type='application/json')
+
+    def add(self, tickers):
+        return self.send('bulk_add', {'items': [{'ticker': t, 'name': f'{t} Inc.'} for t in tickers]})
+
+    def tickers(self):
+        return list(self.watchlist.items.values_list('ticker', flat=True))
+
+    def assert_constant_queries(self, run, small, large):
+        counts = []
+        for batch in (small, large):
+            with CaptureQueriesContext(connection) as queries:
+                response = run(batch)
+            self.assertEqual(response.status_code, 200)
+            counts.append(len(queries))
+        self.assertEqual(counts, [self.EXPECTED_QUERIES] * 2)
+
+    def test_bulk_add_query_count_is_constant(self):
+        self.assert_constant_queries(self.add, [f'A{i}' for i in range(2)], [f'B{i}' for i in range(200)])
+        self.assertEqual(self.watchlist.items.count(), 202)
+
+    def test_bulk_remove_query_count_is_constant(self):
+        self.add([f'T{i}' for i in range(300)])
+        self.assert_constant_queries(lambda tickers: self.send('bulk_remove', {'tickers': tickers}),
+                                     ['T0', 'T1'], [f'T{i}' for i in range(2, 202)])
+        self.assertEqual(self.watchlist.items.count(), 98)
+
+    def test_reorder_query_count_is_constant(self):
+        self.add([f'T{i}' for i in range(300)])
+        self.assert_constant_queries(lambda tickers: self.send('reorder', {'tickers': tickers}, method='put'),
+                                     ['T299', 'T298'], [f'T{i}' for i in reversed(range(100, 300))])
+
+    def test_bulk_add_results(self):
+        self.add(['AAPL'])
+        response = self.send('bulk_add', {'items': [
+            {'ticker': 'MSFT', 'name': 'Microsoft'},
+            {'ticker': 'AAPL', 'name': 'Apple'},
+            {'ticker': 'MSFT', 'name': 'Microsoft again'},
+            {'ticker': 'WAY-TOO-LONG-TICKER', 'name': 'Invalid'},
+            {'ticker': 'NVDA'},
+        ]})
+        data = json.loads(response.content)['data']
+        self.assertEqual([(r['ticker'], r['status']) for r in data['results']], [
+            ('MSFT', 'added'), ('AAPL', 'exists'), ('MSFT', 'duplicate'),
+            ('WAY-TOO-LONG-TICKER', 'invalid'), ('NVDA', 'invalid'),
+        ])
+        self.assertIn('name', data['results'][4]['errors'])
+        self.assertEqual([item['ticker'] for item in data['watchlist']['items']], ['AAPL', 'MSFT'])
+
+    def test_single_add_appends(self):
+        self.add(['AAPL', 'MSFT'])
+        self.client.post(f'/api/watchlists/{self.watchlist.id}/add_ticker', {'ticker': 'NVDA', 'name': 'Nvidia'})
+        self.send('reorder', {'tickers': ['MSFT']}, method='put')
+        self.client.post(f'/api/watchlists/{self.watchlist.id}/add_ticker', {'ticker': 'AMD', 'name': 'AMD'})
+        self.assertEqual(self.tickers(), ['MSFT', 'AAPL', 'NVDA', 'AMD'])
+
+    def test_bulk_remove_results(self):
+        self.add(['AAPL', 'MSFT', 'NVDA'])
+        response = self.send('bulk_remove', {'tickers': ['MSFT', 'TSLA']})
+        data = json.loads(response.content)['data']
+        self.assertEqual(data['results'], [{'ticker': 'MSFT', 'status': 'removed'},
+                                           {'ticker': 'TSLA', 'status': 'not_found'}])
+        self.assertEqual(self.tickers(), ['AAPL', 'NVDA'])
+
+    def test_reorder(self):
+        self.add(['A', 'B', 'C', 'D'])
+        response = self.send('reorder', {'tickers': ['C', 'X', 'A']}, method='put')
+        data = json.loads(response.content)['data']
+        self.assertEqual([r['status'] for r in data['results']], ['moved', 'not_found', 'moved'])
+        self.assertEqual([item['ticker'] for item in data['watchlist']['items']], ['C', 'A', 'B', 'D'])
+        self.assertEqual(self.tickers(), ['C', 'A', 'B', 'D'])
+        self.assertEqual(self.get_serialized_tickers(), ['C', 'A', 'B', 'D'])
+
+    def get_serialized_tickers(self):
+        return [item['ticker'] for item in WatchlistSerializer(self.watchlist).data['items']]
+
+    def test_other_users_watchlist(self):
+        other = User.objects.create_user(username='other', password='secret')
+        watchlist = Watchlist.objects.create(user=other, name='Not mine')
+        response = self.send('bulk_add', {'items': [{'ticker': 'AAPL', 'name': 'Apple'}]}, watchlist=watchlist)
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(watchlist.items.exists())
+
+    def test_malformed_batches(self):
+        for action, payload in (('bulk_add', {'items': []}), ('bulk_add', {'items': ['AAPL']}),
+                                ('bulk_remove', {'tickers': 'AAPL'}), ('bulk_remove', {'tickers': [1]})):
+            self.assertEqual(self.send(action, payload).status_code, 400, payload)
+        with self.settings(STOCK_WATCHLIST_BULK_MAX=3):
+            self.assertEqual(self.add(['A', 'B', 'C', 'D']).status_code, 400)
+
+
+# Straightforward loop implementations of the TA-Lib conventions the vectorized engine follows
+def reference_sma(x, period):
+    return [sum(x[i - period + 1:i + 1]) / period if i >= period - 1 else None for i in range(len(x))]
+
+
+def reference_ema(x, period):
+    out = [None] * len(x)
+    if period > len(x):
+        return out
+    alpha = 2 / (period + 1)
+    out[period - 1] = value = sum(x[:period]) / period
+    for i in range(period, len(x)):
+        value = value + alpha * (x[i] - value)
+        out[i] = value
+    return out
+
+
+def reference_rsi(x, period):
+    out = [None] * len(x)
+    changes = [x[i] - x[i - 1] for i in range(1, len(x))]
+    gain = sum(max(c, 0) for c in changes[:period]) / period
+    loss = sum(max(-c, 0) for c in changes[:period]) / period
+    for i in range(period, len(x)):
+        if i > period:
+            change = changes[i - 1]
+            gain = (gain * (period - 1) + max(change, 0)) / period
+            loss = (loss * (period - 1) + max(-change, 0)) / period
+        out[i] = 100 - 100 / (1 + gain / loss) if loss else (100.0 if gain else 50.0)
+    return out
+
+
+def reference_macd(x, fast, slow, signal):
+    fast_ema, slow_ema = reference_ema(x, fast), reference_ema(x, slow)
+    line = [f - s if f is not None and s is not None else None for f, s in zip(fast_ema, slow_ema)]
+    start = max(fast, slow) - 1
+    signal_line = [None] * start + reference_ema(line[start:], signal)
+    histogram = [m - s if m is not None and s is not None else None for m, s in zip(line, signal_line)]
+    return {'macd': line, 'signal': signal_line, 'histogram': histogram}
+
+
+def reference_bbands(x, period, width):
+    middle = reference_sma(x, period)
+    upper, lower = [], []
+    for i, mean in enumerate(middle):
+        if mean is None:
+            upper.append(None)
+            lower.append(None)
+            continue
+        window = x[i - period + 1:i + 1]
+        deviation = width * math.sqrt(sum((v - mean) ** 2 for v in window) / period)
+        upper.append(mean + deviation)
+        lower.append(mean - deviation)
+    return {'upper': upper, 'middle': middle, 'lower': lower}
+
+
+class IndicatorTests(SimpleTestCase):
+    def setUp(self):
+        rng = random.Random(5)
+        price = 100.0
+        self.close = []
+        for _ in range(3000):
+            price *= 1 + rng.gauss(0, 0.01)
+            self.close.append(price)
+        self.array = np.array(self.close)
+
+    def assert_series(self, actual, expected):
+        actual = np.asarray(actual, dtype=float)
+        expected = np.array([np.nan if v is None else v for v in expected])
+        np.testing.assert_array_equal(np.isnan(actual), np.isnan(expected))
+        np.testing.assert_allclose(actual, expected, rtol=1e-9, atol=1e-9, equal_nan=True)
+
+    def test_sma(self):
+        for period in (1, 5, 20, 200):
+            self.assert_series(indicators.sma(self.array, period), reference_sma(self.close, period))
+
+    def test_ema(self):
+        for period in (1, 2, 12, 26, 200):
+            self.assert_series(indicators.ema(self.array, period), reference_ema(self.close, period))
+
+    def test_ema_long_series(self):
+        close = np.cumsum(np.random.default_rng(1).normal(0, 1, 200_000)) + 10_000
+        for period in (2, 500):
+            self.assert_series(indicators.ema(close, period), reference_ema(close.tolist(), period))
+
+    def test_rsi(self):
+        for period in (2, 14, 50):
+            self.assert_series(indicators.rsi(self.array, period), reference_rsi(self.close, period))
+
+    def test_rsi_without_losses(self):
+        rising = np.arange(1.0, 40.0)
+        self.assertEqual(indicators.rsi(rising, 14)[-1], 100.0)
+        self.assertEqual(indicators.rsi(np.full(40, 5.0), 14)[-1], 50.0)
+
+    def test_macd(self):
+        actual = indicators.macd(self.array, 12, 26, 9)
+        for name, expected in reference_macd(self.close, 12, 26, 9).items():
+            self.assert_series(actual[name], expected)
+
+    def test_bbands(self):
+        actual = indicators.bbands(self.array, 20, 2.5)
+        for name, expected in reference_bbands(self.close, 20, 2.5).items():
+            self.assert_series(actual[name], expected)
+
+    def test_period_longer_than_series(self):
+        short = self.array[:10]
+        for values in (indicators.sma(short, 20), indicators.ema(short, 20), indicators.rsi(short, 14)):
+            self.assertTrue(np.isnan(values).all())
+
+    def test_indicator_series(self):
+        results = [{'t': i * 60_000, 'c': c} for i, c in enumerate(self.close)]
+        data = indicators.indicator_series(results, 'sma:20, macd, bbands:10:1.5')
+        self.assertEqual(data['t'][:2], [0, 60_000])
+        self.assertEqual(list(data['indicators']), ['sma:20', 'macd', 'bbands:10:1.5'])
+        self.assertEqual(list(data['indicators']['macd']), ['macd', 'signal', 'histogram'])
+        self.assertIsNone(data['indicators']['sma:20'][18])
+        self.assert_series(data['indicators']['sma:20'], reference_sma(self.close, 20))
+        self.assert_series(data['indicators']['bbands:10:1.5']['lower'], reference_bbands(self.close, 10, 1.5)['lower'])
+
+    def test_invalid_specs(self):
+        for raw in ('', 'wma:10', 'sma:0', 'sma:2.5', 'sma:x', 'sma:1:2', 'bbands:20:-1'):
+            with self.assertRaises(ValueError, msg=raw):
+                indicators.parse_specs(raw)
+
+
+class MinMaxDownsampleTests(SimpleTestCase):
+    def bar(self, t, v, **optional):
+        return {'t': t, 'o': 10, 'h': 11, 'l': 9, 'c': 10, 'v': v, **optional}
+
+    def test_missing_vwap_and_transactions_are_not_invented(self):
+        bars = [
+            self.bar(0, 100, vw=10.0, n=5), self.bar(1, 300),  # second bar has neither
+            self.bar(2, 100), self.bar(3, 100),  # no vwap or counts at all
+            self.bar(4, 100, vw=12.0, n=2), self.bar(5, 100, vw=14.0, n=3),
+        ]
+        first, second, third = minmax(bars, 3)
+        self.assertEqual((first['v'], first['vw'], first['n']), (400, 10.0, 5))
+        self.assertNotIn('vw', second)
+        self.assertNotIn('n', second)
+        self.assertEqual((third['vw'], third['n']), (13.0, 5))
+
+    def test_descending_bars(self):
+        bars = [self.bar(3, 100), self.bar(2, 100), self.bar(1, 100, vw=10.0, n=1), self.bar(0, 100, vw=10.0, n=1)]
+        newer, older = minmax(bars, 2)
+        self.assertEqual((newer['t'], older['t']), (2, 0))
+        self.assertNotIn('n', newer)
+        self.assertEqual(older['n'], 2)
+
+
+class AdjustedBarExpiryTests(TestCase):
+    start = 1_704_085_200_000  # 2024-01-01 00:00 New York time
+
+    def setUp(self):
+        patcher = mock.patch('core.bar_store.PolygonClient')
+        self.upstream = patcher.start().return_value
+        self.upstream.iter_aggregate_pages.side_effect = lambda **params: iter([{'results': [
+            {'t': self.start + i * 86_400_000, 'o': 50, 'h': 51, 'l': 49, 'c': 50, 'v': 10} for i in range(3)
+        ]}])
+        self.addCleanup(patcher.stop)
+
+    def seed(self, adjusted, age):
+        series = {'ticker': 'AAPL', 'multiplier': 1, 'timespan': 'day', 'adjusted': adjusted}
+        AggregateBar.objects.bulk_create(
+            AggregateBar(**series, timestamp=self.start + i * 86_400_000, open=100, high=101, low=99, close=100,
+                         volume=10)
+            for i in range(3)
+        )
+        AggregateCoverage.objects.create(**series, start=self.start, end=self.start + 3 * 86_400_000 - 1,
+                                         fetched_at=datetime.now(timezone.utc) - age)
+
+    def closes(self, adjusted):
+        bars = get_aggregate_bars('AAPL', 1, 'day', '2024-01-01', '2024-01-03', adjusted=adjusted)
+        return [bar['c'] for bar in bars['results']]
+
+    def test_expired_adjusted_bars_are_fetched_again(self):
+        self.seed(True, timedelta(days=2))
+        self.assertEqual(self.closes(True), [50, 50, 50])
+        self.assertEqual(AggregateCoverage.objects.filter(adjusted=True).count(), 1)
+        self.upstream.iter_aggregate_pages.reset_mock()
+        self.assertEqual(self.closes(True), [50, 50, 50])
+        self.upstream.iter_aggregate_pages.assert_not_called()
+
+    def test_unadjusted_bars_do_not_expire(self):
+        self.seed(False, timedelta(days=400))
+        self.assertEqual(self.closes(False), [100, 100, 100])
+        self.upstream.iter_aggregate_pages.assert_not_called()
+
+
+class StockIndicatorsViewTests(TestCase):
+    def setUp(self):
+        user = User.objects.create_user(username='tester', password='secret')
+        self.client.cookies['access_token'] = str(RefreshToken.for_user(user).access_token)
+        series = {'ticker': 'AAPL', 'multiplier': 1, 'timespan': 'day', 'adjusted': True}
+        start = 1_704_085_200_000  # 2024-01-01 00:00 New York time
+        self.close = [100 + (i % 7) - (i % 3) * 0.5 for i in range(60)]
+        AggregateBar.objects.bulk_create(
+            AggregateBar(**series, timestamp=start + i * 86_400_000, open=c, high=c + 1, low=c - 1, close=c,
+                         volume=1000, vwap=c, transactions=10)
+            for i, c in enumerate(self.close)
+        )
+        # Marks the whole window as fetched, so nothing goes upstream
+        AggregateCoverage.objects.create(**series, start=start - 10 * 86_400_000, end=start + 100 * 86_400_000)
+
+    def get(self, **params):
+        query = {'stockTicker': 'aapl', 'multiplier': 1, 'timespan': 'day', 'from': '2024-01-01',
+                 'to': '2024-02-29', **params}
+        return self.client.get('/api/stock_indicators', query)
+
+    def test_returns_requested_indicators_only(self):
+        response = self.get(indicators='ema:10,rsi')
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.content)['data']
+        self.assertEqual(data['ticker'], 'AAPL')
+        self.assertEqual(len(data['t']), 60)
+        self.assertEqual(list(data['indicators']), ['ema:10', 'rsi'])
+        self.assertNotIn('results', data)
+        self.assertEqual(data['indicators']['ema:10'][:9], [None] * 9)
+        for actual, expected in zip(data['indicators']['ema:10'][9:], reference_ema(self.close, 10)[9:]):
+            self.assertAlmostEqual(actual, expected)
+
+    def test_invalid_indicator(self):
+        response = self.get(indicators='foo:3')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(json.loads(response.content)['status'], 'error')
+
+    def test_missing_indicators(self):
+        self.assertEqual(self.get().status_code, 400)
+
+    def test_async_aggregates_come_from_the_store(self):
+        response = self.client.get('/api/async/stock_aggregate_data', {
+            'stockTicker': 'aapl', 'multiplier': 1, 'timespan': 'day', 'from': '2024-01-01', 'to': '2024-02-29',
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([bar['c'] for bar in json.loads(response.content)['data']['results']], self.close)
+
+
+def news_article(day):
+    published = datetime(2025, 1, 1, tzinfo=timezone.utc) + timedelta(days=day)
+    return {'id': f'n{day:04d}', 'published_utc': published.strftime('%Y-%m-%dT%H:%M:%SZ'), 'tickers': ['AAPL']}
+
+
+class NewsQueryTests(TestCase):
+    def setUp(self):
+        # Days 100-109 are stored; days 0-99 only exist upstream
+        store_articles(news_article(day) for day in range(100, 110))
+        NewsFeed.objects.create(
+            ticker='AAPL', oldest=datetime(2025, 4, 11, tzinfo=timezone.utc),
+            newest=datetime(2025, 4, 20, tzinfo=timezone.utc), checked_at=datetime.now(timezone.utc),
+        )
+        patcher = mock.patch('core.news_store.PolygonClient')
+        self.upstream = patcher.start().return_value
+        self.upstream.iter_news.side_effect = lambda **params: iter(news_article(day) for day in range(110))
+        self.addCleanup(patcher.stop)
+
+    def ids(self, articles):
+        return [article['id'] for article in articles]
+
+    def test_ascending_from_before_stored_history_reads_upstream(self):
+        lookups = {'published_utc__gte': datetime(2025, 4, 5, tzinfo=timezone.utc)}
+        articles, cursor = list_news('AAPL', 'asc', 4, None, lookups)
+        self.assertEqual(self.ids(articles), ['n0094', 'n0095', 'n0096', 'n0097'])
+        articles, cursor = list_news('AAPL', 'asc', 4, cursor, lookups)
+        self.assertEqual(self.ids(articles), ['n0098', 'n0099', 'n0100', 'n0101'])
+        articles, cursor = list_news('AAPL', 'asc', 10, cursor, lookups)
+        self.assertEqual(self.ids(articles), [f'n{day:04d}' for day in range(102, 110)])
+        self.assertIsNone(cursor)
+
+    def test_ascending_within_stored_history_stays_local(self):
+        lookups = {'published_utc__gte': datetime(2025, 4, 15, tzinfo=timezone.utc)}
+        articles, _ = list_news('AAPL', 'asc', 3, None, lookups)
+        self.assertEqual(self.ids(articles), ['n0104', 'n0105', 'n0106'])
+        self.upstream.iter_news.assert_not_called()
+
+    def test_limit_is_capped(self):
+        with self.assertRaises(ValueError):
+            query_news('AAPL', 'asc', 1001)
+
+
+class RetryRateLimitTests(SimpleTestCase):
+    def test_every_retry_takes_a_token(self):
+        limiter = mock.Mock()
+        retry = build_retry(limiter)
+        for _ in range(2):
+            retry = retry.increment(method='GET', url='/v2/aggs', response=HTTPResponse(status=503))
+        self.assertEqual(limiter.acquire.call_count, 2)
+        self.assertIs(retry.limiter, limiter)
+
+
+class UserCacheTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='cached', password='secret', first_name='Old')
+        self.shared = caches[settings.STOCK_API_CACHE_ALIAS]
+        self.key = user_cache.USER_KEY.format(id=self.user.pk)
+        self.addCleanup(self.shared.clear)
+        self.addCleanup(user_cache._local.clear)
+
+    def test_entry_read_before_a_change_is_not_served_after_it(self):
+        self.assertEqual(user_cache.get_cached_user(self.user.pk).first_name, 'Old')
+        # A request that read the row (and generation) before the save writes back after it
+        stale = self.shared.get(self.key)
+        self.user.first_name = 'New'
+        self.user.save()
+        self.shared.set(self.key, stale)
+        user_cache._local.clear()
+        self.assertEqual(user_cache.get_cached_user(self.user.pk).first_name, 'New')
+        self.assertEqual(user_cache.get_cached_user(self.user.pk).first_name, 'New')
+
+
+@override_settings(STOCK_TOKEN_BLACKLIST_FILTER=True)
+class TokenBlacklistFilterTests(TestCase):
+    def setUp(self):
+        self.shared = caches[settings.STOCK_API_CACHE_ALIAS]
+        self.shared.clear()
+        self.addCleanup(self.shared.clear)
+        token_blacklist._filter = token_blacklist._filter_version = None
+
+    def publish_elsewhere(self, jti):
+        # What another process does once its blacklist insert committed
+        version = self.shared.incr(token_blacklist.VERSION_KEY)
+        self.shared.set(token_blacklist.ADDED_KEY.format(version=version), jti)
+
+    def test_catches_up_from_published_jtis_without_rebuilding(self):
+        token_blacklist.get_blacklist_filter()
+        self.publish_elsewhere('logged-out')
+        with self.assertNumQueries(0):
+            bloom = token_blacklist.get_blacklist_filter()
+        self.assertIn('logged-out', bloom)
+
+    def test_blacklisting_process_keeps_its_filter(self):
+        token_blacklist.get_blacklist_filter()
+        token = token_blacklist.RefreshToken.for_user(User.objects.create_user(username='leaving'))
+        with self.captureOnCommitCallbacks(execute=True):
+            token.blacklist()
+        with self.assertNumQueries(0):
+            bloom = token_blacklist.get_blacklist_filter()
+        self.assertIn(token['jti'], bloom)
+
+    def test_rebuilds_when_a_published_jti_is_gone(self):
+        token_blacklist.get_blacklist_filter()
+        self.publish_elsewhere('logged-out')
+        self.shared.delete(token_blacklist.ADDED_KEY.format(version=self.shared.get(token_blacklist.VERSION_KEY)))
+        with self.assertNumQueries(1):
+            token_blacklist.get_blacklist_filter()
+
+
+class TickerSymbolUpsertTests(TestCase):
+    rows = [
+        {'ticker': 'AAPL', 'name': 'Apple Inc.', 'market': 'stocks', 'locale': 'us', 'type': 'CS', 'active': True},
+        {'ticker': 'MSFT', 'name': 'Microsoft Corp', 'market': 'stocks', 'locale': 'us', 'type': 'CS', 'active': True},
+    ]
+
+    def test_unchanged_rows_are_not_written_or_published(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.assertEqual(upsert_ticker_symbols(self.rows), 2)
+        self.assertEqual(len(callbacks), 1)
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.assertEqual(upsert_ticker_symbols(self.rows), 0)
+        self.assertEqual(callbacks, [])
+        renamed = [{**self.rows[0], 'name': 'Apple'}, self.rows[1]]
+        self.assertEqual(upsert_ticker_symbols(renamed), 1)
+
+
+class ColumnarBinaryTests(SimpleTestCase):
+    def test_missing_strings_survive_the_round_trip(self):
+        rows = [{'ticker': 'AAPL', 'name': 'Apple'}, {'ticker': 'X', 'name': None}, {'ticker': 'Y', 'name': ''}]
+        meta, columns = from_columnar_binary(to_columnar_binary({'status': 'OK'}, rows))
+        self.assertEqual(meta, {'status': 'OK'})
+        self.assertEqual(columns['ticker'], ['AAPL', 'X', 'Y'])
+        self.assertEqual(columns['name'], ['Apple', None, ''])
+
+
+class WebSocketOriginTests(TestCase):
+    def handshake(self, origin):
+        headers = [(b'host', b'api.example.com')] + ([(b'origin', origin)] if origin else [])
+        scope = {'type': 'websocket', 'path': '/api/ws/quotes', 'query_string': b'tickers=AAPL', 'headers': headers}
+        sent = []
+
+        async def receive():
+            return {'type': 'websocket.connect'}
+
+        async def send(message):
+            sent.append(message)
+
+        async_to_sync(websocket_quotes)(scope, receive, send)
+        return sent
+
+    def test_other_sites_are_rejected_before_authentication(self):
+        self.assertEqual(self.handshake(b'https://evil.example'), [{'type': 'websocket.close', 'code': 4403}])
+
+    @override_settings(STOCK_STREAM_WEBSOCKET_ORIGINS=['https://app.example.com'])
+    def test_own_and_allowed_origins_go_on_to_authentication(self):
+        for origin in (b'https://api.example.com', b'https://app.example.com', None):
+            self.assertEqual(self.handshake(origin), [{'type': 'websocket.close', 'code': 4401}])
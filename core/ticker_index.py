@@ -0,0 +1,293 @@
+import logging
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from typing import Any, Dict, Iterable, List, Optional
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.db.models.functions import Length
+from django.utils import timezone
+
+from core.models import TickerSymbol
+
+logger = logging.getLogger(__name__)
+
+# Fields kept per symbol; also the row shape returned by search, a subset of Polygon's reference tickers
+ROW_FIELDS = ['ticker', 'name', 'market', 'locale', 'type', 'primary_exchange', 'currency_name', 'active']
+# Bumped on every write so other processes know to rebuild their index
+VERSION_KEY = "ticker_index:version"
+
+# Ranking tiers, best first
+EXACT, SYMBOL_PREFIX, NAME_PREFIX, SUBSTRING = range(4)
+
+
+def _trigrams(text: str) -> set:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class TickerIndex:
+    """
+    Immutable in-memory search index over symbol and company name. Matches are ranked exact symbol,
+    then symbol prefix (shorter symbols first), then prefix of a word in the name, then substring of
+    either. Prefix tiers are bisect range scans over sorted keys; substrings intersect trigram postings.
+    """
+
+    def __init__(self, rows: Iterable[Dict[str, Any]]):
+        self.rows = sorted(({field: row.get(field) for field in ROW_FIELDS} for row in rows),
+                           key=lambda row: row['ticker'])
+        self.tickers = [row['ticker'] for row in self.rows]
+        self._position = {ticker: i for i, ticker in enumerate(self.tickers)}
+        self._names = [(row['name'] or '').lower() for row in self.rows]
+
+        words = sorted({(word, i) for i, name in enumerate(self._names) for word in name.split()})
+        self._words = [word for word, _ in words]
+        self._word_ids = [i for _, i in words]
+
+        self._postings: Dict[str, set] = {}
+        self._texts = []
+        for i, (ticker, name) in enumerate(zip(self.tickers, self._names)):
+            text = f"{ticker.lower()} {name}"
+            self._texts.append(text)
+            for trigram in _trigrams(text):
+                self._postings.setdefault(trigram, set()).add(i)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def _symbol_prefix(self, query: str) -> List[int]:
+        lo = bisect_left(self.tickers, query)
+        hi = bisect_right(self.tickers, query + '\uffff')
+        return sorted(range(lo, hi), key=lambda i: len(self.tickers[i]))
+
+    def _name_prefix(self, query: str) -> List[int]:
+        first, _, rest = query.partition(' ')
+        lo = bisect_left(self._words, first)
+        hi = bisect_right(self._words, first + '\uffff')
+        ids = sorted(set(self._word_ids[lo:hi]))
+        if rest:
+            ids = [i for i in ids if self._names[i].startswith(query) or f' {query}' in self._names[i]]
+        return ids
+
+    def _substring(self, query: str) -> List[int]:
+        if len(query) < 3:
+            return []
+        postings = sorted((self._postings.get(trigram, set()) for trigram in _trigrams(query)), key=len)
+        ids = set.intersection(*postings) if postings else set()
+        return sorted(i for i in ids if query in self._texts[i])
+
+    def search(
+            self,
+            query: str,
+            limit: int = 50,
+            market: Optional[str] = None,
+            ticker_type: Optional[str] = None,
+            active: Optional[bool] = True
+    ) -> List[Dict[str, Any]]:
+        query = query.strip()
+        if not query:
+            return []
+        upper, lower = query.upper(), query.lower()
+        exact = self._position.get(upper)
+        tiers = (
+            lambda: [exact] if exact is not None else [],
+            lambda: self._symbol_prefix(upper),
+            lambda: self._name_prefix(lower),
+            lambda: self._substring(lower),
+        )
+
+        results, seen = [], set()
+        for tier in tiers:
+            # Lower tiers are only computed while the limit isn't filled yet
+            for i in tier():
+                if i in seen:
+                    continue
+                seen.add(i)
+                row = self.rows[i]
+                if (market and row['market'] != market) or (ticker_type and row['type'] != ticker_type) \
+                        or (active is not None and row['active'] != active):
+                    continue
+                results.append(row)
+                if len(results) >= limit:
+                    return results
+        return results
+
+
+_index: Optional[TickerIndex] = None
+_index_version = None
+_checked_at = 0.0
+_lock = threading.Lock()
+
+
+def _shared_version():
+    shared = caches[settings.STOCK_API_CACHE_ALIAS]
+    try:
+        version = shared.get(VERSION_KEY)
+        if version is None:
+            # Nothing published yet (or evicted): any fresh value will do, as long as every process agrees
+            shared.add(VERSION_KEY, time.time_ns(), timeout=None)
+            version = shared.get(VERSION_KEY)
+        return version
+    except Exception:
+        logger.warning("Shared cache unavailable for %s", VERSION_KEY, exc_info=True)
+        return None
+
+
+def get_ticker_index() -> TickerIndex:
+    """This process's index, rebuilt from the database when another process has written new symbols."""
+    global _index, _index_version, _checked_at
+    now = time.monotonic()
+    if _index is not None and now - _checked_at < settings.STOCK_TICKER_INDEX_CHECK_INTERVAL:
+        return _index
+    with _lock:
+        if _index is not None and now - _checked_at < settings.STOCK_TICKER_INDEX_CHECK_INTERVAL:
+            return _index
+        version = _shared_version()
+        # Without the shared cache the index stays as it is; this process's own writes drop it below
+        if _index is None or (version is not None and version != _index_version):
+            _index = TickerIndex(TickerSymbol.objects.values(*ROW_FIELDS).iterator(chunk_size=5000))
+            _index_version = version
+        _checked_at = now
+    return _index
+
+
+def _publish_version():
+    global _index
+    try:
+        caches[settings.STOCK_API_CACHE_ALIAS].set(VERSION_KEY, time.time_ns(), timeout=None)
+    except Exception:
+        logger.warning("Shared cache write failed for %s", VERSION_KEY, exc_info=True)
+    # Rebuild this process's index on its next use
+    _index = None
+
+
+def _symbols_changed():
+    # After commit: a process rebuilding on the new version before that would still read the old rows
+    transaction.on_commit(_publish_version)
+
+
+def _symbol(row: Dict[str, Any]) -> TickerSymbol:
+    return TickerSymbol(**{field: row.get(field) or '' for field in ROW_FIELDS if field != 'active'},
+                        active=row.get('active', True))
+
+
+def _row_key(symbol: TickerSymbol):
+    return tuple(getattr(symbol, field) for field in ROW_FIELDS)
+
+
+def upsert_ticker_symbols(rows: Iterable[Dict[str, Any]], batch_size: int = 1000) -> int:
+    """
+    Insert or refresh symbols from Polygon reference rows (``/v3/reference/tickers`` results). Rows
+    stored exactly as they are already are skipped, so nothing is published unless something changed.
+    Returns the number of symbols written.
+    """
+    symbols = {row['ticker']: _symbol(row) for row in rows if row.get('ticker')}
+    tickers = list(symbols)
+    stored = set()
+    for start in range(0, len(tickers), batch_size):
+        batch = tickers[start:start + batch_size]
+        stored.update(TickerSymbol.objects.filter(ticker__in=batch).values_list(*ROW_FIELDS))
+    changed = [symbol for symbol in symbols.values() if _row_key(symbol) not in stored]
+    if not changed:
+        return 0
+    TickerSymbol.objects.bulk_create(
+        changed,
+        batch_size=batch_size,
+        update_conflicts=True,
+        unique_fields=['ticker'],
+        update_fields=[field for field in ROW_FIELDS if field != 'ticker'] + ['updated_at'],
+    )
+    _symbols_changed()
+    return len(changed)
+
+
+def diff_ticker_symbols(rows: Iterable[Dict[str, Any]], market: str) -> Dict[str, list]:
+    """
+    What syncing to ``rows``, the complete active universe of ``market``, takes: rows to insert, rows
+    that changed, and tickers of ``market`` stored as active but no longer listed (to deactivate).
+    """
+    stored = {row[0]: row for row in TickerSymbol.objects.values_list(*ROW_FIELDS).iterator(chunk_size=5000)}
+    inserts, updates, listed = [], [], set()
+    for row in rows:
+        if not row.get('ticker') or row['ticker'] in listed:
+            continue
+        listed.add(row['ticker'])
+        current = stored.get(row['ticker'])
+        if current is None:
+            inserts.append(row)
+        elif current != _row_key(_symbol(row)):
+            updates.append(row)
+    market_field = ROW_FIELDS.index('market')
+    active_field = ROW_FIELDS.index('active')
+    deactivations = [
+        ticker for ticker, current in stored.items()
+        if current[active_field] and current[market_field] == market and ticker not in listed
+    ]
+    return {'inserts': inserts, 'updates': updates, 'deactivations': deactivations}
+
+
+def apply_ticker_symbols_diff(diff: Dict[str, list], batch_size: int = 1000):
+    """Applies a ``diff_ticker_symbols`` result in one transaction."""
+    with transaction.atomic():
+        upsert_ticker_symbols(diff['inserts'] + diff['updates'], batch_size)
+        deactivations = diff['deactivations']
+        for start in range(0, len(deactivations), batch_size):
+            # update() skips auto_now
+            TickerSymbol.objects.filter(ticker__in=deactivations[start:start + batch_size]).update(
+                active=False, updated_at=timezone.now()
+            )
+        if deactivations:
+            _symbols_changed()
+
+
+def search_ticker_symbols_db(
+        search: str,
+        limit: int = 50,
+        market: Optional[str] = None,
+        ticker_type: Optional[str] = None,
+        active: Optional[bool] = True
+) -> List[Dict[str, Any]]:
+    """Same ranking as TickerIndex straight from the database; served by the pg_trgm indexes on Postgres."""
+    search = search.strip()
+    if not search:
+        return []
+    queryset = TickerSymbol.objects.filter(Q(ticker__icontains=search) | Q(name__icontains=search))
+    if market:
+        queryset = queryset.filter(market=market)
+    if ticker_type:
+        queryset = queryset.filter(type=ticker_type)
+    if active is not None:
+        queryset = queryset.filter(active=active)
+    rank = Case(
+        When(ticker__iexact=search, then=Value(EXACT)),
+        When(ticker__istartswith=search, then=Value(SYMBOL_PREFIX)),
+        When(Q(name__istartswith=search) | Q(name__icontains=f' {search}'), then=Value(NAME_PREFIX)),
+        default=Value(SUBSTRING),
+        output_field=IntegerField(),
+    )
+    return list(queryset.order_by(rank, Length('ticker'), 'ticker').values(*ROW_FIELDS)[:limit])
+
+
+def search_ticker_symbols(
+        search: str,
+        limit: int = 50,
+        market: Optional[str] = None,
+        ticker_type: Optional[str] = None,
+        active: Optional[bool] = True
+) -> Optional[Dict[str, Any]]:
+    """
+    Polygon-shaped search response answered locally, or None when the caller should ask upstream
+    (local search disabled, nothing loaded yet, or no match).
+    """
+    backend = settings.STOCK_TICKER_SEARCH
+    if backend == 'memory':
+        results = get_ticker_index().search(search, limit, market, ticker_type, active)
+    elif backend == 'database':
+        results = search_ticker_symbols_db(search, limit, market, ticker_type, active)
+    else:
+        return None
+    if not results:
+        return None
+    return {'status': 'OK', 'count': len(results), 'results': results}
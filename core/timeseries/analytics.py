@@ -0,0 +1,147 @@
+"""
+Portfolio-style analytics over the daily closes of many tickers at once, vectorized with NumPy.
+
+Closes are aligned into a (timestamps x tickers) matrix on the union of all timestamps, NaN where a
+ticker has no bar. Returns are simple daily returns, NaN unless both closes exist. Statistics over
+pairs of tickers (correlation, beta) use every day both have a return, so one recently listed ticker
+doesn't cut the history of the others. Volatilities are sample standard deviations, annualized.
+"""
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+TRADING_DAYS = 252
+
+
+def align_closes(series: Sequence[Dict[str, np.ndarray]]) -> Dict[str, np.ndarray]:
+    """``{"t", "c"}`` column arrays per ticker -> ``{"t": (T,), "c": (T, N)}`` on the common timestamp index."""
+    t = np.unique(np.concatenate([s["t"] for s in series])) if series else np.empty(0, dtype=np.int64)
+    closes = np.full((len(t), len(series)), np.nan)
+    if series:
+        lengths = [len(s["t"]) for s in series]
+        rows = np.searchsorted(t, np.concatenate([s["t"] for s in series]))
+        columns = np.repeat(np.arange(len(series)), lengths)
+        closes[rows, columns] = np.concatenate([s["c"] for s in series])
+    return {"t": t, "c": closes}
+
+
+def daily_returns(closes: np.ndarray) -> np.ndarray:
+    """Same shape as ``closes``; the first row (and any day following a missing close) is NaN."""
+    returns = np.full(closes.shape, np.nan)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        returns[1:] = closes[1:] / closes[:-1] - 1.0
+    return returns
+
+
+def _masked(values: np.ndarray):
+    valid = ~np.isnan(values)
+    return valid.astype(np.float64), np.where(valid, values, 0.0)
+
+
+def pairwise_moments(x: np.ndarray, y: np.ndarray):
+    """
+    For columns ``x[:, i]`` and ``y[:, j]`` over the rows where both are defined: (count, covariance,
+    variance of x[:, i], variance of y[:, j]), each an (Nx, Ny) matrix built from a few matrix products.
+    """
+    mx, x0 = _masked(x)
+    my, y0 = _masked(y)
+    n = mx.T @ my
+    sum_x = x0.T @ my
+    sum_y = mx.T @ y0
+    with np.errstate(invalid="ignore", divide="ignore"):
+        cov = (x0.T @ y0 - sum_x * sum_y / n) / (n - 1)
+        var_x = ((x0 * x0).T @ my - sum_x * sum_x / n) / (n - 1)
+        var_y = (mx.T @ (y0 * y0) - sum_y * sum_y / n) / (n - 1)
+    return n, cov, var_x, var_y
+
+
+def correlation_matrix(returns: np.ndarray, min_periods: int = 3) -> np.ndarray:
+    n, cov, var_x, var_y = pairwise_moments(returns, returns)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        corr = cov / np.sqrt(var_x * var_y)
+    corr[n < min_periods] = np.nan
+    # Rounding can push |corr| a hair past 1
+    return np.clip(corr, -1.0, 1.0)
+
+
+def betas(returns: np.ndarray, benchmark: np.ndarray, min_periods: int = 3) -> np.ndarray:
+    n, cov, _, var_b = pairwise_moments(returns, benchmark[:, None])
+    with np.errstate(invalid="ignore", divide="ignore"):
+        beta = (cov / var_b)[:, 0]
+    beta[n[:, 0] < min_periods] = np.nan
+    return beta
+
+
+def rolling_volatility(returns: np.ndarray, window: int) -> np.ndarray:
+    """Annualized volatility over the trailing ``window`` returns; NaN unless all of them exist."""
+    out = np.full(returns.shape, np.nan)
+    if window < 2 or window > len(returns):
+        return out
+    valid, r0 = _masked(returns)
+    zero = np.zeros((1, returns.shape[1]))
+    count = np.concatenate((zero, np.cumsum(valid, axis=0)))
+    total = np.concatenate((zero, np.cumsum(r0, axis=0)))
+    total_sq = np.concatenate((zero, np.cumsum(r0 * r0, axis=0)))
+    window_count = count[window:] - count[:-window]
+    window_sum = total[window:] - total[:-window]
+    variance = (total_sq[window:] - total_sq[:-window] - window_sum * window_sum / window) / (window - 1)
+    volatility = np.sqrt(np.maximum(variance, 0.0) * TRADING_DAYS)
+    out[window - 1:] = np.where(window_count == window, volatility, np.nan)
+    return out
+
+
+def drawdowns(closes: np.ndarray) -> np.ndarray:
+    """Fraction below the running peak close (<= 0); NaN before a ticker's first close and on missing days."""
+    peaks = np.fmax.accumulate(closes, axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return closes / peaks - 1.0
+
+
+def _column_extremes(values: np.ndarray):
+    """Index of the first and last defined value per column, and which columns have any."""
+    valid = ~np.isnan(values)
+    has_any = valid.any(axis=0)
+    first = valid.argmax(axis=0)
+    last = len(values) - 1 - valid[::-1].argmax(axis=0)
+    return first, last, has_any
+
+
+def summary(closes: np.ndarray, returns: np.ndarray, drawdown: np.ndarray) -> Dict[str, np.ndarray]:
+    """Per-ticker total return, mean daily return, annualized volatility and maximum drawdown."""
+    columns = np.arange(closes.shape[1])
+    first, last, has_any = _column_extremes(closes)
+    valid, r0 = _masked(returns)
+    n = valid.sum(axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        total = np.where(has_any, closes[last, columns] / closes[first, columns] - 1.0, np.nan)
+        mean = r0.sum(axis=0) / n
+        variance = ((r0 * r0).sum(axis=0) - n * mean * mean) / (n - 1)
+    volatility = np.where(n > 1, np.sqrt(np.maximum(variance, 0.0) * TRADING_DAYS), np.nan)
+    max_drawdown = np.fmin.reduce(drawdown, axis=0, initial=np.nan)
+    return {"total_return": total, "mean_return": mean, "volatility": volatility, "max_drawdown": max_drawdown}
+
+
+def compute_analytics(
+        closes: np.ndarray,
+        benchmark: Optional[np.ndarray] = None,
+        window: int = 20
+) -> Dict[str, np.ndarray]:
+    """Every statistic for a (T, N) close matrix; ``benchmark`` is the (T,) closes to compute betas against."""
+    returns = daily_returns(closes)
+    drawdown = drawdowns(closes)
+    stats = summary(closes, returns, drawdown)
+    if benchmark is not None:
+        stats["beta"] = betas(returns, daily_returns(benchmark[:, None])[:, 0])
+    return {
+        "returns": returns,
+        "rolling_volatility": rolling_volatility(returns, window),
+        "drawdown": drawdown,
+        "correlation": correlation_matrix(returns),
+        **stats,
+    }
+
+
+def to_json(values: np.ndarray, decimals: int = 6) -> List:
+    """Rounded nested lists with NaN as None (NaN isn't valid JSON)."""
+    values = np.round(values, decimals)
+    return np.where(np.isnan(values), None, values).tolist()
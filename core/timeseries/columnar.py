@@ -0,0 +1,133 @@
+"""
+Column-oriented encodings of row lists such as aggregate ``results`` or snapshot ``tickers``.
+
+JSON flavour: the row list is replaced by ``{"format": "columnar", "count": n, "columns": {...},
+"encoding": {...}}`` where every column is a plain array and ``t`` is delta-encoded (first value
+absolute, then differences). Nested objects (``day``, ``lastTrade`` ...) are flattened to
+``day.o``-style column names.
+
+Binary flavour, all integers little-endian::
+
+    b"SWC1" | u32 meta_len | meta (UTF-8 JSON envelope without the rows) | u32 rows | u16 columns
+    then per column: u8 name_len | name | u8 kind | u32 payload_len | payload
+
+``kind`` is ``d`` (float64, NaN for missing), ``q`` (int64), ``D`` (int64, delta-encoded),
+``s`` (UTF-8 strings joined by "\\n", no nulls) or ``j`` (JSON values joined by "\\n").
+"""
+import json
+import struct
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+MAGIC = b"SWC1"
+DELTA_COLUMNS = ("t",)
+
+
+def flatten_rows(rows: List[Dict[str, Any]]) -> Tuple[List[str], Dict[str, list]]:
+    """Union of (one level flattened) keys in first-seen order, plus one list per column."""
+    names = {}
+    for row in rows:
+        for key, value in row.items():
+            if isinstance(value, dict):
+                for sub_key in value:
+                    names.setdefault(f"{key}.{sub_key}", (key, sub_key))
+            else:
+                names.setdefault(key, (key, None))
+
+    columns = {}
+    for name, (key, sub_key) in names.items():
+        if sub_key is None:
+            columns[name] = [row.get(key) for row in rows]
+        else:
+            columns[name] = [(row.get(key) or {}).get(sub_key) for row in rows]
+    return list(names), columns
+
+
+def _kind(name: str, values: list) -> str:
+    present = [v for v in values if v is not None]
+    if all(isinstance(v, int) and not isinstance(v, bool) for v in present) and len(present) == len(values):
+        return "D" if name in DELTA_COLUMNS else "q"
+    if all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in present):
+        return "d"
+    # "s" has no way to mark a missing string, so columns with nulls fall back to "j"
+    if all(isinstance(v, str) and "\n" not in v for v in present) and len(present) == len(values):
+        return "s"
+    return "j"
+
+
+def _delta(values: list) -> list:
+    array = np.asarray(values, dtype=np.int64)
+    if array.size:
+        array[1:] = np.diff(array)
+    return array.tolist()
+
+
+def to_columnar(rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+    names, columns = flatten_rows(rows)
+    encoding = {}
+    for name in names:
+        if _kind(name, columns[name]) == "D":
+            columns[name] = _delta(columns[name])
+            encoding[name] = "delta"
+    return {"format": "columnar", "count": len(rows), "columns": columns, "encoding": encoding}
+
+
+def _pack_column(name: str, values: list) -> bytes:
+    kind = _kind(name, values)
+    if kind == "D":
+        payload = np.asarray(_delta(values), dtype="<i8").tobytes()
+    elif kind == "q":
+        payload = np.asarray(values, dtype="<i8").tobytes()
+    elif kind == "d":
+        payload = np.asarray([np.nan if v is None else v for v in values], dtype="<f8").tobytes()
+    elif kind == "s":
+        payload = "\n".join(values).encode()
+    else:
+        payload = "\n".join(json.dumps(v) for v in values).encode()
+    encoded_name = name.encode()
+    return struct.pack("<B", len(encoded_name)) + encoded_name + struct.pack("<cI", kind.encode(), len(payload)) + payload
+
+
+def to_columnar_binary(meta: Dict[str, Any], rows: List[Dict[str, Any]]) -> bytes:
+    names, columns = flatten_rows(rows)
+    encoded_meta = json.dumps(meta, separators=(",", ":")).encode()
+    parts = [MAGIC, struct.pack("<I", len(encoded_meta)), encoded_meta, struct.pack("<IH", len(rows), len(names))]
+    parts.extend(_pack_column(name, columns[name]) for name in names)
+    return b"".join(parts)
+
+
+def from_columnar_binary(payload: bytes) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Reference decoder, mainly documenting the layout for client implementations."""
+    if payload[:4] != MAGIC:
+        raise ValueError("Not a columnar payload.")
+    offset = 4
+    (meta_len,) = struct.unpack_from("<I", payload, offset)
+    offset += 4
+    meta = json.loads(payload[offset:offset + meta_len])
+    offset += meta_len
+    rows, count = struct.unpack_from("<IH", payload, offset)
+    offset += 6
+
+    columns = {}
+    for _ in range(count):
+        (name_len,) = struct.unpack_from("<B", payload, offset)
+        offset += 1
+        name = payload[offset:offset + name_len].decode()
+        offset += name_len
+        kind, size = struct.unpack_from("<cI", payload, offset)
+        offset += 5
+        chunk = payload[offset:offset + size]
+        offset += size
+        kind = kind.decode()
+        if kind == "D":
+            columns[name] = np.cumsum(np.frombuffer(chunk, dtype="<i8"))
+        elif kind == "q":
+            columns[name] = np.frombuffer(chunk, dtype="<i8")
+        elif kind == "d":
+            columns[name] = np.frombuffer(chunk, dtype="<f8")
+        elif kind == "s":
+            columns[name] = chunk.decode().split("\n") if rows else []
+        else:
+            columns[name] = [json.loads(v) for v in chunk.decode().split("\n")] if rows else []
+    return meta, columns
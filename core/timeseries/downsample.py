@@ -0,0 +1,130 @@
+from operator import itemgetter
+from typing import Any, Dict, List
+
+import numpy as np
+
+DOWNSAMPLE_METHODS = ("lttb", "minmax")
+# Polygon omits these on some bars
+OPTIONAL_FIELDS = ("vw", "n")
+
+
+def bars_to_arrays(results: List[Dict[str, Any]], fields=("t", "o", "h", "l", "c", "v")) -> Dict[str, np.ndarray]:
+    """Column arrays from Polygon's row-oriented ``results``; missing values become NaN."""
+    count = len(results)
+    arrays = {}
+    for field in fields:
+        dtype = np.int64 if field == "t" else np.float64
+        if field in OPTIONAL_FIELDS:
+            values = (row.get(field, np.nan) for row in results)
+        else:
+            values = map(itemgetter(field), results)
+        arrays[field] = np.fromiter(values, dtype=dtype, count=count)
+    return arrays
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets: indices of the ``n_out`` points that best preserve the shape of y(x).
+    The first and last points are always kept. Bucket averages are computed for all buckets at once
+    from cumulative sums; the only Python-level loop is one vectorized argmax per output point.
+    """
+    n = len(x)
+    if n_out >= n:
+        return np.arange(n)
+    if n_out < 3:
+        raise ValueError("LTTB needs at least 3 output points.")
+
+    x = x.astype(np.float64) - x[0]
+    y = y.astype(np.float64)
+    # n_out - 2 buckets over the points between the fixed first and last one
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    counts = edges[1:] - edges[:-1]
+    cum_x = np.concatenate(([0.0], np.cumsum(x)))
+    cum_y = np.concatenate(([0.0], np.cumsum(y)))
+    avg_x = (cum_x[edges[1:]] - cum_x[edges[:-1]]) / counts
+    avg_y = (cum_y[edges[1:]] - cum_y[edges[:-1]]) / counts
+    # Third triangle vertex for bucket i is the average of bucket i + 1 (the last point for the last bucket)
+    next_x = np.append(avg_x[1:], x[-1])
+    next_y = np.append(avg_y[1:], y[-1])
+
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        ax, ay = x[a], y[a]
+        area = np.abs((ax - next_x[i]) * (y[lo:hi] - ay) - (ax - x[lo:hi]) * (next_y[i] - ay))
+        a = lo + int(area.argmax())
+        selected[i + 1] = a
+    return selected
+
+
+def lttb(results: List[Dict[str, Any]], max_points: int) -> List[Dict[str, Any]]:
+    """Keep the ``max_points`` original bars selected by LTTB on the close price."""
+    if len(results) <= max_points:
+        return results
+    arrays = bars_to_arrays(results, fields=("t", "c"))
+    return [results[i] for i in lttb_indices(arrays["t"], arrays["c"], max_points).tolist()]
+
+
+def minmax(results: List[Dict[str, Any]], max_points: int) -> List[Dict[str, Any]]:
+    """
+    Merge consecutive bars into ``max_points`` equal-count buckets, OHLC style: first open, max high,
+    min low, last close, summed volume/transactions and volume-weighted vwap. Unlike LTTB the
+    extremes of every bucket survive, so no spike disappears from a candlestick chart.
+    """
+    n = len(results)
+    if n <= max_points:
+        return results
+    if max_points < 1:
+        raise ValueError("max_points must be positive.")
+
+    arrays = bars_to_arrays(results, fields=("t", "o", "h", "l", "c", "v", "vw", "n"))
+    descending = n > 1 and arrays["t"][0] > arrays["t"][-1]
+    if descending:
+        arrays = {field: values[::-1] for field, values in arrays.items()}
+
+    edges = np.unique(np.linspace(0, n, max_points + 1).astype(np.int64))
+    starts, ends = edges[:-1], edges[1:]
+    volume = np.add.reduceat(arrays["v"], starts)
+    # vwap over the bars that have one, weighted by their volume only; n summed over the bars that have it
+    has_vw = ~np.isnan(arrays["vw"])
+    with np.errstate(invalid="ignore", divide="ignore"):
+        vwap = (
+            np.add.reduceat(np.where(has_vw, arrays["vw"] * arrays["v"], 0.0), starts)
+            / np.add.reduceat(np.where(has_vw, arrays["v"], 0.0), starts)
+        )
+    has_n = ~np.isnan(arrays["n"])
+    columns = {
+        "v": volume,
+        "vw": np.round(vwap, 4),
+        "o": arrays["o"][starts],
+        "c": arrays["c"][ends - 1],
+        "h": np.maximum.reduceat(arrays["h"], starts),
+        "l": np.minimum.reduceat(arrays["l"], starts),
+        "t": arrays["t"][starts],
+        "n": np.add.reduceat(np.where(has_n, arrays["n"], 0.0), starts).astype(np.int64),
+    }
+    n_known = np.logical_or.reduceat(has_n, starts)
+    if descending:
+        columns = {field: values[::-1] for field, values in columns.items()}
+        n_known = n_known[::-1]
+
+    names = list(columns)
+    rows = zip(*(columns[name].tolist() for name in names))
+    bars = [dict(zip(names, row)) for row in rows]
+    # Mirror Polygon and omit what a bucket has no data for: vwap without volume-weighted bars, n without counts
+    for bar, known in zip(bars, n_known.tolist()):
+        if bar["vw"] != bar["vw"]:
+            del bar["vw"]
+        if not known:
+            del bar["n"]
+    return bars
+
+
+def downsample(results: List[Dict[str, Any]], max_points: int, method: str = "lttb") -> List[Dict[str, Any]]:
+    if method == "lttb":
+        return lttb(results, max_points)
+    if method == "minmax":
+        return minmax(results, max_points)
+    raise ValueError(f"Invalid parameter \"downsample\". Valid options: {', '.join(DOWNSAMPLE_METHODS)}")
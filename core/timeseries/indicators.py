@@ -0,0 +1,211 @@
+"""
+Technical indicators over aggregate bars, vectorized with NumPy.
+
+Indicators are requested as specs ``name:param:param`` (e.g. ``sma:20``, ``macd:12:26:9``); the spec
+string is also the key of the series in the output. Series have one value per bar, NaN where the
+indicator isn't defined yet (the warm-up at the start of the window). Conventions follow TA-Lib:
+EMAs are seeded with the SMA of their first ``period`` values, RSI uses Wilder's smoothing and
+Bollinger bands use the population standard deviation.
+"""
+import math
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+from core.timeseries.downsample import bars_to_arrays
+
+# name -> default params, in the order they are given in a spec
+INDICATORS = {
+    "sma": (20,),
+    "ema": (20,),
+    "rsi": (14,),
+    "macd": (12, 26, 9),
+    "bbands": (20, 2),
+}
+# Largest factor the closed-form EMA lets accumulate inside one block (keeps float64 error ~1e-12)
+_EMA_BLOCK_GROWTH = math.log(1e8)
+
+
+def parse_specs(raw: str) -> List[Tuple[str, str, Tuple[float, ...]]]:
+    """``"sma:20,macd"`` -> ``[("sma:20", "sma", (20,)), ("macd", "macd", (12, 26, 9))]``."""
+    specs = []
+    for spec in filter(None, (part.strip() for part in raw.split(","))):
+        name, *params = spec.lower().split(":")
+        if name not in INDICATORS:
+            raise ValueError(f"Invalid indicator \"{name}\". Valid options: {', '.join(INDICATORS)}")
+        defaults = INDICATORS[name]
+        if len(params) > len(defaults):
+            raise ValueError(f"Indicator \"{name}\" takes at most {len(defaults)} parameters.")
+        try:
+            values = tuple(float(p) if isinstance(d, float) or "." in p else int(p) for p, d in zip(params, defaults))
+        except ValueError:
+            raise ValueError(f"Invalid parameters for indicator \"{spec}\".")
+        values += defaults[len(values):]
+        # Periods are whole and positive; only the Bollinger width may be fractional
+        periods = values[:1] if name == "bbands" else values
+        if any(not isinstance(p, int) or p < 1 for p in periods) or any(v <= 0 for v in values):
+            raise ValueError(f"Invalid parameters for indicator \"{spec}\".")
+        specs.append((spec, name, values))
+    if not specs:
+        raise ValueError("At least one indicator is required.")
+    return specs
+
+
+def _nan(n: int) -> np.ndarray:
+    return np.full(n, np.nan)
+
+
+def sma(x: np.ndarray, period: int) -> np.ndarray:
+    out = _nan(len(x))
+    if period > len(x):
+        return out
+    # Centering first keeps the running sum small, so long series don't lose precision
+    cum = np.concatenate(([0.0], np.cumsum(x - x[0])))
+    out[period - 1:] = (cum[period:] - cum[:-period]) / period + x[0]
+    return out
+
+
+def rolling_std(x: np.ndarray, period: int) -> np.ndarray:
+    out = _nan(len(x))
+    if period > len(x):
+        return out
+    centered = x - x.mean()
+    cum = np.concatenate(([0.0], np.cumsum(centered)))
+    cum_sq = np.concatenate(([0.0], np.cumsum(centered * centered)))
+    mean = (cum[period:] - cum[:-period]) / period
+    variance = (cum_sq[period:] - cum_sq[:-period]) / period - mean * mean
+    out[period - 1:] = np.sqrt(np.maximum(variance, 0.0))
+    return out
+
+
+def smooth(x: np.ndarray, alpha: float, seed: float) -> np.ndarray:
+    """
+    ``y[i] = y[i-1] + alpha * (x[i] - y[i-1])`` with ``y[-1] = seed``, without a per-element loop.
+    Unrolled, ``y[i] = d^(i+1) * (seed + alpha * sum(x[k] / d^(k+1)))`` with ``d = 1 - alpha``; that is
+    a cumulative sum, evaluated per block short enough for ``1 / d^k`` to stay representable. Each
+    block is first solved from a zero start; a block's true start value then contributes ``d^(k+1)``
+    of itself, and as one block decays it by ``d^block <= 1e-8`` only the last few blocks matter.
+    """
+    n = len(x)
+    decay = 1.0 - alpha
+    if n == 0 or decay <= 0:
+        return np.array(x, dtype=np.float64)
+    block = min(n, max(1, int(_EMA_BLOCK_GROWTH / -math.log(decay))))
+    blocks = -(-n // block)
+    chunks = np.zeros(blocks * block)
+    chunks[:n] = x
+    chunks = chunks.reshape(blocks, block)
+    powers = decay ** np.arange(1, block + 1)
+    local = powers * (alpha * np.cumsum(chunks / powers, axis=1))
+
+    # starts[j] = true value right before block j: starts[j] = local end of j - 1 + d^block * starts[j - 1]
+    carry = powers[-1]
+    ends = np.concatenate(([seed], local[:-1, -1]))
+    starts = ends.copy()
+    term, factor = ends, 1.0
+    while blocks > 1 and factor * carry > 1e-17:
+        factor *= carry
+        term = np.concatenate(([0.0], term[:-1]))
+        starts += factor * term
+        if not term.any():
+            break
+    return (local + powers * starts[:, None]).ravel()[:n]
+
+
+def ema(x: np.ndarray, period: int) -> np.ndarray:
+    out = _nan(len(x))
+    if period > len(x):
+        return out
+    seed = x[:period].mean()
+    out[period - 1] = seed
+    out[period:] = smooth(x[period:], 2.0 / (period + 1), seed)
+    return out
+
+
+def rsi(x: np.ndarray, period: int) -> np.ndarray:
+    out = _nan(len(x))
+    if period >= len(x):
+        return out
+    change = np.diff(x)
+    gain = np.maximum(change, 0.0)
+    loss = np.maximum(-change, 0.0)
+    avg_gain = np.empty(len(change) - period + 1)
+    avg_loss = np.empty_like(avg_gain)
+    avg_gain[0], avg_loss[0] = gain[:period].mean(), loss[:period].mean()
+    avg_gain[1:] = smooth(gain[period:], 1.0 / period, avg_gain[0])
+    avg_loss[1:] = smooth(loss[period:], 1.0 / period, avg_loss[0])
+    total = avg_gain + avg_loss
+    with np.errstate(invalid="ignore", divide="ignore"):
+        # Equivalent to 100 - 100 / (1 + RS); a flat stretch (no movement at all) reads as neutral 50
+        out[period:] = np.where(total > 0, 100.0 * avg_gain / total, 50.0)
+    return out
+
+
+def macd(x: np.ndarray, fast: int, slow: int, signal: int, ema_of=None) -> Dict[str, np.ndarray]:
+    ema_of = ema_of or (lambda period: ema(x, period))
+    line = ema_of(fast) - ema_of(slow)
+    signal_line = _nan(len(x))
+    start = max(fast, slow) - 1
+    if start < len(x):
+        signal_line[start:] = ema(line[start:], signal)
+    return {"macd": line, "signal": signal_line, "histogram": line - signal_line}
+
+
+def bbands(x: np.ndarray, period: int, width: float, sma_of=None) -> Dict[str, np.ndarray]:
+    middle = sma_of(period) if sma_of else sma(x, period)
+    deviation = width * rolling_std(x, period)
+    return {"upper": middle + deviation, "middle": middle, "lower": middle - deviation}
+
+
+def compute_indicators(close: np.ndarray, specs: List[Tuple[str, str, Tuple[float, ...]]]) -> Dict[str, Any]:
+    """Every requested indicator in one pass; SMAs and EMAs shared between indicators are computed once."""
+    memo = {}
+
+    def once(kind, period, fn):
+        if (kind, period) not in memo:
+            memo[(kind, period)] = fn(close, period)
+        return memo[(kind, period)]
+
+    def sma_of(period):
+        return once("sma", period, sma)
+
+    def ema_of(period):
+        return once("ema", period, ema)
+
+    results = {}
+    for key, name, params in specs:
+        if name == "sma":
+            results[key] = sma_of(*params)
+        elif name == "ema":
+            results[key] = ema_of(*params)
+        elif name == "rsi":
+            results[key] = once("rsi", params[0], rsi)
+        elif name == "macd":
+            results[key] = macd(close, *params, ema_of=ema_of)
+        elif name == "bbands":
+            results[key] = bbands(close, *params, sma_of=sma_of)
+    return results
+
+
+def _to_json(values: np.ndarray) -> List[Any]:
+    # NaN isn't valid JSON. Undefined values normally only form the warm-up prefix, which is cheap to splice in
+    missing = np.isnan(values)
+    defined = int(missing.argmin()) if not missing.all() else len(values)
+    if missing[defined:].any():
+        return np.where(missing, None, values).tolist()
+    return [None] * defined + values[defined:].tolist()
+
+
+def indicator_series(results: List[Dict[str, Any]], raw_specs: str) -> Dict[str, Any]:
+    """
+    ``{"t": [...], "indicators": {spec: series or {name: series}}}`` for Polygon aggregate ``results``
+    in ascending time order.
+    """
+    specs = parse_specs(raw_specs)
+    arrays = bars_to_arrays(results, fields=("t", "c"))
+    computed = compute_indicators(arrays["c"], specs)
+    indicators = {
+        key: {name: _to_json(series) for name, series in value.items()} if isinstance(value, dict) else _to_json(value)
+        for key, value in computed.items()
+    }
+    return {"t": arrays["t"].tolist(), "indicators": indicators}
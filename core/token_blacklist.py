@@ -0,0 +1,204 @@
+import hashlib
+import logging
+import math
+import threading
+import time
+from typing import Iterable, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt import tokens
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.utils import aware_utcnow
+
+logger = logging.getLogger(__name__)
+
+# Bumped by one whenever a token is blacklisted; the JTI added under version N is kept at ADDED_KEY
+# for DELTA_TTL, so processes catch up by adding the missing ones instead of rebuilding their filter
+VERSION_KEY = "token_blacklist:version"
+ADDED_KEY = "token_blacklist:added:{version}"
+DELTA_TTL = 24 * 60 * 60
+# Versions behind beyond which a process rebuilds from the database rather than fetch every delta
+MAX_CATCH_UP = 1000
+
+
+class BloomFilter:
+    """
+    Set membership without false negatives: ``in`` may wrongly say yes (at roughly ``error_rate``
+    once ``capacity`` items are added) but never wrongly says no. Positions come from double
+    hashing one blake2b digest.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        capacity = max(1, capacity)
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.capacity = capacity
+        self.count = 0
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1, h2 = int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, item: str):
+        self.count += 1
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+def build_filter(jtis: Iterable[str]) -> BloomFilter:
+    jtis = list(jtis)
+    # Headroom so tokens blacklisted before the next rebuild don't push up the error rate
+    bloom = BloomFilter(max(len(jtis) * 2, settings.STOCK_TOKEN_BLACKLIST_MIN_CAPACITY))
+    for jti in jtis:
+        bloom.add(jti)
+    return bloom
+
+
+_filter: Optional[BloomFilter] = None
+_filter_version = None
+_lock = threading.Lock()
+
+
+def _blacklisted_jtis():
+    return (
+        BlacklistedToken.objects.filter(token__expires_at__gt=aware_utcnow())
+        .values_list('token__jti', flat=True)
+        .iterator(chunk_size=5000)
+    )
+
+
+def _catch_up(shared, version) -> bool:
+    """Adds the JTIs published since this process's filter version; False when they're not all there."""
+    behind = version - _filter_version if isinstance(_filter_version, int) and isinstance(version, int) else -1
+    if not 0 < behind <= MAX_CATCH_UP:
+        return False
+    keys = [ADDED_KEY.format(version=v) for v in range(_filter_version + 1, version + 1)]
+    added = shared.get_many(keys)
+    if len(added) < len(keys) or _filter.count + len(keys) > _filter.capacity:
+        return False  # evicted, not written yet, or the filter would fill up past its error rate
+    for key in keys:
+        _filter.add(added[key])
+    return True
+
+
+def get_blacklist_filter() -> Optional[BloomFilter]:
+    """
+    This process's filter of blacklisted JTIs, kept current from the JTIs published with each version;
+    rebuilt from the database when those aren't available. None when disabled, or while the shared
+    cache is unreachable (no telling whether it's current).
+    """
+    global _filter, _filter_version
+    if not settings.STOCK_TOKEN_BLACKLIST_FILTER:
+        return None
+    shared = caches[settings.STOCK_API_CACHE_ALIAS]
+    try:
+        version = shared.get(VERSION_KEY)
+    except Exception:
+        logger.warning("Shared cache read failed for %s", VERSION_KEY, exc_info=True)
+        return None
+    if _filter is not None and version is not None and version == _filter_version:
+        return _filter
+    with _lock:
+        if _filter is not None and version is not None and version == _filter_version:
+            return _filter
+        try:
+            caught_up = _filter is not None and version is not None and _catch_up(shared, version)
+        except Exception:
+            logger.warning("Shared cache read failed for %s", ADDED_KEY, exc_info=True)
+            caught_up = False
+        if not caught_up:
+            if version is None:
+                # Nothing published yet (or evicted): publish one, so every process agrees from now on
+                version = _initial_version(shared)
+            _filter = build_filter(_blacklisted_jtis())
+        _filter_version = version
+    return _filter
+
+
+def _initial_version(shared):
+    # Far above any version of an earlier epoch, so filters from before an eviction never look current
+    try:
+        shared.add(VERSION_KEY, time.time_ns(), timeout=None)
+        return shared.get(VERSION_KEY)
+    except Exception:
+        logger.warning("Shared cache write failed for %s", VERSION_KEY, exc_info=True)
+        return None
+
+
+def _publish(jti: str):
+    global _filter_version
+    shared = caches[settings.STOCK_API_CACHE_ALIAS]
+    try:
+        try:
+            version = shared.incr(VERSION_KEY)
+        except ValueError:
+            _initial_version(shared)
+            version = shared.incr(VERSION_KEY)
+        shared.set(ADDED_KEY.format(version=version), jti, timeout=DELTA_TTL)
+    except Exception:
+        logger.warning("Shared cache write failed for %s", VERSION_KEY, exc_info=True)
+        return
+    with _lock:
+        # Already added here; skip fetching it back unless other versions came in between
+        if _filter is not None and _filter_version == version - 1:
+            _filter_version = version
+
+
+def is_blacklisted(jti: str) -> bool:
+    """Exact answer; the database is only asked when the filter can't rule the token out."""
+    bloom = get_blacklist_filter()
+    if bloom is not None and jti not in bloom:
+        return False
+    return BlacklistedToken.objects.filter(token__jti=jti).exists()
+
+
+@receiver(post_save, sender=BlacklistedToken)
+def _token_blacklisted(sender, instance, created, **kwargs):
+    if not created:
+        return
+    jti = instance.token.jti
+    if _filter is not None:
+        _filter.add(jti)
+    # Only once the row is visible; a process rebuilding before that would miss it under the new version
+    transaction.on_commit(lambda: _publish(jti))
+
+
+class RefreshToken(tokens.RefreshToken):
+    """simplejwt's RefreshToken with the blacklist lookup answered by the shared Bloom filter."""
+
+    def check_blacklist(self):
+        if is_blacklisted(self.payload[api_settings.JTI_CLAIM]):
+            raise TokenError(_("Token is blacklisted"))
+
+
+def compact_tokens(batch_size: int = 5000) -> Tuple[int, int]:
+    """
+    Deletes expired blacklist entries and outstanding tokens in batches of ``batch_size``. Expired
+    tokens fail validation anyway, so dropping their blacklist entries is safe.
+    Returns (blacklisted, outstanding) rows deleted.
+    """
+    now = aware_utcnow()
+    blacklisted = outstanding = 0
+    while True:
+        ids = list(
+            OutstandingToken.objects.filter(expires_at__lte=now)
+            .order_by('id')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            return blacklisted, outstanding
+        # Blacklist rows first, so deleting the outstanding ones has nothing left to cascade to
+        blacklisted += BlacklistedToken.objects.filter(token_id__in=ids).delete()[0]
+        outstanding += OutstandingToken.objects.filter(id__in=ids).delete()[0]
@@ -1,9 +1,14 @@
 from django.urls import path
 
+from core.views.async_stock_views import async_get_search_tickers, async_get_stock_aggregate_data, \
+    async_get_ticker_details, async_get_tickers_snapshot, async_get_news
 from core.views.stock_views import *
+from core.views.metrics_views import get_metrics
+from core.views.stream_views import stream_quotes
 from core.views.user_views import *
 from core.views.watchlist_views import create_watchlist, add_ticker_to_watchlist, remove_ticker_from_watchlist, \
-    get_user_watchlists, get_user_watchlist_by_id
+    get_user_watchlists, get_user_watchlist_by_id, get_user_watchlists_quotes, bulk_add_tickers_to_watchlist, \
+    bulk_remove_tickers_from_watchlist, reorder_watchlist, get_watchlist_analytics
 
 urlpatterns = [
     # user & JWT
@@ -14,16 +19,32 @@ urlpatterns = [
     # watchlist
     path('watchlists/create', create_watchlist),
     path('watchlists/all', get_user_watchlists),
+    path('watchlists/quotes', get_user_watchlists_quotes),
     path('watchlists/<int:id>/add_ticker', add_ticker_to_watchlist),
     path('watchlists/remove_ticker', remove_ticker_from_watchlist),
+    path('watchlists/<int:id>/bulk_add', bulk_add_tickers_to_watchlist),
+    path('watchlists/<int:id>/bulk_remove', bulk_remove_tickers_from_watchlist),
+    path('watchlists/<int:id>/reorder', reorder_watchlist),
+    path('watchlists/<int:id>/analytics', get_watchlist_analytics),
     path('watchlists/<int:id>/', get_user_watchlist_by_id),
 
     # stock data
     path('search_tickers', get_search_tickers),
     path('stock_aggregate_data', get_stock_aggregate_data),
+    path('stock_indicators', get_stock_indicators),
     path('stocks/details', get_ticker_details),
     path('tickers-snapshot', get_tickers_snapshot),
     path('news', get_news),
+    # stock data, async variants (served natively under ASGI)
+    path('async/search_tickers', async_get_search_tickers),
+    path('async/stock_aggregate_data', async_get_stock_aggregate_data),
+    path('async/stocks/details', async_get_ticker_details),
+    path('async/tickers-snapshot', async_get_tickers_snapshot),
+    path('async/news', async_get_news),
+    # live quotes (SSE; the WebSocket flavour is mounted in stockwatch/asgi.py)
+    path('stream/quotes', stream_quotes),
+    # Prometheus scrape target
+    path('metrics', get_metrics),
     # test
     path('user_info', get_user_info)
 ]
\ No newline at end of file
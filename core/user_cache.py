@@ -0,0 +1,94 @@
+import logging
+import sys
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core.stockapi.cache import MISS, LRUCache
+
+logger = logging.getLogger(__name__)
+
+USER_KEY = "auth:user:{id}"
+# Changed on every save or delete of the user; shared entries written under an older one are ignored
+GENERATION_KEY = "auth:user:{id}:generation"
+
+User = get_user_model()
+# Everything but the password hash, which stays out of the cache; touching it loads it from the database
+FIELDS = [field.attname for field in User._meta.concrete_fields if field.attname != 'password']
+
+_local = LRUCache(settings.STOCK_AUTH_USER_CACHE_MAX_ENTRIES, sys.maxsize)
+
+
+def _user(values) -> User:
+    # Built like a queryset row with the password deferred, so saving it never writes a stale or empty hash
+    return User.from_db(DEFAULT_DB_ALIAS, FIELDS, values)
+
+
+def _generation(shared, key, cached):
+    generation = cached.get(key)
+    if generation is None:
+        # Nothing published yet (or expired): any fresh value will do, as long as every process agrees
+        shared.add(key, time.time_ns(), settings.STOCK_AUTH_USER_CACHE_TTL)
+        generation = shared.get(key)
+    return generation
+
+
+def get_cached_user(user_id):
+    """
+    The user with ``user_id`` (None if there is none), looked up per process, then in the shared cache,
+    then in the database. Saving or deleting a user drops its entries; other processes may keep serving
+    their local copy for up to STOCK_AUTH_USER_CACHE_LOCAL_TTL seconds.
+    """
+    key = USER_KEY.format(id=user_id)
+    values = _local.get(key)
+    if values is not MISS:
+        return _user(values)
+
+    shared = caches[settings.STOCK_API_CACHE_ALIAS]
+    generation_key = GENERATION_KEY.format(id=user_id)
+    try:
+        cached = shared.get_many([key, generation_key])
+        # Read before the database: a row read after this generation is replaced never lands under the new one
+        generation = _generation(shared, generation_key, cached)
+    except Exception:
+        logger.warning("Shared cache read failed for %s", key, exc_info=True)
+        cached, generation = {}, None
+    entry = cached.get(key)
+    if generation is not None and entry is not None and entry[0] == generation:
+        values = entry[1]
+    else:
+        values = User.objects.filter(pk=user_id).values_list(*FIELDS).first()
+        if values is None:
+            return None
+        if generation is not None:
+            try:
+                shared.set(key, (generation, values), settings.STOCK_AUTH_USER_CACHE_TTL)
+            except Exception:
+                logger.warning("Shared cache write failed for %s", key, exc_info=True)
+    _local.set(key, values, time.time() + settings.STOCK_AUTH_USER_CACHE_LOCAL_TTL, 1)
+    return _user(values)
+
+
+def invalidate_user(user_id):
+    key = USER_KEY.format(id=user_id)
+    _local.delete(key)
+    shared = caches[settings.STOCK_API_CACHE_ALIAS]
+    try:
+        shared.set(GENERATION_KEY.format(id=user_id), time.time_ns(), settings.STOCK_AUTH_USER_CACHE_TTL)
+        shared.delete(key)
+    except Exception:
+        logger.warning("Shared cache write failed for %s", key, exc_info=True)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def _user_changed(sender, instance, using, **kwargs):
+    user_id = instance.pk
+    invalidate_user(user_id)
+    # Again once committed: a request reading the row before then may have cached the old one meanwhile
+    transaction.on_commit(lambda: invalidate_user(user_id), using=using)
@@ -0,0 +1,174 @@
+import logging
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import JsonResponse
+from django.views.decorators.http import require_GET
+
+from core.authentication import async_cookie_jwt_required
+from core.bar_store import get_aggregate_bars
+from core.etags import aggregate_etag, conditional, snapshot_etag
+from core.json_codec import FastJSONResponse, data_response, loads
+from core.news_store import list_news, published_filters
+from core.quotes import tickers_snapshot
+from core.stockapi.async_client import AsyncPolygonClient
+from core.ticker_index import search_ticker_symbols, upsert_ticker_symbols
+from core.timeseries.downsample import downsample
+
+logger = logging.getLogger(__name__)
+
+# Async twins of core.views.stock_views. DRF's @api_view is sync-only, so these are plain Django
+# async views: under ASGI each one parks on the event loop instead of pinning a worker thread
+# for the whole upstream round trip.
+
+
+@require_GET
+@async_cookie_jwt_required
+async def async_get_search_tickers(request):
+    try:
+        market = request.GET.get('market', 'stocks')
+        search = request.GET.get('search', '')
+        limit = int(request.GET.get('limit', 50))
+        date = request.GET.get('date')
+        ticker_type = request.GET.get('ticker_type')
+        active = request.GET.get('active', 'true').lower() == 'true'
+
+        data = None
+        if not date:
+            data = await sync_to_async(search_ticker_symbols)(search, limit, market, ticker_type, active)
+        if data is None:
+            client = AsyncPolygonClient()
+            data = await client.get_search_tickers(
+                search=search,
+                market=market,
+                limit=limit,
+                date=date,
+                ticker_type=ticker_type,
+                active=active,
+                raw=settings.STOCK_API_PASSTHROUGH
+            )
+            if not date:
+                parsed = loads(data) if isinstance(data, bytes) else data
+                await sync_to_async(upsert_ticker_symbols)(parsed.get('results') or [])
+        return data_response(data, status=200)
+
+    except ValueError as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+    except Exception as e:
+        logger.exception("Request to %s failed", request.path)
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
+
+
+@require_GET
+@async_cookie_jwt_required
+@conditional(aggregate_etag)
+async def async_get_stock_aggregate_data(request):
+    try:
+        ticker = request.GET.get('stockTicker')
+        multiplier = request.GET.get('multiplier')
+        timespan = request.GET.get('timespan')
+        from_date = request.GET.get('from')
+        to_date = request.GET.get('to')
+        adjusted = request.GET.get('adjusted', 'true').lower() == 'true'
+        sort = request.GET.get('sort', 'asc')
+        limit = int(request.GET.get('limit', 5000))
+        max_points = request.GET.get('max_points')
+        method = request.GET.get('downsample', 'lttb')
+
+        if not all([ticker, multiplier, timespan, from_date, to_date]):
+            return JsonResponse({'status': 'error', 'message': 'Missing required parameters'}, status=400)
+
+        # Same bar store as the sync view; a gap in it is fetched upstream on the sync client
+        data = await sync_to_async(get_aggregate_bars)(
+            ticker=ticker,
+            multiplier=int(multiplier),
+            timespan=timespan,
+            from_date=from_date,
+            to_date=to_date,
+            adjusted=adjusted,
+            sort=sort,
+            limit=limit
+        )
+        if max_points:
+            results = downsample(data.get('results') or [], int(max_points), method)
+            data = {**data, 'results': results, 'resultsCount': len(results)}
+        return data_response(data, status=200)
+
+    except ValueError as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+    except Exception as e:
+        logger.exception("Request to %s failed", request.path)
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
+
+
+@require_GET
+@async_cookie_jwt_required
+async def async_get_ticker_details(request):
+    try:
+        ticker = request.GET.get('ticker')
+        date = request.GET.get('date')
+
+        if not ticker:
+            return JsonResponse({'status': 'error', 'message': 'Ticker is required'}, status=400)
+
+        client = AsyncPolygonClient()
+        data = await client.get_ticker_details(
+            ticker=ticker,
+            date=date,
+            raw=settings.STOCK_API_PASSTHROUGH
+        )
+        return data_response(data, status=200)
+
+    except ValueError as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+    except Exception as e:
+        logger.exception("Request to %s failed", request.path)
+        return JsonResponse({
+            'status': 'error',
+            'message': 'An unexpected error occurred',
+            'details': str(e)
+        }, status=500)
+
+
+@require_GET
+@async_cookie_jwt_required
+@conditional(snapshot_etag)
+async def async_get_tickers_snapshot(request):
+    try:
+        tickers = request.GET.get('tickers')
+        include_otc = request.GET.get('include_otc', 'false').lower() == 'true'
+
+        if tickers:
+            data = await sync_to_async(tickers_snapshot)(tickers.split(','), include_otc=include_otc)
+        else:
+            # The whole market isn't polled; go upstream
+            client = AsyncPolygonClient()
+            data = await client.get_tickers_snapshot(include_otc=include_otc)
+        return data_response(data, status=200)
+
+    except ValueError as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+    except Exception as e:
+        logger.exception("Request to %s failed", request.path)
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
+
+
+@require_GET
+@async_cookie_jwt_required
+async def async_get_news(request):
+    try:
+        ticker = request.GET.get('ticker') or ''
+        order = request.GET.get('order') or 'desc'
+        limit = int(request.GET.get('limit', '50'))
+        sort = request.GET.get('sort')
+        cursor = request.GET.get('cursor')
+
+        if sort and sort != 'published_utc':
+            raise ValueError('Invalid parameter "sort". Valid options: published_utc')
+        articles, next_cursor = await sync_to_async(list_news)(
+            ticker, order, limit, cursor, published_filters(request.GET)
+        )
+        return FastJSONResponse({'status': 'success', 'data': articles, 'next_cursor': next_cursor}, status=200)
+    except Exception as e:
+        logger.exception("Request to %s failed", request.path)
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
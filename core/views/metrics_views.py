@@ -0,0 +1,20 @@
+import hmac
+
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse
+from django.views.decorators.http import require_GET
+
+from core import metrics
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+@require_GET
+def get_metrics(request):
+    # Scrapers send the token as a bearer token; without one configured the endpoint is open
+    token = settings.STOCK_METRICS_TOKEN
+    if token:
+        sent = request.META.get('HTTP_AUTHORIZATION', '').removeprefix('Bearer ')
+        if not hmac.compare_digest(sent.encode(), token.encode()):
+            return JsonResponse({'status': 'error', 'message': 'Invalid metrics token'}, status=401)
+    return HttpResponse(''.join(metrics.render(metrics.collect())), content_type=PROMETHEUS_CONTENT_TYPE)
@@ -1,9 +1,28 @@
-from django.http import JsonResponse
-from rest_framework.decorators import api_view, permission_classes, authentication_classes
+import logging
+
+from django.conf import settings
+from django.http import JsonResponse, StreamingHttpResponse
+from rest_framework.decorators import api_view, permission_classes, authentication_classes, renderer_classes
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
 
 from core.authentication import CookieJWTAuthentication
+from core.bar_store import get_aggregate_bars, iter_aggregate_bars
+from core.etags import aggregate_etag, conditional, snapshot_etag
+from core.json_codec import FastJSONResponse, data_response, loads
+from core.news_store import list_news, published_filters, query_news
+from core.renderers import ColumnarJSONRenderer, ColumnarBinaryRenderer, COLUMNAR_FORMATS, ROWS, stream_json
+from core.quotes import tickers_snapshot
 from core.stockapi.polygon_client import PolygonClient
+from core.ticker_index import search_ticker_symbols, upsert_ticker_symbols
+from core.timeseries.downsample import downsample
+from core.timeseries.indicators import indicator_series
+
+logger = logging.getLogger(__name__)
+
+# Plain JSON stays the default; columnar is picked via Accept or ?format=columnar|columnar-bin
+COLUMNAR_RENDERERS = api_settings.DEFAULT_RENDERER_CLASSES + [ColumnarJSONRenderer, ColumnarBinaryRenderer]
 
 @api_view(['GET'])
 @authentication_classes([CookieJWTAuthentication])
@@ -17,26 +36,35 @@ def get_search_tickers(request):
         ticker_type = request.GET.get('ticker_type')
         active = request.GET.get('active', 'true').lower() == 'true'
 
-
-        client = PolygonClient()
-        data = client.get_search_tickers(
-            search=search,
-            market=market,
-            limit=limit,
-            date=date,
-            ticker_type=ticker_type,
-            active=active
-        )
-        return JsonResponse({'status': 'success', 'data': data}, status=200)
+        # The local index only knows current reference data, so point-in-time searches go upstream
+        data = None if date else search_ticker_symbols(search, limit, market, ticker_type, active)
+        if data is None:
+            client = PolygonClient()
+            data = client.get_search_tickers(
+                search=search,
+                market=market,
+                limit=limit,
+                date=date,
+                ticker_type=ticker_type,
+                active=active,
+                raw=settings.STOCK_API_PASSTHROUGH
+            )
+            if not date:
+                parsed = loads(data) if isinstance(data, bytes) else data
+                upsert_ticker_symbols(parsed.get('results') or [])
+        return data_response(data, status=200)
 
     except ValueError as e:
         return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
     except Exception as e:
+        logger.exception("Request to %s failed", request.path)
         return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
 
 @api_view(['GET'])
 @authentication_classes([CookieJWTAuthentication])
 @permission_classes([IsAuthenticated])
+@renderer_classes(COLUMNAR_RENDERERS)
+@conditional(aggregate_etag)
 def get_stock_aggregate_data(request):
     try:
         ticker = request.GET.get('stockTicker')
@@ -47,14 +75,36 @@ def get_stock_aggregate_data(request):
         adjusted = request.GET.get('adjusted', 'true').lower() == 'true'
         sort = request.GET.get('sort', 'asc')
         limit = int(request.GET.get('limit', 5000))
+        max_points = request.GET.get('max_points')
+        method = request.GET.get('downsample', 'lttb')
+        stream = request.GET.get('stream', 'false').lower() == 'true'
 
         if not all([ticker, multiplier, timespan, from_date, to_date]):
-            print(ticker, multiplier, timespan, from_date, to_date)
+            logger.info("Aggregates request missing parameters: %s", request.GET.dict())
             return JsonResponse({'status': 'error', 'message': 'Missing required parameters'}, status=400)
 
         multiplier = int(multiplier)
-        client = PolygonClient()
-        data = client.get_aggregate_data(
+        # Downsampling and the columnar formats need every row at once, so only plain JSON is streamed
+        if stream and not max_points and request.accepted_renderer.format not in COLUMNAR_FORMATS:
+            bars = iter_aggregate_bars(
+                ticker=ticker,
+                multiplier=multiplier,
+                timespan=timespan,
+                from_date=from_date,
+                to_date=to_date,
+                adjusted=adjusted,
+                sort=sort,
+                limit=int(request.GET['limit']) if 'limit' in request.GET else None
+            )
+            def envelope(count):
+                return {'status': 'success', 'data': {
+                    'ticker': ticker.upper(), 'adjusted': adjusted, 'status': 'OK',
+                    'results': ROWS, 'queryCount': count, 'resultsCount': count,
+                }}
+
+            return StreamingHttpResponse(stream_json(envelope, bars), content_type='application/json')
+
+        data = get_aggregate_bars(
             ticker=ticker,
             multiplier=multiplier,
             timespan=timespan,
@@ -64,11 +114,53 @@ def get_stock_aggregate_data(request):
             sort=sort,
             limit=limit
         )
-        return JsonResponse({'status': 'success', 'data': data}, status=200)
+        if max_points:
+            results = downsample(data.get('results') or [], int(max_points), method)
+            data = {**data, 'results': results, 'resultsCount': len(results)}
+        if request.accepted_renderer.format in COLUMNAR_FORMATS:
+            return Response({'status': 'success', 'data': data}, status=200)
+        return data_response(data, status=200)
+
+    except ValueError as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+    except Exception as e:
+        logger.exception("Request to %s failed", request.path)
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
+
+@api_view(['GET'])
+@authentication_classes([CookieJWTAuthentication])
+@permission_classes([IsAuthenticated])
+def get_stock_indicators(request):
+    try:
+        ticker = request.GET.get('stockTicker')
+        multiplier = request.GET.get('multiplier')
+        timespan = request.GET.get('timespan')
+        from_date = request.GET.get('from')
+        to_date = request.GET.get('to')
+        adjusted = request.GET.get('adjusted', 'true').lower() == 'true'
+        limit = int(request.GET.get('limit', 5000))
+        indicators = request.GET.get('indicators')
+
+        if not all([ticker, multiplier, timespan, from_date, to_date, indicators]):
+            return JsonResponse({'status': 'error', 'message': 'Missing required parameters'}, status=400)
+
+        data = get_aggregate_bars(
+            ticker=ticker,
+            multiplier=int(multiplier),
+            timespan=timespan,
+            from_date=from_date,
+            to_date=to_date,
+            adjusted=adjusted,
+            sort='asc',
+            limit=limit
+        )
+        series = indicator_series(data.get('results') or [], indicators)
+        return FastJSONResponse({'status': 'success', 'data': {'ticker': data['ticker'], **series}}, status=200)
 
     except ValueError as e:
         return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
     except Exception as e:
+        logger.exception("Request to %s failed", request.path)
         return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
 
 @api_view(['GET'])
@@ -85,13 +177,15 @@ def get_ticker_details(request):
         client = PolygonClient()
         data = client.get_ticker_details(
             ticker=ticker,
-            date=date
+            date=date,
+            raw=settings.STOCK_API_PASSTHROUGH
         )
-        return JsonResponse({'status': 'success', 'data': data}, status=200)
+        return data_response(data, status=200)
 
     except ValueError as e:
         return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
     except Exception as e:
+        logger.exception("Request to %s failed", request.path)
         return JsonResponse({
             'status': 'error',
             'message': 'An unexpected error occurred',
@@ -101,24 +195,28 @@ def get_ticker_details(request):
 @api_view(['GET'])
 @authentication_classes([CookieJWTAuthentication])
 @permission_classes([IsAuthenticated])
+@renderer_classes(COLUMNAR_RENDERERS)
+@conditional(snapshot_etag)
 def get_tickers_snapshot(request):
     try:
         tickers = request.GET.get('tickers')
         include_otc = request.GET.get('include_otc', 'false').lower() == 'true'
 
-        client = PolygonClient()
-        ticker_list = tickers.split(',') if tickers else None
-
-        data = client.get_tickers_snapshot(
-            tickers=ticker_list,
-            include_otc=include_otc
-        )
+        if tickers:
+            data = tickers_snapshot(tickers.split(','), include_otc=include_otc)
+        else:
+            # The whole market isn't polled; go upstream
+            client = PolygonClient()
+            data = client.get_tickers_snapshot(include_otc=include_otc)
 
-        return JsonResponse({'status': 'success', 'data': data}, status=200)
+        if request.accepted_renderer.format in COLUMNAR_FORMATS:
+            return Response({'status': 'success', 'data': data}, status=200)
+        return data_response(data, status=200)
 
     except ValueError as e:
         return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
     except Exception as e:
+        logger.exception("Request to %s failed", request.path)
         return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
 
 
@@ -127,20 +225,26 @@ def get_tickers_snapshot(request):
 @permission_classes([IsAuthenticated])
 def get_news(request):
     try:
-        ticker = request.GET.get('ticker', None)
-        published_utc = request.GET.get('published_utc', None)
-        order = request.GET.get('order', None)
-        limit = request.GET.get('limit', '50')
+        ticker = request.GET.get('ticker') or ''
+        order = request.GET.get('order') or 'desc'
+        limit = int(request.GET.get('limit', '50'))
         sort = request.GET.get('sort')
-
-        client = PolygonClient()
-        data = client.get_news(
-            ticker= ticker,
-            published_utc= published_utc,
-            order= order,
-            limit= int(limit),
-            sort= sort
-        )
-        return JsonResponse({'status': 'success', 'data': data.get("results")}, status=200)
+        cursor = request.GET.get('cursor')
+        stream = request.GET.get('stream', 'false').lower() == 'true'
+
+        if sort and sort != 'published_utc':
+            raise ValueError('Invalid parameter "sort". Valid options: published_utc')
+        # Served from the local store; only articles published since the last refresh are fetched upstream
+        lookups = published_filters(request.GET)
+        if stream:
+            page = query_news(ticker, order, limit, cursor, lookups)
+
+            def envelope(count):
+                return {'status': 'success', 'data': ROWS, 'next_cursor': page.next_cursor}
+
+            return StreamingHttpResponse(stream_json(envelope, page), content_type='application/json')
+        articles, next_cursor = list_news(ticker, order, limit, cursor, lookups)
+        return FastJSONResponse({'status': 'success', 'data': articles, 'next_cursor': next_cursor}, status=200)
     except Exception as e:
+        logger.exception("Request to %s failed", request.path)
         return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
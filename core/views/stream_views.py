@@ -0,0 +1,172 @@
+import asyncio
+import io
+import json
+from typing import Dict, List
+from urllib.parse import urlsplit
+
+from asgiref.sync import sync_to_async
+from corsheaders.middleware import CorsMiddleware
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db import close_old_connections
+from django.http import JsonResponse, StreamingHttpResponse, parse_cookie
+from django.views.decorators.http import require_GET
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+
+from core.authentication import CookieJWTAuthentication, async_cookie_jwt_required, auth_failed_response
+from core.streaming import get_hub, resolve_tickers
+
+# Quote streams come in three flavours sharing one QuoteHub per event loop:
+#  - sse_quotes / websocket_quotes: raw ASGI apps mounted in stockwatch/asgi.py. They skip Django's
+#    request handling, which keeps a worker thread (and with it a DB connection) per in-flight request
+#    for as long as the response streams; here an idle stream holds neither.
+#  - stream_quotes: the same SSE stream as a regular view, for WSGI/runserver (a thread per stream).
+
+_cors = CorsMiddleware(lambda request: None)
+
+
+async def _event_stream(tickers: List[str]):
+    hub = get_hub()
+    subscription = hub.subscribe(tickers)
+    try:
+        yield f"retry: 3000\nevent: subscribed\ndata: {json.dumps({'tickers': tickers})}\n\n"
+        while True:
+            changes = await subscription.changes(timeout=settings.STOCK_STREAM_HEARTBEAT)
+            if changes:
+                yield f"event: quotes\ndata: {json.dumps(changes)}\n\n"
+            else:
+                # Comment line; keeps proxies from timing out the idle connection
+                yield ": keep-alive\n\n"
+    finally:
+        hub.unsubscribe(subscription)
+
+
+def _event_stream_response(stream) -> StreamingHttpResponse:
+    response = StreamingHttpResponse(stream, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def _error_response(error: Exception) -> JsonResponse:
+    if isinstance(error, AuthenticationFailed):
+        return auth_failed_response(error)
+    status = 404 if isinstance(error, LookupError) else 400
+    return JsonResponse({'status': 'error', 'message': str(error)}, status=status)
+
+
+@require_GET
+@async_cookie_jwt_required
+async def stream_quotes(request):
+    """Server-Sent Events: ``quotes`` events carry ``{ticker: quote}`` for the quotes that changed."""
+    try:
+        tickers = await sync_to_async(resolve_tickers)(
+            request.user, request.GET.get('watchlist'), request.GET.get('tickers')
+        )
+    except (LookupError, ValueError) as e:
+        return _error_response(e)
+    return _event_stream_response(_event_stream(tickers))
+
+
+def _authenticate_stream(cookies: Dict[str, str], query: Dict[str, str]) -> List[str]:
+    # Runs outside Django's request cycle, so nothing else closes the connection afterwards
+    close_old_connections()
+    try:
+        result = CookieJWTAuthentication().authenticate_cookie(cookies.get('access_token'))
+        if result is None:
+            raise AuthenticationFailed("Authentication credentials were not provided.")
+        return resolve_tickers(result[0], query.get('watchlist'), query.get('tickers'))
+    finally:
+        close_old_connections()
+
+
+async def _wait_for_disconnect(receive, disconnect_type: str):
+    while (await receive())['type'] != disconnect_type:
+        pass
+
+
+async def _send_until_disconnect(receive, disconnect_type: str, pump):
+    pump_task = asyncio.ensure_future(pump())
+    disconnect_task = asyncio.ensure_future(_wait_for_disconnect(receive, disconnect_type))
+    try:
+        await asyncio.wait([pump_task, disconnect_task], return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        pump_task.cancel()
+        disconnect_task.cancel()
+
+
+async def sse_quotes(scope, receive, send):
+    """ASGI app serving GET /api/stream/quotes; same contract as stream_quotes."""
+    request = ASGIRequest(scope, io.BytesIO())
+    stream = None
+    try:
+        tickers = await sync_to_async(_authenticate_stream)(request.COOKIES, request.GET.dict())
+    except (AuthenticationFailed, LookupError, ValueError) as e:
+        response = _error_response(e)
+    else:
+        stream = _event_stream(tickers)
+        response = _event_stream_response(stream)
+    _cors.add_response_headers(request, response)
+
+    headers = [(name.encode('latin-1'), value.encode('latin-1')) for name, value in response.items()]
+    await send({'type': 'http.response.start', 'status': response.status_code, 'headers': headers})
+    if stream is None:
+        await send({'type': 'http.response.body', 'body': response.content})
+        return
+
+    async def pump():
+        async for chunk in response.streaming_content:
+            await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+
+    try:
+        await _send_until_disconnect(receive, 'http.disconnect', pump)
+    finally:
+        # Run the generator's cleanup (unsubscribe) now rather than whenever it gets collected
+        await stream.aclose()
+
+
+def _origin_allowed(headers: Dict[bytes, bytes]) -> bool:
+    # Browsers always send Origin on a WebSocket handshake; clients that don't aren't another site's page
+    origin = headers.get(b'origin', b'').decode('latin-1')
+    if not origin:
+        return True
+    if origin in settings.STOCK_STREAM_WEBSOCKET_ORIGINS:
+        return True
+    return urlsplit(origin).netloc == headers.get(b'host', b'').decode('latin-1')
+
+
+async def websocket_quotes(scope, receive, send):
+    """
+    WebSocket flavour of the quote stream (Django has no WebSocket support of its own). Same query
+    parameters and cookie; every text frame is a ``{ticker: quote}`` object.
+    """
+    if (await receive())['type'] != 'websocket.connect':
+        return
+
+    headers = dict(scope.get('headers') or [])
+    if not _origin_allowed(headers):
+        await send({'type': 'websocket.close', 'code': 4403})
+        return
+    cookies = parse_cookie(headers.get(b'cookie', b'').decode('latin-1'))
+    query = ASGIRequest({**scope, 'method': 'GET'}, io.BytesIO()).GET.dict()
+    try:
+        tickers = await sync_to_async(_authenticate_stream)(cookies, query)
+    except (AuthenticationFailed, LookupError, ValueError) as e:
+        # Closing before accepting rejects the handshake
+        await send({'type': 'websocket.close', 'code': 4000 + _error_response(e).status_code})
+        return
+
+    await send({'type': 'websocket.accept'})
+    hub = get_hub()
+    subscription = hub.subscribe(tickers)
+
+    async def pump():
+        while True:
+            changes = await subscription.changes()
+            await send({'type': 'websocket.send', 'text': json.dumps(changes)})
+
+    try:
+        await _send_until_disconnect(receive, 'websocket.disconnect', pump)
+    finally:
+        hub.unsubscribe(subscription)
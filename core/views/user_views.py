@@ -1,9 +1,9 @@
 from django.http import JsonResponse
 from rest_framework.decorators import api_view, permission_classes, authentication_classes
 from rest_framework.permissions import AllowAny, IsAuthenticated
-from rest_framework_simplejwt.tokens import RefreshToken
 
 from core.authentication import CookieJWTAuthentication
+from core.token_blacklist import RefreshToken
 from core.serializers import UserRegisterSerializer, UserLoginSerializer, UserSerializer
 
 
@@ -1,11 +1,23 @@
-from django.http import JsonResponse
+import logging
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from django.http import HttpResponse, JsonResponse
 from rest_framework.decorators import api_view, permission_classes, authentication_classes
 from rest_framework.permissions import IsAuthenticated
 
 from core.authentication import CookieJWTAuthentication
+from core.etags import conditional, watchlists_changed, watchlists_etag
+from core.json_codec import FastJSONResponse
 from core.models import Watchlist, WatchlistItem
+from core.quotes import fetch_quotes
 from core.serializers import UserRegisterSerializer, UserLoginSerializer, UserSerializer, WatchlistSerializer, \
     WatchlistItemSerializer
+from core.watchlist_analytics import watchlist_analytics
+
+logger = logging.getLogger(__name__)
 
 
 @api_view(['POST'])
@@ -18,6 +30,7 @@ def create_watchlist(request):
     )
     if serializer.is_valid():
         serializer.save(user=request.user)
+        watchlists_changed(request.user.id)
         return JsonResponse({"status": "success", "data": serializer.data}, status=201)
     return JsonResponse({"status": "error", "errors": serializer.errors}, status=400)
 
@@ -33,7 +46,9 @@ def add_ticker_to_watchlist(request, id):
 
     serializer = WatchlistItemSerializer(data=request.data, context={'watchlist': watchlist})
     if serializer.is_valid():
-        serializer.save(watchlist=watchlist)
+        last = watchlist.items.aggregate(last=Max('position'))['last']
+        serializer.save(watchlist=watchlist, position=0 if last is None else last + 1)
+        watchlists_changed(request.user.id)
         return JsonResponse({"status": "success", "data": serializer.data}, status=201)
     return JsonResponse({"status": "error", "errors": serializer.errors}, status=400)
 
@@ -46,6 +61,7 @@ def remove_ticker_from_watchlist(request, watchlist_id, ticker):
         watchlist = Watchlist.objects.get(id=watchlist_id, user=request.user)
         item = WatchlistItem.objects.get(watchlist=watchlist, ticker=ticker)
         item.delete()
+        watchlists_changed(request.user.id)
         return JsonResponse({"status": "success", "message": "Ticker usunięty z watchlisty."}, status=204)
     except Watchlist.DoesNotExist:
         return JsonResponse({"status": "error", "message": "Watchlista nie istnieje lub nie należy do użytkownika."},
@@ -54,6 +70,135 @@ def remove_ticker_from_watchlist(request, watchlist_id, ticker):
         return JsonResponse({"status": "error", "message": "Ticker nie istnieje w tej watchliście."}, status=404)
 
 
+def _bulk_tickers(request, key, item_type=str):
+    """The request's ``key`` list, or an error response when it's missing, empty, malformed or too long."""
+    values = request.data.get(key) if hasattr(request.data, 'get') else None
+    if not isinstance(values, list) or not values or not all(isinstance(v, item_type) for v in values):
+        return None, JsonResponse({"status": "error", "message": f"\"{key}\" musi być niepustą listą."}, status=400)
+    if len(values) > settings.STOCK_WATCHLIST_BULK_MAX:
+        return None, JsonResponse(
+            {"status": "error", "message": f"Maksymalnie {settings.STOCK_WATCHLIST_BULK_MAX} tickerów na żądanie."},
+            status=400
+        )
+    return values, None
+
+
+def _locked_watchlist(user, id):
+    # Locked for the rest of the transaction so concurrent bulk edits don't interleave positions
+    return Watchlist.objects.select_for_update().filter(id=id, user=user).first()
+
+
+@api_view(['POST'])
+@authentication_classes([CookieJWTAuthentication])
+@permission_classes([IsAuthenticated])
+def bulk_add_tickers_to_watchlist(request, id):
+    """
+    Adds ``items`` ([{"ticker", "name"}, ...]) in one transaction, appended in the given order. Every
+    entry gets a result: added, exists (already in the watchlist), duplicate (earlier in the same
+    batch) or invalid (with the serializer's errors). Costs the same handful of queries for any batch size.
+    """
+    items, error = _bulk_tickers(request, 'items', dict)
+    if error:
+        return error
+
+    # Field validation only; the per-ticker existence check is replaced by one query below
+    item_serializers = [WatchlistItemSerializer(data=item) for item in items]
+    with transaction.atomic():
+        watchlist = _locked_watchlist(request.user, id)
+        if watchlist is None:
+            return JsonResponse({"status": "error", "message": "Watchlista nie istnieje lub nie należy do użytkownika."},
+                                status=404)
+        existing = dict(watchlist.items.values_list('ticker', 'position'))
+        position = max(existing.values(), default=-1) + 1
+
+        results, new_items, seen = [], [], set()
+        for item, serializer in zip(items, item_serializers):
+            ticker = item.get('ticker')
+            if not serializer.is_valid():
+                results.append({"ticker": ticker, "status": "invalid", "errors": serializer.errors})
+            elif serializer.validated_data['ticker'] in existing:
+                results.append({"ticker": ticker, "status": "exists"})
+            elif serializer.validated_data['ticker'] in seen:
+                results.append({"ticker": ticker, "status": "duplicate"})
+            else:
+                seen.add(serializer.validated_data['ticker'])
+                new_items.append(WatchlistItem(watchlist=watchlist, position=position, **serializer.validated_data))
+                position += 1
+                results.append({"ticker": ticker, "status": "added"})
+        # A concurrent single add may still have inserted one of these; the unique constraint keeps that one
+        WatchlistItem.objects.bulk_create(new_items, ignore_conflicts=True)
+        if new_items:
+            watchlists_changed(request.user.id)
+
+    return JsonResponse({"status": "success", "data": {
+        "results": results,
+        "watchlist": _user_watchlists(request.user, id=id)[0],
+    }}, status=200)
+
+
+@api_view(['POST'])
+@authentication_classes([CookieJWTAuthentication])
+@permission_classes([IsAuthenticated])
+def bulk_remove_tickers_from_watchlist(request, id):
+    """Removes ``tickers`` in one statement; each gets a result of removed or not_found."""
+    tickers, error = _bulk_tickers(request, 'tickers')
+    if error:
+        return error
+
+    with transaction.atomic():
+        watchlist = _locked_watchlist(request.user, id)
+        if watchlist is None:
+            return JsonResponse({"status": "error", "message": "Watchlista nie istnieje lub nie należy do użytkownika."},
+                                status=404)
+        found = dict(watchlist.items.filter(ticker__in=tickers).values_list('ticker', 'id'))
+        WatchlistItem.objects.filter(id__in=found.values()).delete()
+        if found:
+            watchlists_changed(request.user.id)
+
+    results = [{"ticker": ticker, "status": "removed" if ticker in found else "not_found"} for ticker in tickers]
+    return JsonResponse({"status": "success", "data": {
+        "results": results,
+        "watchlist": _user_watchlists(request.user, id=id)[0],
+    }}, status=200)
+
+
+@api_view(['PUT'])
+@authentication_classes([CookieJWTAuthentication])
+@permission_classes([IsAuthenticated])
+def reorder_watchlist(request, id):
+    """
+    Puts ``tickers`` first, in the given order; items not listed keep their relative order after them.
+    Each listed ticker gets a result of moved or not_found. All positions are written with one UPDATE.
+    """
+    tickers, error = _bulk_tickers(request, 'tickers')
+    if error:
+        return error
+
+    with transaction.atomic():
+        watchlist = _locked_watchlist(request.user, id)
+        if watchlist is None:
+            return JsonResponse({"status": "error", "message": "Watchlista nie istnieje lub nie należy do użytkownika."},
+                                status=404)
+        items = list(watchlist.items.only('id', 'watchlist_id', 'ticker', 'position'))
+        by_ticker = {item.ticker: item for item in items}
+        listed = dict.fromkeys(t for t in tickers if t in by_ticker)
+        ordered = [by_ticker[t] for t in listed] + [item for item in items if item.ticker not in listed]
+        changed = []
+        for position, item in enumerate(ordered):
+            if item.position != position:
+                item.position = position
+                changed.append(item)
+        WatchlistItem.objects.bulk_update(changed, ['position'])
+        if changed:
+            watchlists_changed(request.user.id)
+
+    results = [{"ticker": ticker, "status": "moved" if ticker in by_ticker else "not_found"} for ticker in tickers]
+    return JsonResponse({"status": "success", "data": {
+        "results": results,
+        "watchlist": _user_watchlists(request.user, id=id)[0],
+    }}, status=200)
+
+
 @api_view(['DELETE'])
 @authentication_classes([CookieJWTAuthentication])
 @permission_classes([IsAuthenticated])
@@ -61,6 +206,7 @@ def delete_watchlist(request, watchlist_id):
     try:
         watchlist = Watchlist.objects.get(id=watchlist_id, user=request.user)
         watchlist.delete()
+        watchlists_changed(request.user.id)
         return JsonResponse({"status": "success", "message": "Watchlista została usunięta."}, status=204)
     except Watchlist.DoesNotExist:
         return JsonResponse({"status": "error", "message": "Watchlista nie istnieje lub nie należy do użytkownika."},
@@ -80,21 +226,94 @@ def update_watchlist_name(request, watchlist_id):
     serializer = WatchlistSerializer(watchlist, data=request.data, partial=True, context={'user': request.user})
     if serializer.is_valid():
         serializer.save()
+        watchlists_changed(request.user.id)
         return JsonResponse({"status": "success", "data": serializer.data}, status=200)
     return JsonResponse({"status": "error", "errors": serializer.errors}, status=400)
 
+
+def _user_watchlists(user, **filters):
+    """
+    The user's watchlists with their items from a single LEFT JOIN, assembled into the same shape
+    WatchlistSerializer produces. Nesting the serializer costs one items query per watchlist.
+    """
+    rows = Watchlist.objects.filter(user=user, **filters).order_by('id', 'items__position', 'items__id').values_list(
+        'id', 'name', 'items__id', 'items__ticker', 'items__name'
+    )
+    watchlists = {}
+    for watchlist_id, name, item_id, ticker, item_name in rows:
+        watchlist = watchlists.get(watchlist_id)
+        if watchlist is None:
+            watchlist = watchlists[watchlist_id] = {'id': watchlist_id, 'name': name, 'items': [], 'user': user.id}
+        if item_id is not None:
+            watchlist['items'].append({'id': item_id, 'ticker': ticker, 'name': item_name})
+    return list(watchlists.values())
+
+
 @api_view(['GET'])
 @authentication_classes([CookieJWTAuthentication])
 @permission_classes([IsAuthenticated])
+@conditional(watchlists_etag)
 def get_user_watchlists(request):
-    watchlists = Watchlist.objects.filter(user=request.user)
-    serializer = WatchlistSerializer(watchlists, many=True)
-    return JsonResponse({"status": "success", "data": serializer.data}, status=200)
+    return JsonResponse({"status": "success", "data": _user_watchlists(request.user)}, status=200)
 
 @api_view(['GET'])
 @authentication_classes([CookieJWTAuthentication])
 @permission_classes([IsAuthenticated])
+@conditional(watchlists_etag)
 def get_user_watchlist_by_id(request, id):
-    watchlists = Watchlist.objects.filter(user=request.user, id=id).first()
-    serializer = WatchlistSerializer(watchlists, many=False)
-    return JsonResponse({"status": "success", "data": serializer.data}, status=200)
\ No newline at end of file
+    watchlists = _user_watchlists(request.user, id=id)
+    if not watchlists:
+        return JsonResponse({"status": "error", "message": "Watchlista nie istnieje lub nie należy do użytkownika."},
+                            status=404)
+    return JsonResponse({"status": "success", "data": watchlists[0]}, status=200)
+
+
+@api_view(['GET'])
+@authentication_classes([CookieJWTAuthentication])
+@permission_classes([IsAuthenticated])
+def get_user_watchlists_quotes(request):
+    watchlists = _user_watchlists(request.user)
+    tickers = sorted({item['ticker'] for watchlist in watchlists for item in watchlist['items']})
+    try:
+        quotes = fetch_quotes(tickers)
+    except Exception as e:
+        logger.exception("Request to %s failed", request.path)
+        return JsonResponse({"status": "error", "message": str(e)}, status=500)
+
+    for watchlist in watchlists:
+        for item in watchlist['items']:
+            item['quote'] = quotes.get(item['ticker'])
+    return FastJSONResponse({"status": "success", "data": watchlists}, status=200)
+
+
+@api_view(['GET'])
+@authentication_classes([CookieJWTAuthentication])
+@permission_classes([IsAuthenticated])
+def get_watchlist_analytics(request, id):
+    try:
+        watchlist = Watchlist.objects.get(id=id, user=request.user)
+    except Watchlist.DoesNotExist:
+        return JsonResponse({"status": "error", "message": "Watchlista nie istnieje lub nie należy do użytkownika."},
+                            status=404)
+
+    tickers = list(watchlist.items.values_list('ticker', flat=True))
+    if not tickers:
+        return JsonResponse({"status": "error", "message": "Watchlista jest pusta."}, status=400)
+    to_date = request.GET.get('to') or date.today().isoformat()
+    try:
+        from_date = request.GET.get('from') or (date.fromisoformat(to_date) - timedelta(days=365)).isoformat()
+        payload = watchlist_analytics(
+            tickers,
+            from_date=from_date,
+            to_date=to_date,
+            benchmark=request.GET.get('benchmark', settings.STOCK_WATCHLIST_ANALYTICS_BENCHMARK),
+            window=int(request.GET.get('window', 20)),
+            adjusted=request.GET.get('adjusted', 'true').lower() == 'true',
+        )
+    except ValueError as e:
+        return JsonResponse({"status": "error", "message": str(e)}, status=400)
+    except Exception as e:
+        logger.exception("Request to %s failed", request.path)
+        return JsonResponse({"status": "error", "message": str(e)}, status=500)
+    # The memoized analytics are already serialized; only the envelope is added
+    return HttpResponse(b'{"status": "success", "data": ' + payload + b'}', content_type='application/json')
@@ -0,0 +1,92 @@
+import hashlib
+import json
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from django.conf import settings
+from django.db import connections
+
+from core.bar_store import iter_aggregate_bars
+from core.stockapi.cache import MISS, ResponseCache, is_closed_window
+from core.stockapi.ratelimit import thread_pool
+from core.timeseries.analytics import align_closes, compute_analytics, to_json
+from core.timeseries.downsample import bars_to_arrays
+
+ANALYTICS_KEY = "watchlist_analytics:{digest}"
+# Per-ticker time series and per-ticker figures in the response, as named by compute_analytics
+SERIES = ("returns", "rolling_volatility", "drawdown")
+STATS = ("total_return", "mean_return", "volatility", "max_drawdown", "beta")
+
+# Serialized results by (tickers, benchmark, window, date range); identical watchlists share entries
+_memo = ResponseCache()
+
+
+def _daily_closes(ticker: str, from_date: str, to_date: str, adjusted: bool) -> Dict[str, np.ndarray]:
+    try:
+        bars = list(iter_aggregate_bars(ticker, 1, "day", from_date, to_date, adjusted))
+        return bars_to_arrays(bars, fields=("t", "c"))
+    finally:
+        # Runs on a pool thread, whose database connection would otherwise stay open
+        connections.close_all()
+
+
+def fetch_daily_closes(tickers: List[str], from_date: str, to_date: str, adjusted: bool = True) -> List[Dict[str, np.ndarray]]:
+    """``{"t", "c"}`` arrays per ticker, from the bar store; tickers are fetched concurrently."""
+    workers = max(1, min(len(tickers), settings.STOCK_WATCHLIST_ANALYTICS_WORKERS))
+    with thread_pool(max_workers=workers) as pool:
+        return list(pool.map(lambda ticker: _daily_closes(ticker, from_date, to_date, adjusted), tickers))
+
+
+def _payload(tickers: List[str], benchmark: Optional[str], window: int, t: np.ndarray,
+             results: Dict[str, np.ndarray]) -> Dict[str, Any]:
+    stats = {name: to_json(results[name]) for name in STATS if name in results}
+    return {
+        "tickers": tickers,
+        "benchmark": benchmark,
+        "window": window,
+        "t": t.tolist(),
+        "stats": {ticker: {name: values[i] for name, values in stats.items()} for i, ticker in enumerate(tickers)},
+        "series": {name: dict(zip(tickers, to_json(results[name].T))) for name in SERIES},
+        "correlation": to_json(results["correlation"]),
+    }
+
+
+def watchlist_analytics(
+        tickers: List[str],
+        from_date: str,
+        to_date: str,
+        benchmark: Optional[str] = None,
+        window: int = 20,
+        adjusted: bool = True
+) -> bytes:
+    """
+    Returns, rolling volatility, drawdown, beta to ``benchmark`` and the correlation matrix of the
+    daily closes of ``tickers`` (in sorted order), as serialized JSON. Memoized per set of tickers,
+    benchmark, window and date range, for as long as the bars themselves are cached.
+    """
+    tickers = sorted({ticker.upper() for ticker in tickers})
+    benchmark = benchmark.upper() if benchmark else None
+    if not tickers:
+        raise ValueError("At least one ticker is required.")
+    if window < 2:
+        raise ValueError("Invalid parameter \"window\".")
+
+    raw = json.dumps([tickers, benchmark, window, from_date, to_date, adjusted], separators=(",", ":"))
+    key = ANALYTICS_KEY.format(digest=hashlib.sha1(raw.encode()).hexdigest())
+    payload = _memo.get(key)
+    if payload is not MISS:
+        return payload
+
+    columns = tickers + [benchmark] if benchmark and benchmark not in tickers else tickers
+    aligned = align_closes(fetch_daily_closes(columns, from_date, to_date, adjusted))
+    if not len(aligned["t"]):
+        raise ValueError("No daily bars in the requested range.")
+    closes = aligned["c"]
+    benchmark_closes = closes[:, columns.index(benchmark)] if benchmark else None
+    results = compute_analytics(closes[:, :len(tickers)], benchmark_closes, window)
+    payload = json.dumps(_payload(tickers, benchmark, window, aligned["t"], results)).encode()
+
+    ttls = settings.STOCK_API_CACHE_TTLS
+    ttl = ttls["aggregates_closed"] if is_closed_window(to_date) else ttls["aggregates_open"]
+    _memo.set(key, payload, ttl, len(payload))
+    return payload
@@ -2,6 +2,10 @@
 ASGI config for stockwatch project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Serve it with an ASGI server (``uvicorn stockwatch.asgi:application``) so the
+async views under ``api/async/`` run natively on the event loop. The live quote
+streams in ``STREAM_ROUTES`` are plain ASGI apps dispatched here, ahead of
+Django (see core.views.stream_views).
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
@@ -13,4 +17,25 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'stockwatch.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported after the app registry is ready
+from core.views.stream_views import sse_quotes, websocket_quotes  # noqa: E402
+
+STREAM_ROUTES = {
+    ('http', '/api/stream/quotes'): sse_quotes,
+    ('websocket', '/api/ws/quotes'): websocket_quotes,
+}
+
+
+async def application(scope, receive, send):
+    handler = None
+    if scope['type'] == 'websocket' or scope.get('method') == 'GET':
+        handler = STREAM_ROUTES.get((scope['type'], scope['path'].rstrip('/')))
+    if handler is not None:
+        return await handler(scope, receive, send)
+    if scope['type'] == 'websocket':
+        await receive()
+        await send({'type': 'websocket.close', 'code': 4404})
+        return
+    return await django_application(scope, receive, send)
@@ -24,6 +24,138 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 SECRET_KEY = os.getenv("DJANGO_SECRET_KEY")
 STOCK_API_KEY = os.getenv("STOCK_API_KEY")
 STOCK_API_BASE_URL = os.getenv("STOCK_API_BASE_URL")
+
+# Polygon HTTP transport (pooled keep-alive session shared by PolygonClient)
+STOCK_API_POOL_CONNECTIONS = int(os.getenv("STOCK_API_POOL_CONNECTIONS", 4))
+STOCK_API_POOL_MAXSIZE = int(os.getenv("STOCK_API_POOL_MAXSIZE", 20))
+STOCK_API_POOL_BLOCK = os.getenv("STOCK_API_POOL_BLOCK", "false").lower() == "true"
+STOCK_API_MAX_RETRIES = int(os.getenv("STOCK_API_MAX_RETRIES", 3))
+STOCK_API_BACKOFF_FACTOR = float(os.getenv("STOCK_API_BACKOFF_FACTOR", 0.5))
+STOCK_API_BACKOFF_JITTER = float(os.getenv("STOCK_API_BACKOFF_JITTER", 0.25))
+STOCK_API_BACKOFF_MAX = float(os.getenv("STOCK_API_BACKOFF_MAX", 10))
+STOCK_API_RETRY_AFTER_MAX = float(os.getenv("STOCK_API_RETRY_AFTER_MAX", 30))
+# Upper bound of concurrent upstream connections held by AsyncPolygonClient per event loop
+STOCK_API_ASYNC_MAX_CONNECTIONS = int(os.getenv("STOCK_API_ASYNC_MAX_CONNECTIONS", 200))
+# (connect, read) timeouts in seconds per PolygonClient endpoint
+STOCK_API_TIMEOUTS = {
+    'default': (3.05, 10),
+    'aggregates': (3.05, 30),
+    'snapshot': (3.05, 20),
+    'search_tickers': (3.05, 5),
+    'reference_tickers': (3.05, 20),
+    'ticker_details': (3.05, 5),
+    'news': (3.05, 10),
+}
+
+# PolygonClient response cache: per-process LRU in front of the shared Django cache below
+STOCK_API_CACHE_ALIAS = 'default'
+STOCK_API_CACHE_MAX_ENTRIES = int(os.getenv("STOCK_API_CACHE_MAX_ENTRIES", 2048))
+STOCK_API_CACHE_MAX_BYTES = int(os.getenv("STOCK_API_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+# Seconds per endpoint, 0 disables caching. Aggregates are split on whether the requested window
+# ended before today (bars are final) or is still open.
+STOCK_API_CACHE_TTLS = {
+    'aggregates_closed': 24 * 60 * 60,
+    'aggregates_open': 60,
+    'ticker_details': 6 * 60 * 60,
+    'search_tickers': 60 * 60,
+    'news': 2 * 60,
+    'snapshot': 5,
+}
+# Seconds split-adjusted bars stay in the local bar store (core.bar_store) before they're fetched again,
+# so a split or dividend after they were stored shows up; unadjusted bars never change once final
+STOCK_BARS_ADJUSTED_TTL = int(os.getenv("STOCK_BARS_ADJUSTED_TTL", 24 * 60 * 60))
+# Coalesce identical concurrent upstream calls across worker processes via a lock in the shared cache
+# (within a process they are always coalesced)
+STOCK_API_SINGLEFLIGHT_SHARED = os.getenv("STOCK_API_SINGLEFLIGHT_SHARED", "false").lower() == "true"
+STOCK_API_SINGLEFLIGHT_LOCK_TTL = 30
+STOCK_API_SINGLEFLIGHT_WAIT = 10
+STOCK_API_SINGLEFLIGHT_POLL = 0.05
+# Upstream request budget, shared by all processes through the shared cache: a token bucket of
+# STOCK_API_RATE_LIMIT_BURST requests (0: one second's worth) refilled at STOCK_API_RATE_LIMIT per
+# second; 0 disables it. Background jobs can't use the RESERVE share of it, kept for interactive calls.
+# Callers wait up to the MAX_WAIT seconds of their priority for a token before failing.
+STOCK_API_RATE_LIMIT = float(os.getenv("STOCK_API_RATE_LIMIT", 0))
+STOCK_API_RATE_LIMIT_BURST = int(os.getenv("STOCK_API_RATE_LIMIT_BURST", 0))
+STOCK_API_RATE_LIMIT_RESERVE = float(os.getenv("STOCK_API_RATE_LIMIT_RESERVE", 0.2))
+STOCK_API_RATE_LIMIT_INTERACTIVE_MAX_WAIT = float(os.getenv("STOCK_API_RATE_LIMIT_INTERACTIVE_MAX_WAIT", 5))
+STOCK_API_RATE_LIMIT_BACKGROUND_MAX_WAIT = float(os.getenv("STOCK_API_RATE_LIMIT_BACKGROUND_MAX_WAIT", 30))
+# Tickers per snapshot call when batching (keeps the query string well under URL length limits)
+STOCK_API_SNAPSHOT_CHUNK_SIZE = int(os.getenv("STOCK_API_SNAPSHOT_CHUNK_SIZE", 250))
+# manage.py poll_snapshots: seconds between cycles, and how long a polled quote may be served
+# (a few missed cycles, after which readers fall back to upstream)
+STOCK_API_SNAPSHOT_POLL_INTERVAL = float(os.getenv("STOCK_API_SNAPSHOT_POLL_INTERVAL", 5))
+STOCK_API_SNAPSHOT_CACHE_TTL = int(os.getenv("STOCK_API_SNAPSHOT_CACHE_TTL", 30))
+# Local news store (core.news_store), which /news is served from. A feed (one ticker, or all of them)
+# older than the refresh interval first fetches the articles published since its newest one; a new
+# feed starts with its newest BACKFILL articles, and older ones are fetched as listings reach them.
+# manage.py ingest_news keeps the all-tickers feed current, which keeps every ticker's feed current too.
+STOCK_NEWS_REFRESH_INTERVAL = int(os.getenv("STOCK_NEWS_REFRESH_INTERVAL", 120))
+STOCK_NEWS_BACKFILL = int(os.getenv("STOCK_NEWS_BACKFILL", 1000))
+STOCK_NEWS_INGEST_INTERVAL = float(os.getenv("STOCK_NEWS_INGEST_INTERVAL", 60))
+STOCK_NEWS_REFRESH_LOCK_TTL = 60
+# Live quote streams (SSE/WebSocket): seconds between hub refreshes, seconds between SSE
+# keep-alives on a quiet stream, and tickers allowed per stream
+STOCK_STREAM_INTERVAL = float(os.getenv("STOCK_STREAM_INTERVAL", 1))
+STOCK_STREAM_HEARTBEAT = 15
+STOCK_STREAM_MAX_TICKERS = 500
+# Origins (scheme://host[:port], comma-separated) whose pages may open the quote WebSocket, besides
+# the server's own; it authenticates from the cookie, so any other site's page could otherwise use it
+STOCK_STREAM_WEBSOCKET_ORIGINS = [
+    origin.strip() for origin in os.getenv("STOCK_STREAM_WEBSOCKET_ORIGINS", "").split(",") if origin.strip()
+]
+# Where search_tickers looks before falling back to upstream: 'memory' (per-process index over
+# TickerSymbol), 'database' (ranked ORM query, pg_trgm-indexed on Postgres) or 'upstream' (always Polygon)
+STOCK_TICKER_SEARCH = os.getenv("STOCK_TICKER_SEARCH", "memory")
+# Seconds between checks whether another process changed TickerSymbol (rebuilds the in-memory index)
+STOCK_TICKER_INDEX_CHECK_INTERVAL = 30
+# manage.py sync_tickers: seconds between syncs of TickerSymbol with Polygon's ticker universe, and how
+# much shorter than the stored active set a listing may be before it's taken as truncated (needs --force)
+STOCK_TICKER_SYNC_INTERVAL = float(os.getenv("STOCK_TICKER_SYNC_INTERVAL", 24 * 60 * 60))
+STOCK_TICKER_SYNC_MAX_SHRINK = 0.1
+# Entries accepted by one bulk watchlist add/remove/reorder request
+STOCK_WATCHLIST_BULK_MAX = 1000
+# Watchlist analytics: ticker betas are measured against (empty for none), and daily bar series
+# fetched concurrently per request
+STOCK_WATCHLIST_ANALYTICS_BENCHMARK = os.getenv("STOCK_WATCHLIST_ANALYTICS_BENCHMARK", "SPY")
+STOCK_WATCHLIST_ANALYTICS_WORKERS = int(os.getenv("STOCK_WATCHLIST_ANALYTICS_WORKERS", 8))
+# Watchlist reads answer If-None-Match from a per-user version in the shared cache, moved by every write.
+# Off by default without Redis: another worker's per-process cache wouldn't see the version move
+# (ConditionalGetMiddleware still answers 304 from a hash of the body).
+STOCK_WATCHLIST_ETAGS = os.getenv(
+    "STOCK_WATCHLIST_ETAGS", "true" if os.getenv("REDIS_URL") else "false"
+).lower() == "true"
+# Ticker details and search pass Polygon's response body through untouched instead of parsing it and
+# serializing it again. JSON written by the views themselves goes through STOCK_JSON_ENCODER: 'orjson'
+# (used when installed, json otherwise) or 'json'.
+STOCK_API_PASSTHROUGH = os.getenv("STOCK_API_PASSTHROUGH", "true").lower() == "true"
+STOCK_JSON_ENCODER = os.getenv("STOCK_JSON_ENCODER", "orjson")
+# CompressionMiddleware: smallest body worth compressing, and the gzip / brotli (if installed) levels
+STOCK_HTTP_COMPRESS_MIN_BYTES = int(os.getenv("STOCK_HTTP_COMPRESS_MIN_BYTES", 1024))
+STOCK_HTTP_GZIP_LEVEL = 6
+STOCK_HTTP_BROTLI_QUALITY = 5
+# CookieJWTAuthentication resolves users through a per-process map in front of the shared cache.
+# Saves and deletes evict both tiers of the writing process; other processes notice after the local TTL.
+STOCK_AUTH_USER_CACHE_TTL = int(os.getenv("STOCK_AUTH_USER_CACHE_TTL", 300))
+STOCK_AUTH_USER_CACHE_LOCAL_TTL = int(os.getenv("STOCK_AUTH_USER_CACHE_LOCAL_TTL", 5))
+STOCK_AUTH_USER_CACHE_MAX_ENTRIES = 10000
+# Refresh-token blacklist checks go through a per-process Bloom filter of blacklisted JTIs, rebuilt when
+# the version in the shared cache changes. Off by default without Redis: a per-process cache can't tell
+# other workers that a token was blacklisted. Sized for at least MIN_CAPACITY tokens.
+STOCK_TOKEN_BLACKLIST_FILTER = os.getenv(
+    "STOCK_TOKEN_BLACKLIST_FILTER", "true" if os.getenv("REDIS_URL") else "false"
+).lower() == "true"
+STOCK_TOKEN_BLACKLIST_MIN_CAPACITY = 10000
+# manage.py compact_tokens: seconds between runs deleting expired outstanding/blacklisted tokens
+STOCK_TOKEN_COMPACTION_INTERVAL = 60 * 60
+# Request/upstream/database/cache metrics served at /api/metrics. Each process publishes its own to the
+# shared cache every PUBLISH_INTERVAL seconds, kept for RETENTION seconds after its last publish (so counters
+# of recycled workers don't drop out of the totals right away). With a token set, scrapers must send it as
+# a bearer token.
+STOCK_METRICS = os.getenv("STOCK_METRICS", "true").lower() == "true"
+STOCK_METRICS_PUBLISH_INTERVAL = float(os.getenv("STOCK_METRICS_PUBLISH_INTERVAL", 5))
+STOCK_METRICS_RETENTION = 24 * 60 * 60
+STOCK_METRICS_TOKEN = os.getenv("STOCK_METRICS_TOKEN", "")
+
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = True
 
@@ -47,8 +179,12 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
     "corsheaders.middleware.CorsMiddleware",
     'django.middleware.security.SecurityMiddleware',
+    # Before anything that reads the body; the ETag middleware after it, to hash the uncompressed body
+    'core.middleware.CompressionMiddleware',
+    'django.middleware.http.ConditionalGetMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     # 'django.middleware.csrf.CsrfViewMiddleware',
@@ -92,6 +228,16 @@ DATABASES = {
     }
 }
 
+# Shared across workers when REDIS_URL is set, otherwise per-process
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.getenv('REDIS_URL'),
+    } if os.getenv('REDIS_URL') else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
 REST_FRAMEWORK = {
     # 'DEFAULT_AUTHENTICATION_CLASSES': [
     #     'core.authentication.CookieJWTAuthentication',
@@ -165,5 +311,20 @@ STATIC_URL = 'static/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# The app's own loggers (core.*) to stderr; Django's keep their defaults
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'plain': {'format': '%(asctime)s %(levelname)s %(name)s %(process)d %(message)s'},
+    },
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler', 'formatter': 'plain'},
+    },
+    'loggers': {
+        'core': {'handlers': ['console'], 'level': os.getenv("STOCK_LOG_LEVEL", "INFO")},
+    },
+}
+
 CORS_ALLOW_ALL_ORIGINS = True
 CORS_ALLOW_CREDENTIALS = True
\ No newline at end of file